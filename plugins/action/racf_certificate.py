@@ -0,0 +1,14 @@
+from ansible_collections.billpereira.community_racf.plugins.plugin_utils.racf_action import RacfActionBase
+
+
+class ActionModule(RacfActionBase):
+    profile_type = "certificate"
+    batch_param = "certificates"
+    batch_shared_options = ("list_only", "return_output", "output_limit", "compress_output", "fields", "metrics")
+
+    def profile_name(self, module_args):
+        label = module_args.get("certificate_label") or (module_args.get("distinguished_name") or {}).get("common_name") or ""
+        return f"{(module_args.get('certificate_owner') or '').upper()}/{label}"
+
+    def changed_profile_names(self, module_args, module_result):
+        return [self.profile_name(module_args), f"{(module_args.get('certificate_owner') or '').upper()}/"]
@@ -0,0 +1,24 @@
+from ansible_collections.billpereira.community_racf.plugins.plugin_utils.racf_action import RacfActionBase
+
+
+class ActionModule(RacfActionBase):
+    profile_type = "group"
+    batch_param = "groups"
+    batch_shared_options = ("list_only", "return_output", "output_limit", "compress_output", "fields", "verify", "metrics")
+
+    def profile_name(self, module_args):
+        return module_args["name"].upper() if module_args.get("name") else None
+
+    def group_results(self, module_args, module_result):
+        return module_result.get("results", []) if module_args.get("groups") else [module_result]
+
+    def changed_profile_names(self, module_args, module_result):
+        return [group_result["name"].upper() for group_result in self.group_results(module_args, module_result) if group_result.get("changed")]
+
+    def invalidate_changed(self, cache, host, module_args, module_result):
+        super(ActionModule, self).invalidate_changed(cache, host, module_args, module_result)
+        # connects and removes change the LISTUSER of every member as well
+        cache.invalidate(host, "user", [
+            user for group_result in self.group_results(module_args, module_result)
+            for user in group_result.get("connected", []) + group_result.get("removed", [])
+        ])
@@ -0,0 +1,10 @@
+from ansible_collections.billpereira.community_racf.plugins.plugin_utils.racf_action import RacfActionBase
+
+
+class ActionModule(RacfActionBase):
+    profile_type = "keyring"
+    batch_param = "keyrings"
+    batch_shared_options = ("list_only", "return_output", "output_limit", "compress_output", "fields", "verify", "metrics")
+
+    def profile_name(self, module_args):
+        return f"{(module_args.get('keyring_owner') or '').upper()}/{module_args.get('name')}"
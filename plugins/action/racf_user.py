@@ -0,0 +1,56 @@
+import re
+
+from ansible_collections.billpereira.community_racf.plugins.plugin_utils.racf_action import RacfActionBase
+
+GROUP_KEYWORD_PATTERN = re.compile(r"\bGROUP\(([^)]*)\)")
+
+
+class ActionModule(RacfActionBase):
+    profile_type = "user"
+    batch_param = "users"
+    batch_shared_options = ("segments", "list_only", "return_output", "output_limit", "compress_output", "fields", "verify", "metrics")
+    batch_module_options = dict(task_results=True)
+
+    def profile_name(self, module_args):
+        return module_args["name"].upper() if module_args.get("name") else None
+
+    def user_results(self, module_args, module_result):
+        if module_args.get("users") or module_args.get("targets"):
+            return module_result.get("results", [])
+        return [module_result]
+
+    def changed_profile_names(self, module_args, module_result):
+        return [user_result["name"].upper() for user_result in self.user_results(module_args, module_result) if user_result.get("changed")]
+
+    def changed_group_names(self, module_args, user_result):
+        # None when any group may have changed: AU connects the user to its
+        # default group and DU removes every connect of the user
+        if "commands" in user_result:
+            if any(command.split(" ", 1)[0] in ("AU", "DU") for command in user_result["commands"]):
+                return None
+            return [group.upper() for command in user_result["commands"] if command.startswith("CO ") for group in GROUP_KEYWORD_PATTERN.findall(command)]
+        if module_args.get("state") == "absent" or (module_args.get("state", "present") == "present" and "alter_command" not in user_result):
+            return None
+        return [group["group_name"].upper() for group in user_result.get("updated_group_connections", [])]
+
+    def invalidate_changed(self, cache, host, module_args, module_result):
+        super(ActionModule, self).invalidate_changed(cache, host, module_args, module_result)
+        # connects, adds and deletes change the LISTGRP of the groups as well
+        group_names = []
+        for user_result in self.user_results(module_args, module_result):
+            if not user_result.get("changed"):
+                continue
+            changed_groups = self.changed_group_names(module_args, user_result)
+            if changed_groups is None:
+                cache.invalidate_type(host, "group")
+                return
+            group_names.extend(changed_groups)
+        cache.invalidate(host, "group", group_names)
+
+    def batch_results(self, items_args, module_result):
+        if isinstance(module_result.get("racf_info"), dict) and module_result["racf_info"] and "results" not in module_result:
+            return [
+                dict(changed=False, name=item_args["name"], list_only=True, racf_info=module_result["racf_info"].get(item_args["name"], []))
+                for item_args in items_args
+            ]
+        return module_result.get("results")
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+name: racf_metrics
+
+short_description: Aggregates the RACF command metrics of a play
+
+version_added: "1.0.0"
+
+description:
+    - Collects the `racf_metrics` returned by the RACF modules run with `metrics` or the `RACF_METRICS` environment variable
+    - At the end of the play prints, per host and per command verb, the number of commands, elapsed seconds, output bytes and failed return codes, and the total parse time
+
+type: aggregate
+
+requirements:
+    - enable in configuration, for example `callbacks_enabled = billpereira.community_racf.racf_metrics`
+
+options:
+    output_file:
+        description: When set the aggregated metrics are also written to this file as JSON
+        type: path
+        env:
+            - name: RACF_METRICS_FILE
+        ini:
+            - section: callback_racf_metrics
+              key: output_file
+
+author:
+    - Bill Pereira (@billpereira)
+"""
+
+import json
+from collections import defaultdict
+
+from ansible.plugins.callback import CallbackBase
+
+
+def new_counters():
+    return dict(commands=0, elapsed=0.0, bytes=0, failed=0, max_elapsed=0.0)
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "aggregate"
+    CALLBACK_NAME = "billpereira.community_racf.racf_metrics"
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, display=None):
+        super(CallbackModule, self).__init__(display=display)
+        self.hosts = defaultdict(lambda: dict(parse_time=0.0, parses=0, session_start=0.0, tasks=0, verbs=defaultdict(new_counters)))
+
+    def collect(self, result):
+        module_results = [result._result] + [item for item in result._result.get("results", []) if isinstance(item, dict)]
+        for module_result in module_results:
+            metrics = module_result.get("racf_metrics")
+            if isinstance(metrics, dict):
+                self.add(result._host.get_name(), metrics)
+
+    def add(self, host, metrics):
+        host_metrics = self.hosts[host]
+        host_metrics["tasks"] += 1
+        host_metrics["parse_time"] += metrics.get("parse_time", 0)
+        host_metrics["parses"] += metrics.get("parses", 0)
+        host_metrics["session_start"] += metrics.get("session_start", 0)
+        for command in metrics.get("commands", []):
+            counters = host_metrics["verbs"][command["verb"]]
+            counters["commands"] += 1
+            counters["elapsed"] += command["elapsed"]
+            counters["bytes"] += command["bytes"]
+            # a command without rc timed out or was never answered
+            counters["failed"] += command["rc"] != 0
+            counters["max_elapsed"] = max(counters["max_elapsed"], command["elapsed"])
+
+    def v2_runner_on_ok(self, result):
+        self.collect(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self.collect(result)
+
+    def v2_playbook_on_stats(self, stats):
+        if not self.hosts:
+            return
+        self._display.banner("RACF METRICS")
+        self._display.display(f"{'host':<24} {'verb':<18} {'commands':>8} {'elapsed s':>10} {'max s':>8} {'bytes':>12} {'failed':>6}")
+        totals = defaultdict(new_counters)
+        for host, host_metrics in sorted(self.hosts.items()):
+            for verb, counters in sorted(host_metrics["verbs"].items()):
+                self._display.display(
+                    f"{host:<24} {verb:<18} {counters['commands']:>8} {counters['elapsed']:>10.3f} "
+                    f"{counters['max_elapsed']:>8.3f} {counters['bytes']:>12} {counters['failed']:>6}"
+                )
+                total = totals[verb]
+                for key in ("commands", "elapsed", "bytes", "failed"):
+                    total[key] += counters[key]
+                total["max_elapsed"] = max(total["max_elapsed"], counters["max_elapsed"])
+            self._display.display(
+                f"{host:<24} parse {host_metrics['parse_time']:.3f}s in {host_metrics['parses']} parses, "
+                f"session start {host_metrics['session_start']:.3f}s, {host_metrics['tasks']} module runs"
+            )
+        for verb, counters in sorted(totals.items()):
+            self._display.display(
+                f"{'TOTAL':<24} {verb:<18} {counters['commands']:>8} {counters['elapsed']:>10.3f} "
+                f"{counters['max_elapsed']:>8.3f} {counters['bytes']:>12} {counters['failed']:>6}"
+            )
+        output_file = self.get_option("output_file")
+        if output_file:
+            with open(output_file, "w") as metrics_file:
+                json.dump(dict(hosts=self.hosts, totals=totals), metrics_file, indent=1)
@@ -0,0 +1,384 @@
+import fcntl
+import hashlib
+import inspect
+import json
+import os
+import queue
+import socket
+import socketserver
+import stat
+import struct
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from ansible_collections.billpereira.community_racf.plugins.module_utils import racf_helper, racf_lock
+except ImportError:
+    import racf_helper
+    import racf_lock
+
+RACF_BROKER_IDLE_TIMEOUT_ENV = "RACF_BROKER_IDLE_TIMEOUT"
+RACF_BROKER_SESSIONS_ENV = "RACF_BROKER_SESSIONS"
+RACF_BROKER_CACHE_SIZE_ENV = "RACF_BROKER_CACHE_SIZE"
+RACF_BROKER_CACHE_TTL_ENV = "RACF_BROKER_CACHE_TTL"
+RACF_BROKER_START_TIMEOUT = 30
+
+
+def broker_version():
+    sources = "".join(inspect.getsource(module) for module in (sys.modules[__name__], racf_helper, racf_lock))
+    return hashlib.sha256(sources.encode()).hexdigest()[:16]
+
+
+class ProfileCache:
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # bumped by every command changing RACF, a listing read before a
+        # change is not stored after it
+        self.generation = 0
+
+    def get(self, profile_type, profile_name, command):
+        key = (profile_type, profile_name, command)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, profile_type, profile_name, command, profile, generation=None):
+        with self.lock:
+            if generation is not None and generation < self.generation:
+                return False
+            self.entries[(profile_type, profile_name, command)] = (time.time(), profile)
+            self.entries.move_to_end((profile_type, profile_name, command))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return True
+
+    def invalidate(self, command):
+        # Read commands keep the cache, user commands drop the users and groups
+        # they name, RACDCERT changes drop every ring and certificate and
+        # anything else drops the whole cache.
+        profiles = racf_lock.command_profiles(command)
+        if profiles is None:
+            return
+        users = {profile.split(":", 1)[1] for profile in profiles if profile.startswith("user:")}
+        groups = {profile.split(":", 1)[1] for profile in profiles if profile.startswith("group:")}
+        with self.lock:
+            self.generation += 1
+            if any(profile.startswith("certificate:") for profile in profiles):
+                stale = [key for key in self.entries if key[0] in ("ring", "certificate")]
+            elif users:
+                stale = [key for key in self.entries if (key[0] == "user" and key[1] in users) or (key[0] == "group" and key[1] in groups)]
+            else:
+                stale = list(self.entries)
+            for key in stale:
+                del self.entries[key]
+
+
+class SessionPool:
+    def __init__(self, size):
+        self.size = size
+        self.idle = queue.Queue()
+        self.started = 0
+        self.lock = threading.Lock()
+
+    def run_many(self, commands):
+        session = self.acquire()
+        if session is None:
+            return racf_helper.SubprocessTransport().run_many(commands)
+        try:
+            results = session.run_many(commands)
+        except RuntimeError:
+            self.discard(session)
+            raise
+        self.idle.put(session)
+        return results
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            start = self.started < self.size
+            if start:
+                self.started += 1
+        if not start:
+            return self.idle.get()
+        session = racf_helper.TsoSession()
+        if os.environ.get(racf_helper.TSO_SESSION_DISABLE_ENV) or not session.start():
+            self.discard(session)
+            return None
+        return session
+
+    def discard(self, session):
+        session.close()
+        with self.lock:
+            self.started -= 1
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def peer_is_owner(connection):
+    # SO_PEERCRED is Linux only, elsewhere the 0700 broker directory keeps
+    # other users away from the socket
+    if not hasattr(socket, "SO_PEERCRED"):
+        return True
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    pid, uid, gid = struct.unpack("3i", credentials)
+    return uid == os.getuid()
+
+
+def check_private_dir(path):
+    # the broker runs TSO commands with the authority of its owner, only the
+    # owner may reach its socket or replace the sources it is started from
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) != 0o700:
+        raise RuntimeError(f"RACF broker directory {path} must be a directory owned by uid {os.getuid()} with mode 0700")
+
+
+class BrokerRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        broker = self.server
+        if not peer_is_owner(self.connection):
+            self.wfile.write(json.dumps(dict(error="RACF broker client is not running as the broker owner")).encode() + b"\n")
+            return
+        broker.touch(1)
+        try:
+            for line in self.rfile:
+                try:
+                    response = broker.dispatch(json.loads(line))
+                except Exception as e:
+                    response = dict(error=str(e))
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+                self.wfile.flush()
+                broker.touch(0)
+        finally:
+            broker.touch(-1)
+
+
+class RacfBroker(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, idle_timeout, sessions, cache):
+        self.idle_timeout = idle_timeout
+        self.pool = SessionPool(sessions)
+        self.cache = cache
+        self.version = broker_version()
+        self.active = 0
+        self.last_used = time.time()
+        self.activity = threading.Lock()
+        # the socket is created without any access for group and others
+        os.umask(0o077)
+        socketserver.UnixStreamServer.__init__(self, socket_path, BrokerRequestHandler)
+        os.chmod(socket_path, 0o600)
+
+    def touch(self, active):
+        with self.activity:
+            self.active += active
+            self.last_used = time.time()
+
+    def dispatch(self, request):
+        op = request["op"]
+        if op == "ping":
+            return dict(version=self.version)
+        if op == "run":
+            # the generation before the commands ran, listings they return are tagged with it
+            generation = self.cache.generation
+            results = self.pool.run_many(request["commands"])
+            for command in request["commands"]:
+                self.cache.invalidate(command)
+            return dict(results=results, generation=generation)
+        if op == "cache_get":
+            return dict(
+                profile=self.cache.get(request["profile_type"], request["profile_name"], request["command"]),
+                generation=self.cache.generation,
+            )
+        if op == "cache_put":
+            stored = self.cache.put(request["profile_type"], request["profile_name"], request["command"], request["profile"], request.get("generation"))
+            return dict(stored=stored)
+        if op == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return dict()
+        raise ValueError(f"Unknown broker request {op}")
+
+    def watch_idle(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 5))
+            with self.activity:
+                idle = self.active == 0 and time.time() - self.last_used > self.idle_timeout
+            if idle:
+                self.shutdown()
+                return
+
+    def serve(self):
+        threading.Thread(target=self.watch_idle, daemon=True).start()
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            self.pool.close()
+            try:
+                os.remove(self.server_address)
+            except OSError:
+                pass
+
+
+class BrokerClient(racf_helper.TsoTransport):
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.connect(socket_path)
+        self.reader = self.connection.makefile("rb")
+        self.current = None
+        self.generation = 0
+        self.generations = {}
+
+    def request(self, op, timeout=None, **fields):
+        fields["op"] = op
+        try:
+            self.connection.settimeout(timeout)
+            self.connection.sendall(json.dumps(fields).encode() + b"\n")
+            line = self.reader.readline()
+        except socket.timeout:
+            raise racf_helper.TsoCommandTimeout("; ".join(fields.get("commands", [op])), timeout)
+        except OSError as e:
+            raise RuntimeError(f"Error talking to the RACF broker: {e}")
+        if not line:
+            raise RuntimeError("RACF broker closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(f"RACF broker error: {response['error']}")
+        return response
+
+    def run(self, command, timeout=None):
+        response = self.request("run", timeout=timeout, commands=[command])
+        self.generation = response["generation"]
+        result = response["results"][0]
+        self.last_rc = result["rc"]
+        return result["rc"], result["output"]
+
+    def run_many(self, commands):
+        response = self.request("run", commands=list(commands))
+        self.generation = response["generation"]
+        return response["results"]
+
+    def cache_get(self, profile_type, profile_name, command):
+        response = self.request("cache_get", profile_type=profile_type, profile_name=profile_name, command=command)
+        if response["profile"] is None:
+            # the listing that follows the miss is put with the generation of the miss
+            self.generations[(profile_type, profile_name, command)] = response["generation"]
+        return response["profile"]
+
+    def cache_put(self, profile_type, profile_name, command, profile):
+        generation = self.generations.pop((profile_type, profile_name, command), self.generation)
+        return self.request("cache_put", profile_type=profile_type, profile_name=profile_name, command=command, profile=profile, generation=generation)["stored"]
+
+    def reset(self):
+        # the broker still finishes the command, its answer must not be read
+        # as the answer to the next request
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.close()
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.connection.connect(self.socket_path)
+        except OSError as e:
+            raise RuntimeError(f"Error reconnecting to the RACF broker: {e}")
+        self.reader = self.connection.makefile("rb")
+
+    def close(self):
+        self.reader.close()
+        self.connection.close()
+
+
+def connect_broker(socket_path):
+    broker_dir = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(broker_dir, mode=0o700, exist_ok=True)
+    check_private_dir(broker_dir)
+    client = open_broker_client(socket_path)
+    if client is not None and client.current:
+        return client
+    with open(os.path.join(broker_dir, "racf_broker.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        client = open_broker_client(socket_path)
+        if client is not None and client.current:
+            return client
+        if client is not None:
+            client.request("shutdown")
+            client.close()
+            wait_for_socket_removal(socket_path)
+        start_broker(socket_path, broker_dir)
+        deadline = time.time() + RACF_BROKER_START_TIMEOUT
+        while time.time() < deadline:
+            client = open_broker_client(socket_path)
+            if client is not None:
+                return client
+            time.sleep(0.1)
+    return None
+
+
+def open_broker_client(socket_path):
+    try:
+        client = BrokerClient(socket_path)
+        client.current = client.request("ping")["version"] == broker_version()
+    except (OSError, RuntimeError):
+        return None
+    return client
+
+
+def wait_for_socket_removal(socket_path):
+    deadline = time.time() + RACF_BROKER_START_TIMEOUT
+    while os.path.exists(socket_path) and time.time() < deadline:
+        time.sleep(0.1)
+
+
+def start_broker(socket_path, broker_dir):
+    source_dir = os.path.join(broker_dir, "racf_broker_source")
+    os.makedirs(source_dir, mode=0o700, exist_ok=True)
+    check_private_dir(source_dir)
+    for module in (racf_helper, racf_lock, sys.modules[__name__]):
+        with open(os.path.join(source_dir, f"{module.__name__.rsplit('.', 1)[-1]}.py"), "w") as source_file:
+            source_file.write(inspect.getsource(module))
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with open(os.devnull, "r+b") as devnull:
+        subprocess.Popen(
+            [sys.executable, os.path.join(source_dir, "racf_broker.py"), socket_path],
+            stdin=devnull, stdout=devnull, stderr=devnull, cwd=source_dir, start_new_session=True,
+        )
+
+
+def main():
+    socket_path = sys.argv[1]
+    broker = RacfBroker(
+        socket_path,
+        idle_timeout=int(os.environ.get(RACF_BROKER_IDLE_TIMEOUT_ENV, 300)),
+        sessions=int(os.environ.get(RACF_BROKER_SESSIONS_ENV, 4)),
+        cache=ProfileCache(
+            max_entries=int(os.environ.get(RACF_BROKER_CACHE_SIZE_ENV, 1024)),
+            ttl=int(os.environ.get(RACF_BROKER_CACHE_TTL_ENV, 60)),
+        ),
+    )
+    broker.serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import re
+
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_helper import get_cached_profile, put_cached_profile, run_tso_commands, stream_tso_command, tee_lines, timed_parse
+
+CERTIFICATE_OWNER_KEYWORDS = ('CERTAUTH', 'SITE')
+
+def generate_id_owner_suffix(owner):
+    if owner and owner.upper() in CERTIFICATE_OWNER_KEYWORDS:
+        return owner.upper()
+    return f"ID({owner})" if owner else ""
+
+def generate_label_suffix(label):
+    return f"(LABEL(\'{label}\'))" if label else ""
+
+CERTIFICATE_OWNER_PATTERN = re.compile(r'Digital certificate information for (?:user )?(.*):')
+CERTIFICATE_FIELD_PATTERN = re.compile(r'\s*([A-Z][\w\' ]*?):( .*)?$')
+CERTIFICATE_LEADING_PATTERN = re.compile(r'^\W*')
+CERTIFICATE_FINGER_PRINT_PATTERN = re.compile(r'(?:[0-9A-Fa-f:]{47,48})')
+
+CERTIFICATE_FIELDS = {
+    'Certificate ID': 'certificate_id',
+    'Start Date': 'start_date',
+    'End Date': 'end_date',
+    'Status': 'trust',
+    'Key Type': 'key_type',
+    'Key Size': 'key_size',
+}
+CERTIFICATE_BRACKETED_FIELDS = {
+    "Issuer's Name": 'issuers_name',
+    'Serial Number': 'serial_number',
+    'Ring': 'keyring',
+}
+
+def extract_certificates(list_output):
+    return collect_certificates(list_output.splitlines())
+    # return list_certificates if len(list_certificates)>0 else [list_output]
+
+@timed_parse
+def collect_certificates(lines):
+    list_certificates = list(iter_certificates(lines))
+    ring_lookups = [certificate for certificate in list_certificates if certificate['ring_associations'] is None]
+    ring_results = run_tso_commands(f"RACDCERT LIST{generate_label_suffix(certificate['label'])} {generate_id_owner_suffix(certificate['user'])}" for certificate in ring_lookups)
+    for certificate, item in zip(ring_lookups, ring_results):
+        certificate['ring_associations'] = next((found['ring_associations'] for found in iter_certificates(item['output'].splitlines())), None) or []
+    return list_certificates
+
+def new_certificate(user, label):
+    return {
+        'common_name': '',
+        'user': user,
+        'label': label,
+        'certificate_id': '',
+        'issuers_name': '',
+        'start_date': '',
+        'end_date': '',
+        'trust': '',
+        'key_type': '',
+        'key_size': '',
+        'serial_number': '',
+        'ring_associations': [],
+        'finger_print': [],
+    }
+
+def finish_certificate(certificate, rings_expected):
+    certificate['finger_print'] = ''.join(certificate['finger_print'][:2])
+    if certificate['issuers_name'].startswith('CN='):
+        certificate['common_name'] = re.split(r'[<\.]', certificate['issuers_name'][3:], 1)[0]
+    if rings_expected and len(certificate['ring_associations']) == 0:
+        certificate['ring_associations'] = None
+    return certificate
+
+def iter_certificates(lines):
+    user = ''
+    certificate = None
+    rings_expected = False
+    bracketed_field = None
+    bracketed_value = ''
+    for line in lines:
+        if bracketed_field is not None:
+            if not bracketed_value and '>' not in line:
+                bracketed_field = None
+            else:
+                bracketed_value += line.strip() if bracketed_value else line[line.index('>') + 1:].strip()
+                if '<' in bracketed_value:
+                    value = bracketed_value[:bracketed_value.rindex('<')]
+                    if bracketed_field == 'keyring':
+                        certificate['ring_associations'][-1]['keyring'] = value
+                    else:
+                        certificate[bracketed_field] = value
+                    bracketed_field = None
+                continue
+        if certificate is None:
+            owner = CERTIFICATE_OWNER_PATTERN.search(line)
+            if owner:
+                user = owner.group(1)
+        field = CERTIFICATE_FIELD_PATTERN.match(line)
+        if field is None:
+            if certificate is None:
+                continue
+            if rings_expected and line.lstrip().startswith('***'):
+                certificate['ring_associations'].append(line.lstrip())
+                rings_expected = False
+            elif ':' in line:
+                certificate['finger_print'].extend(CERTIFICATE_FINGER_PRINT_PATTERN.findall(line))
+            continue
+        name, value = field.group(1), field.group(2) or ''
+        if name == 'Label':
+            if certificate is not None:
+                yield finish_certificate(certificate, rings_expected)
+            certificate = new_certificate(user, value[1:])
+            rings_expected = False
+        elif certificate is None:
+            continue
+        elif name in CERTIFICATE_FIELDS:
+            certificate[CERTIFICATE_FIELDS[name]] = value[1:] if name == 'Certificate ID' else CERTIFICATE_LEADING_PATTERN.sub('', value)
+        elif name in CERTIFICATE_BRACKETED_FIELDS:
+            bracketed_field = CERTIFICATE_BRACKETED_FIELDS[name]
+            bracketed_value = ''
+            if '>' in value:
+                bracketed_value = value[value.index('>') + 1:].strip()
+                if '<' in bracketed_value:
+                    certificate[bracketed_field] = bracketed_value[:bracketed_value.rindex('<')]
+                    bracketed_field = None
+        elif name == 'Ring Associations':
+            rings_expected = True
+        elif name == 'Ring Owner':
+            certificate['ring_associations'].append({'ring_owner': value.split()[0] if value.split() else '', 'keyring': ''})
+            rings_expected = False
+    if certificate is not None:
+        yield finish_certificate(certificate, rings_expected)
+
+
+def list_certificate(certificate_label, certificate_owner, output_lines=None):
+    list_certificate_command = f"RACDCERT LIST{generate_label_suffix(certificate_label)} {generate_id_owner_suffix(certificate_owner)}"
+    profile_name = f"{(certificate_owner or '').upper()}/{certificate_label}"
+    if output_lines is not None:
+        # the cache holds no output, list again when it is asked for
+        return collect_certificates(tee_lines(stream_tso_command(list_certificate_command), output_lines))
+    cached_certificates = get_cached_profile("certificate", profile_name, list_certificate_command)
+    if cached_certificates is not None:
+        return cached_certificates
+    results = collect_certificates(stream_tso_command(list_certificate_command))
+    put_cached_profile("certificate", profile_name, list_certificate_command, results)
+    return results
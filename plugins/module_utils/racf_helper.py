@@ -1,11 +1,1004 @@
+import base64
+import cProfile
+import functools
+import json
+import os
+import pstats
+import queue
+import random
+import re
+import select
 import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_lock import command_slot, get_command_limiter, is_read_command
+except ImportError:
+    from racf_lock import command_slot, get_command_limiter, is_read_command
+
+TSO_SESSION_SENTINEL = "@@RACF-END@@"
+TSO_SESSION_HOST_ENV = "RACF_TSO_HOST"
+TSO_SESSION_DISABLE_ENV = "RACF_TSO_NO_SESSION"
+TSO_SESSION_START_TIMEOUT = 30
+RACF_BROKER_SOCKET_ENV = "RACF_BROKER_SOCKET"
+RACF_TRANSPORT_ENV = "RACF_TRANSPORT"
+RACF_TRANSPORT_KINDS = ("", "session", "subprocess", "record", "replay")
+RACF_METRICS_ENV = "RACF_METRICS"
+RACF_PROFILE_ENV = "RACF_PROFILE"
+RACF_PROFILE_MEMORY_ENV = "RACF_PROFILE_MEMORY"
+RACF_PROFILE_TOP_ENV = "RACF_PROFILE_TOP"
+RACF_OUTPUT_LIMIT = 65536
+RACF_COMMAND_TIMEOUT_ENV = "RACF_COMMAND_TIMEOUT"
+RACF_COMMAND_TIMEOUTS_ENV = "RACF_COMMAND_TIMEOUTS"
+RACF_READ_RETRIES_ENV = "RACF_READ_RETRIES"
+RACF_RETRY_BACKOFF_ENV = "RACF_RETRY_BACKOFF"
+RACF_HEDGE_AFTER_ENV = "RACF_HEDGE_AFTER"
+RACF_WORKERS = 4
+
+# Session host: reads "<token> <tso command>" lines from stdin, runs each one
+# under OUTTRAP and writes the trapped lines followed by "<sentinel> <token> <rc>".
+TSO_SESSION_HOST_REXX = f"""/* REXX */
+do forever
+  parse pull token command
+  if token = '' | token = '@@RACF-QUIT@@' then leave
+  call outtrap 'out.'
+  address tso command
+  cmdrc = rc
+  call outtrap 'OFF'
+  do i = 1 to out.0
+    say out.i
+  end
+  say '{TSO_SESSION_SENTINEL}' token cmdrc
+end
+exit 0
+"""
+
+# RACF, RACDCERT and TSO message ids; a trailing E or S marks an error message.
+RACF_MESSAGE_PATTERN = re.compile(r"\b((?:ICH|IRRD|IRR|IKJ)\d{3,5}([A-Z]))\b")
+# PASSWORD(...) and PHRASE(...) operands, a quoted phrase can hold parentheses
+SECRET_OPERAND_PATTERN = re.compile(r"\b(PASSWORD|PHRASE)\((?:'(?:[^']|'')*'|[^)]*)\)", re.IGNORECASE)
+VERIFY_CHOICES = ["full", "messages", "none"]
+
+_active_session = None
+_worker_sessions = threading.local()
+_session_unavailable = False
+_session_start_time = 0.0
+_metrics = None
+_profiler = None
+_compaction = None
+_module = None
+_result = None
+_command_events = []
+_executed_changes = []
+
 
 def run_tso_command_and_capture_output(command):
+    # "tsocmd '...'" strings of older callers are unwrapped, nothing runs through a shell
+    return run_tso_command(unwrap_tsocmd(command) or command)["output"]
+
+
+def unwrap_tsocmd(command):
+    match = re.match(r"""^\s*tsocmd\s+(["'])(.*)\1\s*$""", command, re.DOTALL)
+    return match.group(2) if match else None
+
+
+class TsoCommandTimeout(RuntimeError):
+    def __init__(self, command, timeout):
+        super().__init__(f"Timed out after {timeout}s running TSO command: {command}")
+        self.command = command
+        self.timeout = timeout
+
+
+class TsoTransport:
+    last_rc = None
+
+    def run(self, command, timeout=None):
+        raise NotImplementedError
+
+    def reset(self):
+        # drops a command left running by a timeout, the next one starts clean
+        pass
+
+    def run_many(self, commands):
+        results = []
+        for command in commands:
+            started = time.monotonic()
+            rc, output = self.run(command)
+            results.append(dict(command=command, rc=rc, output=output, elapsed=time.monotonic() - started))
+        return results
+
+    def stream(self, command):
+        self.last_rc, output = self.run(command)
+        yield from output.splitlines()
+
+    def cache_get(self, profile_type, profile_name, command):
+        return None
+
+    def cache_put(self, profile_type, profile_name, command, profile):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SubprocessTransport(TsoTransport):
+    # tsocmd is executed directly with the command as its only argument, no shell parses it
+    def __init__(self, executable="tsocmd"):
+        self.executable = executable
+        self.running = set()
+
+    def run(self, command, timeout=None):
+        try:
+            process = subprocess.Popen([self.executable, command], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise RuntimeError(f"Error executing TSO command: {e}")
+        self.running.add(process)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise TsoCommandTimeout(command, timeout)
+        finally:
+            self.running.discard(process)
+        self.last_rc = process.returncode
+        return process.returncode, stdout.decode(errors="replace")
+
+    def reset(self):
+        for process in list(self.running):
+            process.kill()
+
+    def stream(self, command):
+        try:
+            process = subprocess.Popen([self.executable, command], stdout=subprocess.PIPE)
+        except OSError as e:
+            raise RuntimeError(f"Error executing TSO command: {e}")
+        try:
+            for line in process.stdout:
+                yield line.decode(errors="replace").rstrip("\r\n")
+        finally:
+            process.stdout.close()
+            self.last_rc = process.wait()
+
+
+class RecordingTransport(TsoTransport):
+    # Appends every command with its rc and output to a JSON lines transcript
+    # that ReplayTransport serves back.
+    def __init__(self, transport, transcript_path):
+        self.transport = transport
+        self.transcript = os.open(transcript_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self.lock = threading.Lock()
+
+    def record(self, command, rc, output):
+        # write commands can carry passwords, the transcript keeps them masked
+        entry = json.dumps(dict(command=redact_command(command), rc=rc, output=output)) + "\n"
+        with self.lock:
+            os.write(self.transcript, entry.encode())
+
+    def run(self, command, timeout=None):
+        self.last_rc, output = self.transport.run(command, timeout)
+        self.record(command, self.last_rc, output)
+        return self.last_rc, output
+
+    def run_many(self, commands):
+        results = self.transport.run_many(commands)
+        for result in results:
+            self.record(result["command"], result["rc"], result["output"])
+        return results
+
+    def stream(self, command):
+        output_lines = []
+        lines = self.transport.stream(command)
+        try:
+            yield from tee_lines(lines, output_lines)
+        finally:
+            # a parser may stop reading early, the transcript still gets the whole output
+            output_lines.extend(lines)
+            self.last_rc = self.transport.last_rc
+            self.record(command, self.last_rc, join_lines(output_lines))
+
+    def reset(self):
+        self.transport.reset()
+
+    def close(self):
+        os.close(self.transcript)
+        self.transport.close()
+
+
+class ReplayTransport(TsoTransport):
+    # Serves the responses of a transcript in process. A command recorded more
+    # than once gets its responses in order, the last one is repeated after that.
+    def __init__(self, transcript_path):
+        self.responses = {}
+        self.served = {}
+        self.lock = threading.Lock()
+        with open(transcript_path) as transcript:
+            for line in transcript:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.responses.setdefault(transcript_key(entry["command"]), []).append((entry["rc"], entry["output"]))
+
+    def run(self, command, timeout=None):
+        key = transcript_key(command)
+        responses = self.responses.get(key)
+        if not responses:
+            raise RuntimeError(f"No recorded response for TSO command: {command}")
+        with self.lock:
+            index = self.served.get(key, 0)
+            self.served[key] = index + 1
+        self.last_rc, output = responses[min(index, len(responses) - 1)]
+        return self.last_rc, output
+
+
+def transcript_key(command):
+    # transcripts hold redacted commands, a replayed command is matched the same way
+    return " ".join(redact_command(command).split())
+
+
+def redact_command(command):
+    if is_read_command(command):
+        return command
+    return SECRET_OPERAND_PATTERN.sub(lambda match: f"{match.group(1)}(********)", command)
+
+
+class TsoSession(TsoTransport):
+    def __init__(self, host_command=None, start_timeout=TSO_SESSION_START_TIMEOUT):
+        self.host_command = host_command
+        self.start_timeout = start_timeout
+        self.process = None
+        self._buffer = bytearray()
+        self._position = 0
+        self._token = 0
+        self._host_script = None
+        self._restart = False
+        self.last_rc = None
+
+    def start(self):
+        self._restart = False
+        host_command = self.host_command or self._default_host_command()
+        try:
+            self.process = subprocess.Popen(
+                host_command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=0,
+            )
+            rc, output = self.run("TIME", timeout=self.start_timeout)
+        except (OSError, RuntimeError):
+            self.close()
+            return False
+        if rc != 0:
+            self.close()
+            return False
+        return True
+
+    def _default_host_command(self):
+        if os.environ.get(TSO_SESSION_HOST_ENV):
+            return os.environ[TSO_SESSION_HOST_ENV].split()
+        if self._host_script:
+            return [self._host_script]
+        fd, self._host_script = tempfile.mkstemp(prefix="racf_host_", suffix=".rexx")
+        with os.fdopen(fd, "w") as host_script:
+            host_script.write(TSO_SESSION_HOST_REXX)
+        os.chmod(self._host_script, 0o700)
+        return [self._host_script]
+
+    def run(self, command, timeout=None):
+        token = self._next_token()
+        self._send([(token, command)])
+        return self._read_result(token, command, timeout)
+
+    def run_many(self, commands):
+        tokens = [self._next_token() for command in commands]
+        writer = threading.Thread(target=self._send, args=(list(zip(tokens, commands)), True))
+        writer.start()
+        results = []
+        started = time.monotonic()
+        try:
+            for token, command in zip(tokens, commands):
+                rc, output = self._read_result(token, command)
+                # the host runs the commands in order, each one ends when the previous did
+                finished = time.monotonic()
+                results.append(dict(command=command, rc=rc, output=output, elapsed=finished - started))
+                started = finished
+        finally:
+            writer.join()
+        return results
+
+    def _next_token(self):
+        self._token += 1
+        return f"C{self._token}"
+
+    def _send(self, commands, ignore_errors=False):
+        # a session killed by reset() is started again on its next command
+        if self.process is None and not (self._restart and self.start()):
+            raise RuntimeError("TSO session is not running")
+        try:
+            for token, command in commands:
+                self.process.stdin.write(f"{token} {command}\n".encode())
+            self.process.stdin.flush()
+        except OSError as e:
+            if not ignore_errors:
+                raise RuntimeError(f"Error sending command to TSO session: {e}")
+
+    def stream(self, command):
+        token = self._next_token()
+        self._send([(token, command)])
+        lines = self._read_lines(token, command)
+        try:
+            for line in lines:
+                yield line
+        finally:
+            for line in lines:
+                pass
+
+    def _read_result(self, token, command, timeout=None):
+        output = join_lines(self._read_lines(token, command, timeout))
+        return self.last_rc, output
+
+    def _read_lines(self, token, command, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                line = self._readline(deadline)
+            except TimeoutError:
+                raise TsoCommandTimeout(command, timeout)
+            if line is None:
+                raise RuntimeError(f"TSO session ended while running: {command}")
+            if line.startswith(TSO_SESSION_SENTINEL):
+                fields = line.split()
+                if len(fields) >= 2 and fields[1] == token:
+                    self.last_rc = int(fields[2]) if len(fields) > 2 and fields[2].lstrip("-").isdigit() else -1
+                    return
+            yield line
+
+    def _readline(self, deadline=None):
+        fd = self.process.stdout.fileno()
+        while True:
+            end = self._buffer.find(b"\n", self._position)
+            if end >= 0:
+                line = self._buffer[self._position:end]
+                self._position = end + 1
+                return line.decode(errors="replace").rstrip("\r")
+            # drop the lines already returned before reading more, not after every line
+            del self._buffer[:self._position]
+            self._position = 0
+            if deadline is not None:
+                ready, _, _ = select.select([fd], [], [], max(deadline - time.monotonic(), 0))
+                if not ready:
+                    raise TimeoutError()
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                if not self._buffer:
+                    return None
+                line = bytes(self._buffer)
+                self._buffer.clear()
+                return line.decode(errors="replace")
+            self._buffer += chunk
+
+    def reset(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+            self._restart = True
+        self._buffer.clear()
+        self._position = 0
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.process.stdin.write(b"@@RACF-QUIT@@\n")
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        if self._host_script:
+            os.remove(self._host_script)
+            self._host_script = None
+
+
+def open_transport(host_command=None):
+    kind, _, transcript_path = os.environ.get(RACF_TRANSPORT_ENV, "").partition(":")
+    if kind not in RACF_TRANSPORT_KINDS:
+        raise RuntimeError(f"Unknown {RACF_TRANSPORT_ENV} {kind}, expected one of {', '.join(RACF_TRANSPORT_KINDS[1:])}")
+    if kind == "replay":
+        return ReplayTransport(transcript_path)
+    transport = None
+    if kind in ("", "record") and os.environ.get(RACF_BROKER_SOCKET_ENV):
+        from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_broker import connect_broker
+        transport = connect_broker(os.environ[RACF_BROKER_SOCKET_ENV])
+    if transport is None and kind != "subprocess":
+        transport = _start_session(host_command)
+    if transport is None:
+        transport = SubprocessTransport()
+    if kind == "record":
+        transport = RecordingTransport(transport, transcript_path)
+    return transport
+
+
+@contextmanager
+def tso_session(host_command=None):
+    global _active_session
+    if _active_session is not None:
+        yield _active_session
+        return
+    session = open_transport(host_command)
+    _active_session = session
     try:
-        command_results = subprocess.run([command], capture_output=True, shell=True)
-        return command_results.stdout.decode()
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Error executing TSO command: {e}")
+        yield session
+    finally:
+        _active_session = None
+        session.close()
+
+
+@contextmanager
+def tso_worker_session(host_command=None):
+    # a session runs one command at a time, every worker thread opens its own
+    session = open_transport(host_command)
+    _worker_sessions.session = session
+    try:
+        yield session
+    finally:
+        _worker_sessions.session = None
+        session.close()
+
+
+@contextmanager
+def current_transport():
+    # outside of tso_session() every call opens its own transport
+    session = getattr(_worker_sessions, "session", None) or _active_session
+    if session is not None:
+        yield session
+        return
+    with open_transport() as transport:
+        yield transport
+
+
+def run_tso_command(command):
+    return run_tso_commands([command])[0]
+
+
+def run_tso_commands(commands):
+    commands = list(commands)
+    if not commands:
+        return []
+    policy = CommandPolicy.from_environment()
+    with current_transport() as transport, command_slot(commands):
+        if policy.enabled:
+            # timeouts and retries are per command, the batch is not pipelined,
+            # changes issued before a read that fails are still reported
+            command_results = []
+            for command in commands:
+                command_results.append(record_executed_change(run_with_policy(transport, command, policy)))
+            return record_command_results(command_results)
+        return record_command_results([record_executed_change(command_result) for command_result in transport.run_many(commands)])
+
+
+def record_executed_change(command_result):
+    if not is_read_command(command_result["command"]):
+        _executed_changes.append(command_result["command"])
+    return command_result
+
+
+class CommandPolicy:
+    # Timeouts apply to every command, retries and hedged reads only to
+    # commands that do not change RACF.
+    def __init__(self, timeout=None, timeouts=None, read_retries=2, backoff=0.5, hedge_after=None, enabled=True):
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.read_retries = read_retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.enabled = enabled
+
+    @classmethod
+    def from_environment(cls):
+        timeouts = {}
+        for entry in os.environ.get(RACF_COMMAND_TIMEOUTS_ENV, "").split(","):
+            verb, _, seconds = entry.partition("=")
+            if verb.strip():
+                timeouts[" ".join(verb.split()).upper()] = float(seconds)
+        timeout = os.environ.get(RACF_COMMAND_TIMEOUT_ENV)
+        hedge_after = os.environ.get(RACF_HEDGE_AFTER_ENV)
+        return cls(
+            timeout=float(timeout) if timeout else None,
+            timeouts=timeouts,
+            read_retries=int(os.environ.get(RACF_READ_RETRIES_ENV) or 2),
+            backoff=float(os.environ.get(RACF_RETRY_BACKOFF_ENV) or 0.5),
+            hedge_after=float(hedge_after) if hedge_after else None,
+            enabled=any(os.environ.get(name) for name in (
+                RACF_COMMAND_TIMEOUT_ENV, RACF_COMMAND_TIMEOUTS_ENV, RACF_READ_RETRIES_ENV, RACF_HEDGE_AFTER_ENV,
+            )),
+        )
+
+    def timeout_for(self, command):
+        return self.timeouts.get(command_verb(command), self.timeout)
+
+    def backoff_for(self, retry):
+        # exponential with jitter so parallel hosts do not retry in step
+        return self.backoff * 2 ** retry * random.uniform(0.5, 1.5)
+
+
+def run_with_policy(transport, command, policy):
+    read = is_read_command(command)
+    timeout = policy.timeout_for(command)
+    retries = policy.read_retries if read else 0
+    started = time.monotonic()
+    for attempt in range(retries + 1):
+        if attempt:
+            delay = policy.backoff_for(attempt - 1)
+            record_command_event("retry", command, attempt, delay)
+            time.sleep(delay)
+        attempt_started = time.monotonic()
+        try:
+            if read and policy.hedge_after is not None:
+                rc, output = hedged_run(transport, command, timeout, policy.hedge_after, attempt)
+            else:
+                rc, output = transport.run(command, timeout)
+            return dict(command=command, rc=rc, output=output, elapsed=time.monotonic() - started)
+        except RuntimeError as e:
+            error = e
+            record_command_event("timeout" if isinstance(e, TsoCommandTimeout) else "error", command, attempt, time.monotonic() - attempt_started)
+            transport.reset()
+    if read:
+        raise error
+    # a write is never repeated, it fails like a command RACF rejected
+    return dict(command=command, rc=None, output="", elapsed=time.monotonic() - started)
+
+
+def hedged_run(transport, command, timeout, hedge_after, attempt=0):
+    # A read still running after hedge_after is raced by a second one run
+    # through tsocmd, the first answer wins and the other one is dropped.
+    answers = queue.Queue()
+
+    def run(name, run_transport):
+        try:
+            answers.put((name, run_transport.run(command, timeout), None))
+        except Exception as e:
+            answers.put((name, None, e))
+
+    started = time.monotonic()
+    primary = threading.Thread(target=run, args=("primary", transport), daemon=True)
+    primary.start()
+    hedge = None
+    pending = 1
+    error = None
+    while pending:
+        try:
+            name, answer, failure = answers.get(timeout=None if hedge else hedge_after)
+        except queue.Empty:
+            record_command_event("hedge", command, attempt, time.monotonic() - started)
+            hedge = SubprocessTransport()
+            threading.Thread(target=run, args=("hedge", hedge), daemon=True).start()
+            pending += 1
+            continue
+        pending -= 1
+        if failure is None:
+            if hedge is not None:
+                record_command_event(f"{name}_won", command, attempt, time.monotonic() - started)
+            break
+        error = failure
+    else:
+        raise error if isinstance(error, RuntimeError) else RuntimeError(f"Error running TSO command: {error}")
+    if hedge is not None:
+        hedge.reset()
+    if primary.is_alive():
+        transport.reset()
+        primary.join()
+    return answer
+
+
+def record_command_event(event, command, attempt, elapsed):
+    command_event = dict(event=event, verb=command_verb(command), attempt=attempt, elapsed=round(elapsed, 3))
+    if is_read_command(command):
+        # write commands can carry passwords
+        command_event["command"] = command
+    _command_events.append(command_event)
+
+
+def worker_count(workers=None):
+    # more workers than RACF_MAX_CONCURRENCY slots would only wait for a slot
+    workers = workers or RACF_WORKERS
+    limiter = get_command_limiter()
+    return min(workers, limiter.max_concurrency) if limiter is not None else workers
+
+
+def map_concurrently(function, items, workers=None):
+    # Runs function over items on a bounded pool of threads, each with its own
+    # TSO session, and returns the results in the order of items.
+    items = list(items)
+    results = [None] * len(items)
+    pending = queue.Queue()
+    for index, item in enumerate(items):
+        pending.put((index, item))
+
+    def work():
+        with tso_worker_session():
+            while True:
+                try:
+                    index, item = pending.get_nowait()
+                except queue.Empty:
+                    return
+                results[index] = function(item)
+
+    workers = min(worker_count(workers), len(items))
+    if not workers:
+        return results
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(work) for worker in range(workers)]:
+            future.result()
+    return results
+
+
+def _start_session(host_command=None):
+    global _session_unavailable, _session_start_time
+    if _session_unavailable or os.environ.get(TSO_SESSION_DISABLE_ENV):
+        return None
+    session = TsoSession(host_command)
+    started = time.monotonic()
+    session_started = session.start()
+    _session_start_time += time.monotonic() - started
+    if session_started:
+        return session
+    _session_unavailable = True
+    return None
+
+
+def stream_tso_command(command):
+    with command_slot([command]):
+        if _metrics is None:
+            yield from _stream_tso_lines(command, {})
+            return
+        status = {}
+        elapsed = 0.0
+        output_bytes = 0
+        lines = _stream_tso_lines(command, status)
+        started = time.monotonic()
+        try:
+            for line in lines:
+                # time spent by the caller between lines is parse time, not command time
+                elapsed += time.monotonic() - started
+                output_bytes += len(line) + 1
+                yield line
+                started = time.monotonic()
+            elapsed += time.monotonic() - started
+        finally:
+            closing = time.monotonic()
+            lines.close()
+            elapsed += time.monotonic() - closing
+            _metrics.record_command(command, elapsed, output_bytes, status.get("rc"))
+
+
+def _stream_tso_lines(command, status):
+    policy = CommandPolicy.from_environment()
+    with current_transport() as transport:
+        if policy.enabled:
+            # the output is buffered so a retried read is not parsed twice
+            command_result = run_with_policy(transport, command, policy)
+            status["rc"] = command_result["rc"]
+            yield from command_result["output"].splitlines()
+            return
+        try:
+            yield from transport.stream(command)
+        finally:
+            status["rc"] = transport.last_rc
+
+
+def get_cached_profile(profile_type, profile_name, command):
+    return _active_session.cache_get(profile_type, profile_name, command) if _active_session is not None else None
+
+
+def put_cached_profile(profile_type, profile_name, command, profile):
+    if _active_session is not None:
+        _active_session.cache_put(profile_type, profile_name, command, profile)
+
+
+def tee_lines(lines, output_lines):
+    for line in lines:
+        output_lines.append(line)
+        yield line
+
+
+def join_lines(output_lines):
+    return "".join(f"{line}\n" for line in output_lines)
+
+
+def finish_result(result):
+    if _compaction is not None:
+        compact, params = _compaction
+        compact(result, params)
+    try:
+        limiter = get_command_limiter()
+    except RuntimeError:
+        # the lock directory could not be created, the task fails with that message
+        limiter = None
+    if limiter is not None:
+        result["queue_wait"] = round(limiter.wait_time, 3)
+    if _metrics is not None:
+        result["racf_metrics"] = _metrics.summary()
+    if _profiler is not None:
+        result["racf_profile"] = _profiler.finish()
+    if _command_events:
+        result["command_events"] = list(_command_events)
+    return result
+
+
+def output_options():
+    return dict(
+        return_output=dict(type="bool", required=False, default=False),
+        output_limit=dict(type="int", required=False, default=RACF_OUTPUT_LIMIT),
+        compress_output=dict(type="bool", required=False, default=False),
+        fields=dict(type="list", required=False, elements="str"),
+    )
+
+
+def start_result_compaction(compact, params):
+    global _compaction
+    _compaction = (compact, params)
+
+
+def start_module(module, compact, result=None):
+    global _module, _result
+    _module = module
+    _result = result
+    del _command_events[:]
+    del _executed_changes[:]
+    start_metrics(module.params["metrics"])
+    start_result_compaction(compact, module.params)
+
+
+def compact_output(container, key, params):
+    output = container.pop(key, None)
+    if output is None or not params["return_output"]:
+        return container
+    limit = params["output_limit"]
+    if params["compress_output"]:
+        container[f"{key}_zlib"] = base64.b64encode(zlib.compress(output.encode())).decode()
+    elif limit and len(output) > limit:
+        container[key] = f"{output[:limit]}\n... {len(output) - limit} characters truncated\n"
+    else:
+        container[key] = output
+    return container
+
+
+def compact_profile(profile, params, output_key=None):
+    if not isinstance(profile, dict):
+        return profile
+    if params["fields"]:
+        for key in [key for key in profile if key not in params["fields"] and key != output_key]:
+            del profile[key]
+    if output_key is not None:
+        compact_output(profile, output_key, params)
+    return profile
+
+
+class ModuleProfiler:
+    def __init__(self, name, target, memory=False, top=20):
+        self.name = name
+        self.target = target
+        self.memory = memory
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.report = None
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start()
+        self.profile.enable()
+
+    def finish(self):
+        if self.report is not None:
+            return self.report
+        self.profile.disable()
+        snapshot = None
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if self.target == "result":
+            self.report = dict(functions=self.top_functions())
+            if snapshot is not None:
+                self.report["memory"] = self.top_allocations(snapshot)
+                self.report["memory_peak"] = peak
+            return self.report
+        stats_file = self.target
+        if os.path.isdir(stats_file):
+            stats_file = os.path.join(stats_file, f"{self.name}.{os.getpid()}.prof")
+        self.profile.dump_stats(stats_file)
+        self.report = dict(stats_file=stats_file)
+        if snapshot is not None:
+            snapshot.dump(f"{stats_file}.tracemalloc")
+            self.report.update(memory_file=f"{stats_file}.tracemalloc", memory_peak=peak)
+        return self.report
+
+    def top_functions(self):
+        stats = pstats.Stats(self.profile).stats
+        hottest = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        return [
+            dict(function=f"{os.path.basename(filename)}:{line}({function})", calls=calls, total_time=round(total_time, 6), cumulative_time=round(cumulative_time, 6))
+            for (filename, line, function), (primitive_calls, calls, total_time, cumulative_time, callers) in hottest
+        ]
+
+    def top_allocations(self, snapshot):
+        return [
+            dict(location=f"{os.path.basename(statistic.traceback[0].filename)}:{statistic.traceback[0].lineno}", size=statistic.size, count=statistic.count)
+            for statistic in snapshot.statistics("lineno")[:self.top]
+        ]
+
+
+def run_racf_module(run_module, name):
+    try:
+        return run_profiled(run_module, name)
+    except RuntimeError as e:
+        # timeouts and reads that failed every retry end the task with the
+        # result so far and the changes already issued
+        if _module is None:
+            raise
+        result = dict(_result or {}, msg=str(e))
+        result["changed"] = bool(result.get("changed") or _executed_changes)
+        result["executed_commands"] = list(_executed_changes)
+        _module.fail_json(**finish_result(result))
+
+
+def run_profiled(run_module, name):
+    global _profiler
+    target = os.environ.get(RACF_PROFILE_ENV)
+    if not target:
+        return run_module()
+    _profiler = ModuleProfiler(
+        name, target,
+        memory=bool(os.environ.get(RACF_PROFILE_MEMORY_ENV)),
+        top=int(os.environ.get(RACF_PROFILE_TOP_ENV) or 20),
+    )
+    _profiler.start()
+    try:
+        return run_module()
+    finally:
+        # exit_json and fail_json finish the profile through finish_result,
+        # this covers runs that end with an exception
+        _profiler.finish()
+        _profiler = None
+
+
+class RacfMetrics:
+    def __init__(self):
+        self.commands = []
+        self.command_time = 0.0
+        self.parse_time = 0.0
+        self.parses = 0
+        self.lock = threading.Lock()
+
+    def record_command(self, command, elapsed, output_bytes, rc):
+        with self.lock:
+            self.commands.append(dict(verb=command_verb(command), elapsed=round(elapsed, 6), bytes=output_bytes, rc=rc))
+            self.command_time += elapsed
+
+    def record_parse(self, elapsed):
+        with self.lock:
+            self.parse_time += elapsed
+            self.parses += 1
+
+    def summary(self):
+        return dict(
+            commands=self.commands,
+            command_time=round(self.command_time, 6),
+            parse_time=round(self.parse_time, 6),
+            parses=self.parses,
+            session_start=round(_session_start_time, 6),
+        )
+
+
+def start_metrics(enabled):
+    global _metrics
+    if enabled or os.environ.get(RACF_METRICS_ENV):
+        _metrics = RacfMetrics()
+    return _metrics
+
+
+def command_verb(command):
+    words = command.split()
+    if not words:
+        return ""
+    verb = words[0].upper()
+    if verb != "RACDCERT":
+        return verb
+    # RACDCERT LIST, RACDCERT ID(USER) LISTRING(RING), RACDCERT CERTAUTH ADD(...)
+    operations = [word.split("(")[0].upper() for word in words[1:] if not word.upper().startswith(("ID(", "CERTAUTH", "SITE"))]
+    return f"RACDCERT {operations[0]}" if operations else verb
+
+
+def record_command(command, elapsed, output, rc):
+    if _metrics is not None:
+        _metrics.record_command(command, elapsed, len(output), rc)
+
+
+def record_command_results(command_results):
+    for command_result in command_results:
+        elapsed = command_result.pop("elapsed", 0.0)
+        record_command(command_result["command"], elapsed, command_result["output"], command_result["rc"])
+    return command_results
+
+
+def timed_parse(parse):
+    @functools.wraps(parse)
+    def timed(*args, **kwargs):
+        metrics = _metrics
+        if metrics is None:
+            return parse(*args, **kwargs)
+        started = time.monotonic()
+        command_time = metrics.command_time
+        try:
+            return parse(*args, **kwargs)
+        finally:
+            # a streamed listing the parser stopped reading early is finished now,
+            # its command time and the time of commands run while parsing are left out
+            for arg in args:
+                if hasattr(arg, "close"):
+                    arg.close()
+            metrics.record_parse(time.monotonic() - started - (metrics.command_time - command_time))
+    return timed
+
+
+def check_tso_command(command_result):
+    messages = RACF_MESSAGE_PATTERN.findall(command_result["output"])
+    command_result["messages"] = [message for message, severity in messages]
+    command_result["succeeded"] = command_result["rc"] == 0 and not any(severity in "ES" for message, severity in messages)
+    return command_result
+
+
+def command_failed(command_result, verify):
+    # messages checks the return code and the message severities, none the
+    # return code only, full leaves it to the listing taken after the change
+    if verify == "messages":
+        return not command_result["succeeded"]
+    return verify == "none" and command_result["rc"] != 0
+
+
+def check_command_results(result, command_results, verify):
+    result["messages"] = [message for command_result in command_results for message in command_result["messages"]]
+    failed_commands = [command_result["command"] for command_result in command_results if command_failed(command_result, verify)]
+    if failed_commands:
+        result["failed"] = True
+        result["msg"] = f"RACF command failed: {'; '.join(failed_commands)}"
+    return result
+
+
+def verify_command_results(module, result, command_results):
+    check_command_results(result, command_results, module.params["verify"])
+    if result.get("failed"):
+        module.fail_json(**finish_result(result))
+
+
+class TsoCommandBatch:
+    def __init__(self, commands=None):
+        self.commands = list(commands or [])
+
+    def add(self, command):
+        self.commands.append(command)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def flush(self):
+        commands, self.commands = self.commands, []
+        return run_tso_commands(commands)
+
 
 def generate_keyring_owner_suffix(owner):
-    return f"ID({owner})" if owner else ""
\ No newline at end of file
+    return f"ID({owner})" if owner else ""
@@ -0,0 +1,158 @@
+import fcntl
+import hashlib
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+RACF_MAX_CONCURRENCY_ENV = "RACF_MAX_CONCURRENCY"
+RACF_LOCK_DIR_ENV = "RACF_LOCK_DIR"
+RACF_LOCK_POLL_INTERVAL = 0.005
+RACF_LOCK_MAX_POLL_INTERVAL = 0.1
+RACF_LOCK_STRIPES = 64
+
+READ_COMMAND_PATTERN = re.compile(
+    r"^\s*(?:LU|LISTUSER|LG|LISTGRP|RL|RLIST|LD|LISTDSD|SR|SEARCH|TIME|RACDCERT\s+(?:LIST|LISTRING|LISTCHAIN|LISTMAP|LISTTOKEN))\b",
+    re.IGNORECASE,
+)
+USER_COMMAND_PATTERN = re.compile(
+    r"^\s*(?:AU|ADDUSER|ALU|ALTUSER|DU|DELUSER|CO|CONNECT|RE|REMOVE|PW|PASSWORD)\s+(?:\(([^)]*)\)|(\S+))",
+    re.IGNORECASE,
+)
+GROUP_KEYWORD_PATTERN = re.compile(r"\bGROUP\(([^)]*)\)", re.IGNORECASE)
+RACDCERT_OWNER_PATTERN = re.compile(r"\bID\(([^)]*)\)|\b(CERTAUTH|SITE)\b", re.IGNORECASE)
+
+_limiter = None
+
+
+def is_read_command(command):
+    return READ_COMMAND_PATTERN.match(command) is not None
+
+
+def profile_stripe(profile):
+    return int(hashlib.sha256(profile.encode()).hexdigest()[:8], 16) % RACF_LOCK_STRIPES
+
+
+def command_profiles(command):
+    words = command.split()
+    if not words or is_read_command(command):
+        return None
+    verb = words[0].upper()
+    if verb == "RACDCERT":
+        owners = [owner or keyword for owner, keyword in RACDCERT_OWNER_PATTERN.findall(command)]
+        return [f"certificate:{owners[-1].upper() if owners else ''}"]
+    user_command = USER_COMMAND_PATTERN.match(command)
+    if user_command is not None:
+        # a connect or remove changes the listing of its group as well
+        groups = [f"group:{group.strip().upper()}" for group in GROUP_KEYWORD_PATTERN.findall(command)]
+        users = (user_command.group(1) or user_command.group(2)).upper().split()
+        return [f"user:{user}" for user in users] + groups
+    return [f"{verb}:{words[1].strip('()').upper() if len(words) > 1 else ''}"]
+
+
+class RacfCommandLimiter:
+    def __init__(self, max_concurrency, lock_dir):
+        self.max_concurrency = max_concurrency
+        self.lock_dir = lock_dir
+        self.wait_time = 0.0
+        self.waits = 0
+        self.local = threading.local()
+        os.makedirs(lock_dir, mode=0o700, exist_ok=True)
+
+    @contextmanager
+    def acquire(self, commands):
+        if getattr(self.local, "held", False):
+            # flock is per open file, a nested acquire would wait on ourselves
+            yield
+            return
+        profiles = {profile for command in commands for profile in command_profiles(command) or []}
+        # profiles share a fixed set of stripe locks, a batch holds at most
+        # RACF_LOCK_STRIPES of them whatever the number of profiles it changes
+        stripes = sorted({profile_stripe(profile) for profile in profiles})
+        started = time.time()
+        locks = []
+        try:
+            try:
+                for stripe in stripes:
+                    locks.append(self._lock_file(f"stripe.{stripe}"))
+                    fcntl.flock(locks[-1], fcntl.LOCK_EX)
+                locks.append(self._acquire_writer_slot() if profiles else self._acquire_reader_slot())
+            except OSError as e:
+                raise RuntimeError(f"Unable to lock the RACF command slots in {self.lock_dir}: {e}")
+            self.wait_time += time.time() - started
+            self.waits += 1
+            self.local.held = True
+            yield
+        finally:
+            self.local.held = False
+            for lock in reversed(locks):
+                os.close(lock)
+
+    def _acquire_reader_slot(self):
+        # Waiting readers hold the readers file shared, writers do not take a
+        # slot while they can not lock it exclusively.
+        readers = self._lock_file("readers.waiting")
+        try:
+            fcntl.flock(readers, fcntl.LOCK_SH)
+            return self._poll_slots(range(self.max_concurrency))
+        finally:
+            os.close(readers)
+
+    def _acquire_writer_slot(self):
+        # The last slot is left to readers so a burst of writers can not starve them.
+        slots = range(max(self.max_concurrency - 1, 1))
+        return self._poll_slots(slots, self._readers_waiting)
+
+    def _readers_waiting(self):
+        readers = self._lock_file("readers.waiting")
+        try:
+            fcntl.flock(readers, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(readers)
+        return False
+
+    def _poll_slots(self, slots, yield_to=None):
+        interval = RACF_LOCK_POLL_INTERVAL
+        while True:
+            if yield_to is None or not yield_to():
+                for slot in slots:
+                    slot_lock = self._lock_file(f"slot.{slot}")
+                    try:
+                        fcntl.flock(slot_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        return slot_lock
+                    except BlockingIOError:
+                        os.close(slot_lock)
+            time.sleep(interval * random.uniform(0.5, 1.5))
+            interval = min(interval * 2, RACF_LOCK_MAX_POLL_INTERVAL)
+
+    def _lock_file(self, name):
+        return os.open(os.path.join(self.lock_dir, name), os.O_RDWR | os.O_CREAT, 0o600)
+
+
+def get_command_limiter():
+    global _limiter
+    max_concurrency = int(os.environ.get(RACF_MAX_CONCURRENCY_ENV) or 0)
+    if max_concurrency <= 0:
+        return None
+    if _limiter is None or _limiter.max_concurrency != max_concurrency:
+        lock_dir = os.environ.get(RACF_LOCK_DIR_ENV) or os.path.join(tempfile.gettempdir(), f"racf_locks_{os.getuid()}")
+        try:
+            _limiter = RacfCommandLimiter(max_concurrency, lock_dir)
+        except OSError as e:
+            raise RuntimeError(f"Unable to create the RACF lock directory {lock_dir}: {e}")
+    return _limiter
+
+
+@contextmanager
+def command_slot(commands):
+    limiter = get_command_limiter()
+    if limiter is None:
+        yield
+        return
+    with limiter.acquire(commands):
+        yield
@@ -0,0 +1,55 @@
+import re
+
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_helper import timed_parse
+
+RING_CERTIFICATE_KEYS = ("cert_label", "cert_owner", "cert_usage", "cert_default")
+RING_COLUMN_PATTERN = re.compile(r"-+")
+
+
+def ring_columns(dashes):
+    # a column starts at its row of dashes and ends where the next one starts,
+    # values wider than their dashes (YES under DEFAULT) stay in their column
+    starts = [match.start() for match in RING_COLUMN_PATTERN.finditer(dashes)]
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def ring_certificate(line, columns):
+    values = [line[start:end].strip() for start, end in columns]
+    values += [""] * (len(RING_CERTIFICATE_KEYS) - len(values))
+    return dict(zip(RING_CERTIFICATE_KEYS, values))
+
+
+def index_rings(lines):
+    # LISTRING(*) lists every ring of the owner, each one after a "Ring:" line
+    # holding its name as >NAME< on the next line
+    rings = {}
+    ring = ""
+    columns = None
+    ring_name_next = False
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if ring_name_next:
+            ring = stripped.strip("><")
+            rings.setdefault(ring, [])
+            ring_name_next = False
+        elif stripped == "Ring:":
+            ring_name_next = True
+            columns = None
+        elif columns is None:
+            if stripped.startswith("---"):
+                columns = ring_columns(line)
+        else:
+            rings.setdefault(ring, []).append(ring_certificate(line, columns))
+    return rings
+
+
+@timed_parse
+def parse_rings(lines):
+    return index_rings(lines)
+
+
+@timed_parse
+def parse_ring_certificates(lines):
+    return [certificate for certificates in index_rings(lines).values() for certificate in certificates]
@@ -0,0 +1,227 @@
+import os
+import re
+import sqlite3
+
+# Column positions (1-based, inclusive) of the IRRDBU00 records loaded into the
+# index, as documented for the RACF database unload utility.
+UNLOAD_RECORDS = {
+    "0100": ("groups", (
+        ("name", 6, 13),
+        ("superior_group", 15, 22),
+        ("create_date", 24, 33),
+        ("owner", 35, 42),
+        ("uacc", 44, 51),
+        ("installation_data", 58, 312),
+    )),
+    "0102": ("group_members", (
+        ("name", 6, 13),
+        ("member", 15, 22),
+        ("auth", 24, 31),
+    )),
+    "0200": ("users", (
+        ("name", 6, 13),
+        ("create_date", 15, 24),
+        ("owner", 26, 33),
+        ("special", 40, 43),
+        ("oper", 45, 48),
+        ("revoke", 50, 53),
+        ("password_interval", 60, 62),
+        ("password_date", 64, 73),
+        ("user_name_info", 75, 94),
+        ("default_group", 96, 103),
+        ("last_job_time", 105, 112),
+        ("last_job_date", 114, 123),
+        ("installation_data", 125, 379),
+    )),
+    "0205": ("user_connects", (
+        ("name", 6, 13),
+        ("group_name", 15, 22),
+        ("connect_date", 24, 33),
+        ("owner", 35, 42),
+        ("last_connect_time", 44, 51),
+        ("last_connect_date", 53, 62),
+        ("uacc", 64, 71),
+        ("connect_count", 73, 77),
+        ("special", 84, 87),
+        ("oper", 89, 92),
+        ("revoke", 94, 97),
+        ("group_access", 99, 102),
+        ("auditor", 109, 112),
+        ("revoke_date", 114, 123),
+        ("resume_date", 125, 134),
+    )),
+    "0210": ("user_dfp", (
+        ("name", 6, 13),
+        ("dataappl", 15, 22),
+        ("dataclass", 24, 31),
+        ("mgmtclass", 33, 40),
+        ("storclass", 42, 49),
+    )),
+    "0220": ("user_tso", (
+        ("name", 6, 13),
+        ("acctnum", 15, 54),
+        ("command", 56, 135),
+        ("dest", 137, 144),
+        ("holdclass", 146, 146),
+        ("jobclass", 148, 148),
+        ("proc", 150, 157),
+        ("size", 159, 168),
+        ("msgclass", 170, 170),
+        ("maxsize", 172, 181),
+        ("sysoutclass", 194, 194),
+        ("userdata", 196, 203),
+    )),
+    "0270": ("user_omvs", (
+        ("name", 6, 13),
+        ("uid", 15, 24),
+        ("home", 26, 1048),
+        ("program", 1050, 2072),
+        ("cputimemax", 2074, 2083),
+        ("assizemax", 2085, 2094),
+        ("fileprocmax", 2096, 2105),
+        ("procusermax", 2107, 2116),
+        ("threadsmax", 2118, 2127),
+        ("mmapareamax", 2129, 2138),
+    )),
+    "0560": ("certificates", (
+        ("name", 6, 251),
+        ("class_name", 253, 260),
+        ("start_date", 262, 271),
+        ("start_time", 273, 280),
+        ("end_date", 282, 291),
+        ("end_time", 293, 300),
+        ("key_type", 302, 309),
+        ("key_size", 311, 320),
+        ("last_serial", 322, 337),
+    )),
+}
+
+UNLOAD_INDEXES = (
+    ("groups", "name"),
+    ("group_members", "name"),
+    ("group_members", "member"),
+    ("users", "name"),
+    ("users", "default_group"),
+    ("user_connects", "name"),
+    ("user_connects", "group_name"),
+    ("user_dfp", "name"),
+    ("user_tso", "name"),
+    ("user_omvs", "name"),
+    ("user_omvs", "uid"),
+    ("certificates", "end_date"),
+)
+
+UNLOAD_INSERT_CHUNK = 5000
+UNLOAD_READ_CHUNK = 1 << 20
+# an unload copied to a file in EBCDIC ends its records with NL (U+0085 once
+# decoded), one converted to ASCII with LF or CR LF
+UNLOAD_LINE_END = re.compile("\r\n?|\n|\x85")
+
+
+def iter_unload_lines(unload_path, encoding="cp1047"):
+    pending = ""
+    with open(unload_path, encoding=encoding, errors="replace", newline="") as unload:
+        for chunk in iter(lambda: unload.read(UNLOAD_READ_CHUNK), ""):
+            lines = UNLOAD_LINE_END.split(pending + chunk)
+            pending = lines.pop()
+            yield from lines
+    if pending:
+        yield pending
+
+
+def iter_unload_records(unload_path, encoding="cp1047"):
+    for line in iter_unload_lines(unload_path, encoding):
+        record = UNLOAD_RECORDS.get(line[:4])
+        if record is None:
+            continue
+        table, fields = record
+        yield table, tuple(line[start - 1:end].strip() for name, start, end in fields)
+
+
+def build_unload_index(unload_path, index_path, encoding="cp1047"):
+    building_path = f"{index_path}.building"
+    if os.path.exists(building_path):
+        os.remove(building_path)
+    connection = sqlite3.connect(building_path)
+    try:
+        connection.execute("PRAGMA journal_mode=OFF")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.execute("CREATE TABLE unload_source (path TEXT, size INTEGER, mtime REAL)")
+        for table, fields in UNLOAD_RECORDS.values():
+            connection.execute(f"CREATE TABLE {table} ({', '.join(f'{name} TEXT' for name, start, end in fields)})")
+        pending = {table: [] for table, fields in UNLOAD_RECORDS.values()}
+        record_counts = {table: 0 for table in pending}
+        for table, values in iter_unload_records(unload_path, encoding):
+            pending[table].append(values)
+            record_counts[table] += 1
+            if len(pending[table]) >= UNLOAD_INSERT_CHUNK:
+                insert_unload_rows(connection, table, pending[table])
+                pending[table] = []
+        for table, rows in pending.items():
+            insert_unload_rows(connection, table, rows)
+        for table, column in UNLOAD_INDEXES:
+            connection.execute(f"CREATE INDEX {table}_{column} ON {table} ({column})")
+        source = os.stat(unload_path)
+        connection.execute("INSERT INTO unload_source VALUES (?, ?, ?)", (os.path.abspath(unload_path), source.st_size, source.st_mtime))
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(building_path, index_path)
+    return record_counts
+
+
+def insert_unload_rows(connection, table, rows):
+    if rows:
+        connection.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' for value in rows[0])})", rows)
+
+
+def unload_index_is_current(unload_path, index_path):
+    if not os.path.exists(index_path):
+        return False
+    source = os.stat(unload_path)
+    connection = sqlite3.connect(index_path)
+    try:
+        indexed = connection.execute("SELECT size, mtime FROM unload_source").fetchone()
+    except sqlite3.Error:
+        return False
+    finally:
+        connection.close()
+    return indexed is not None and indexed[0] == source.st_size and indexed[1] == source.st_mtime
+
+
+def open_unload_index(index_path):
+    connection = sqlite3.connect(index_path)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def query_group_members(connection, group):
+    # RACF names are stored uppercase
+    group = group.upper()
+    rows = connection.execute(
+        "SELECT name AS user, group_name, owner, connect_date, revoke FROM user_connects WHERE group_name = ? ORDER BY name",
+        (group,),
+    )
+    return [dict(row) for row in rows]
+
+
+def query_user(connection, user):
+    user = user.upper()
+    row = connection.execute("SELECT * FROM users WHERE name = ?", (user,)).fetchone()
+    if row is None:
+        return None
+    user_info = dict(row)
+    user_info["user_group_connects"] = [
+        dict(connect) for connect in connection.execute("SELECT * FROM user_connects WHERE name = ? ORDER BY group_name", (user,))
+    ]
+    for segment, table in (("user_tso_segment", "user_tso"), ("user_dfp_segment", "user_dfp"), ("user_omvs_segment", "user_omvs")):
+        user_info[segment] = [dict(item) for item in connection.execute(f"SELECT * FROM {table} WHERE name = ?", (user,))]
+    return user_info
+
+
+def query_expiring_certificates(connection, days):
+    rows = connection.execute(
+        "SELECT * FROM certificates WHERE end_date >= date('now') AND end_date <= date('now', ?) ORDER BY end_date, end_time",
+        (f"+{int(days)} days",),
+    )
+    return [dict(row) for row in rows]
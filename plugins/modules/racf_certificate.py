@@ -64,6 +64,60 @@ options:
         description: When true module will only execute a list to the keyring
         required: false
         type: bool
+    return_output:
+        description:
+            - When true the raw output of the first RACDCERT LIST is returned in `raw_output`, otherwise only the parsed information
+            - Output longer than `output_limit` characters is truncated unless `compress_output` is set
+        required: false
+        type: bool
+        default: false
+    output_limit:
+        description: Maximum number of characters of raw output returned, 0 returns it whole
+        required: false
+        type: int
+        default: 65536
+    compress_output:
+        description: Return the raw output zlib compressed and base64 encoded under `<key>_zlib` instead of truncating it
+        required: false
+        type: bool
+        default: false
+    fields:
+        description:
+            - Keys of the certificates returned, all keys are returned when omitted
+            - Applies to every certificates of `racf_info` and of `results`
+        required: false
+        type: list
+        elements: str
+    certificates:
+        description:
+            - List of certificates processed in a single module run, each item takes `certificate_owner`, `certificate_label`, `distinguished_name` and `state`
+            - The `state` of an item defaults to `present`
+            - Per certificate results are returned in `results`
+        required: false
+        type: list
+        elements: dict
+    batch:
+        description:
+            - List of items handled by the action plugin, each item takes the same options as the task and options set on the task apply to every item
+            - All items are sent to the target in one module run through `certificates` and the per item results are returned in `results`
+            - Looped tasks are coalesced the same way
+        required: false
+        type: list
+        elements: dict
+    metrics:
+        description:
+            - When true the result holds `racf_metrics` with the verb, elapsed seconds, output bytes and return code of every command and the total parse time
+            - Also enabled by the `RACF_METRICS` environment variable on the target, the `billpereira.community_racf.racf_metrics` callback aggregates them at the end of the play
+        required: false
+        type: bool
+        default: false
+    cache_ttl:
+        description:
+            - Seconds a `list_only` result is kept in the controller side cache and reused for the same host and profile
+            - Any run that changes the profile invalidates its cached results
+            - Defaults to the `RACF_INFO_CACHE_TTL` environment variable, 0 disables the cache
+        required: false
+        type: int
 
 
 
@@ -129,25 +183,57 @@ RETURN = r"""
         start_date: 2024/03/01 00:00:00
         trust: TRUST
         user: USERX
+  results:
+    description: Per certificate results when `certificates` is used, each one with the same keys as a single certificate run
+    sample:
+        - certificate_owner: USER01
+          certificate_label: LABEL01
+          changed: false
+          racf_info: list
+  queue_wait:
+    description: Seconds spent waiting for a command slot, returned when `RACF_MAX_CONCURRENCY` is set on the target
+    sample: 0.125
+  racf_metrics:
+    description: Command and parse timings, returned when `metrics` is true
+    sample:
+        commands:
+          - verb: LU
+            elapsed: 0.052
+            bytes: 1480
+            rc: 0
+        command_time: 0.052
+        parse_time: 0.001
+        parses: 1
+        session_start: 0.310
+  racf_profile:
+    description: Hottest functions of the run and, with `RACF_PROFILE_MEMORY`, its top allocations, or the files they were written to, returned when `RACF_PROFILE` is set on the target
+    sample:
+        functions:
+          - function: racf_user.py:266(parse_user_info)
+            calls: 1
+            total_time: 0.0021
+            cumulative_time: 0.0113
+        memory_peak: 233387
+  executed_commands:
+    description: Commands that changed RACF before a timeout or a listing failing all its retries ended the task, returned with that failure only
+    sample: ["CO (USER01) GROUP(APPGRP)"]
+  command_events:
+    description: Timeouts, errors, retries and hedged reads of the TSO commands, returned when any happened. Commands changing RACF are reported by verb only
+    sample:
+        - event: timeout
+          verb: LU
+          command: LU USER01
+          attempt: 0
+          elapsed: 30.001
+        - event: retry
+          verb: LU
+          command: LU USER01
+          attempt: 1
+          elapsed: 0.412
 """
 
-import subprocess
-import re 
-
-# from ..module_utils.racf_helper import generate_keyring_owner_suffix, run_tso_command_and_capture_output
-
-def run_tso_command_and_capture_output(command):
-    try:
-        command_results = subprocess.run([command], capture_output=True, shell=True)
-        return command_results.stdout.decode()
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Error executing TSO command: {e}")
-
-def generate_id_owner_suffix(owner):
-    return f"ID({owner})" if owner else ""
-
-def generate_label_suffix(label):
-    return f"(LABEL(\'{label}\'))" if label else ""
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_helper import compact_output, compact_profile, finish_result, join_lines, output_options, run_racf_module, run_tso_command, start_module, tso_session
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_certificates import generate_id_owner_suffix, generate_label_suffix, list_certificate
 
 def generate_withlabel_suffix(label):
     return f"WITHLABEL(\'{label}\')" if label else ""
@@ -163,82 +249,27 @@ def generate_distinguished_name(distinguished_name):
     sp = f"SP(\'{distinguished_name['state']}\') " if distinguished_name['state'] else ""
     return f" SUBJECTSDN({cn}{t}{ou}{o}{l}{c}{sp})"
 
-def extract_certificates(list_output):
-    user = re.findall('for user (.*):',list_output)
-    list_Label = re.findall('Label:\s(.*)\n',list_output)
-    list_Certificate_ID = re.findall('Certificate ID:\s(.*)\n',list_output)
-    list_Issuers_Name = re.findall('Issuer\'s Name:\W*\s>(.*)<',list_output)
-    list_start_date = re.findall('Start Date:\W*(.*)\n',list_output)
-    list_end_date = re.findall('End Date:\W*(.*)\n',list_output)
-    list_trust_status =  re.findall('Status:\W*(.*)\n',list_output)
-    list_key_type =  re.findall('Key Type:\W*(.*)\n',list_output)
-    list_key_size =  re.findall('Key Size:\W*(.*)\n',list_output)
-    list_serial_number = re.findall('Serial Number:\W*>(.*)<',list_output)
-    list_ring_associations = re.findall('Ring Associations:\s*(.*)\W*', list_output)
-    list_finger_print = re.findall('(?:[0-9A-Fa-f:]{47,48})', list_output)
-    list_finger_print_filtered = [ (a, b) for a,b in zip(list_finger_print[::2], list_finger_print[1::2])]
-    list_common_name = re.findall('Issuer\'s Name:\W*>CN=(.*?)[<\.]', list_output)
-    list_certificates = []
-    for index, label in enumerate(list_Label):
-        ring_info = []
-        if 'No rings' not in list_ring_associations[index]:
-            list_output_from_current = run_tso_command_and_capture_output(f"tsocmd \"RACDCERT LIST{generate_label_suffix(list_Label[index])} {generate_id_owner_suffix(user[0])}\"")
-            ring_owners = re.findall('Ring Owner:\W*(.*?)\s',list_output_from_current)
-            ring_names = re.findall('Ring:\W*\s>(.*)<',list_output_from_current)
-            for ring_index, owner in enumerate(ring_owners):
-                ring_info.append({
-                    'ring_owner': owner,
-                    'keyring':ring_names[ring_index]
-                })
-        else:
-            ring_info.append(list_ring_associations[index])
-        list_certificates.append({
-            'common_name': list_common_name[index],
-            'user':user[0],
-            'label':list_Label[index],
-            'certificate_id':list_Certificate_ID[index],
-            'issuers_name': list_Issuers_Name[index],
-            'start_date': list_start_date[index],
-            'end_date': list_end_date[index],
-            'trust': list_trust_status[index],
-            'key_type': list_key_type[index],
-            'key_size': list_key_size[index],
-            'serial_number': list_serial_number[index],
-            'ring_associations': ring_info,
-            # 'finger_print': ':'.join(list_finger_print[index])
-            'finger_print': ''.join(list_finger_print_filtered[index])
-        })
-    return list_certificates
-    # return list_certificates if len(list_certificates)>0 else [list_output]
-
-
-def list_certificate(certificate_label, certificate_owner):
-    list_certificate_command = f"tsocmd \"RACDCERT LIST{generate_label_suffix(certificate_label)} {generate_id_owner_suffix(certificate_owner)}\""
-    command_output = run_tso_command_and_capture_output(list_certificate_command)
-    results = extract_certificates(command_output)
-    return results
-
 def add_certificate(distinguished_name, label, owner):
-    add_command = f"tsocmd \"RACDCERT GENCERT {generate_distinguished_name(distinguished_name)} {generate_withlabel_suffix(label)} {generate_id_owner_suffix(owner)}\""
-    run_tso_command_and_capture_output(add_command)
+    add_command = f"RACDCERT GENCERT {generate_distinguished_name(distinguished_name)} {generate_withlabel_suffix(label)} {generate_id_owner_suffix(owner)}"
+    run_tso_command(add_command)
     return list_certificate(label,owner)
     # return add_command
 
 def delete_certificate(owner, label):
-    delete_command = f"tsocmd \"RACDCERT DELETE{generate_label_suffix(label)} {generate_id_owner_suffix(owner)}\""
-    run_tso_command_and_capture_output(delete_command)
+    delete_command = f"RACDCERT DELETE{generate_label_suffix(label)} {generate_id_owner_suffix(owner)}"
+    run_tso_command(delete_command)
     return list_certificate("",owner)
 
-def run_module():
-    module_args = dict(
+def certificate_options(certificate_item=False):
+    return dict(
         certificate_owner=dict(type="str", required=False, default=""),
         certificate_label=dict(type="str", required=False,default=""),
         state=dict(
             type="str",
             required=False,
+            default="present" if certificate_item else None,
             choices=["present", "absent"],
         ),
-        list_only=dict(type="bool", required=False, default=False),
         distinguished_name=dict(type="dict", required=False, default={},options=dict(
             common_name=dict(type="str", required=False,default=""),
             title=dict(type="str", required=False,default=""),
@@ -252,65 +283,110 @@ def run_module():
         )
     )
 
-    required_if = [
-        ("list_only", False, ("state",)),
-        ("state","absent",("certificate_owner","certificate_label",),False,),
-        ("state","present",("distinguished_name",),False,),
-    ]
 
-    result = dict(changed=False, keyring="", racf_info={})
-    module = AnsibleModule(
-        argument_spec=module_args, supports_check_mode=True, required_if=required_if
-    )
-
-    if module.check_mode:
-        module.exit_json(**result)
+def process_certificate(params, list_only, return_output=False, result=None):
+    # a single certificate fills the result given to start_module, a failure reports what was done
+    result = dict(changed=False, keyring="", racf_info={}) if result is None else result
+    result["certificate_owner"] = params["certificate_owner"]
+    result["certificate_label"] = params["distinguished_name"]["common_name"] if params["certificate_label"] == "" else params["certificate_label"]
 
-    result["certificate_owner"] = module.params["certificate_owner"]
-    result["certificate_label"] = module.params["distinguished_name"]["common_name"] if module.params["certificate_label"] == "" else module.params["certificate_label"]
-
-    result["distinguished_name"] = module.params["distinguished_name"]
-    result["list_only"] = module.params["list_only"]
+    result["distinguished_name"] = params["distinguished_name"]
+    result["list_only"] = list_only
 
+    output_lines = [] if return_output else None
     result["racf_info"] = list_certificate(
-        result["certificate_label"], module.params["certificate_owner"]
+        result["certificate_label"], params["certificate_owner"], output_lines
     )
+    if output_lines is not None:
+        result["raw_output"] = join_lines(output_lines)
 
-    if module.params["list_only"]:
-        module.exit_json(**result)
+    if list_only:
+        return result
 
     if (
         len(result["racf_info"]) == 0
-        and module.params["state"] == "absent"
+        and params["state"] == "absent"
     ) or (
         len(result["racf_info"]) == 1
-        and module.params["state"] == "present"
+        and params["state"] == "present"
     ):
         result["changed"] = False
-        module.exit_json(**result)
+        return result
 
     if (
         len(result["racf_info"]) == 1
-        and module.params["state"] == "absent"
+        and params["state"] == "absent"
     ):
-        result["racf_info"] = delete_certificate(module.params["certificate_owner"], module.params["certificate_label"])
+        result["racf_info"] = delete_certificate(params["certificate_owner"], params["certificate_label"])
         result["changed"] = True
 
     if (
         len(result["racf_info"]) == 0
-        and module.params["state"] == "present"
+        and params["state"] == "present"
     ):
-        if module.params["distinguished_name"]["common_name"] == "":
-            module.fail_json(msg='Common Name is mandatory for adding new certificate', **result)
-        result["racf_info"] = add_certificate(module.params["distinguished_name"], result["certificate_label"],module.params["certificate_owner"] )
+        if params["distinguished_name"]["common_name"] == "":
+            result["failed"] = True
+            result["msg"] = 'Common Name is mandatory for adding new certificate'
+            return result
+        result["racf_info"] = add_certificate(params["distinguished_name"], result["certificate_label"],params["certificate_owner"] )
         result["changed"] = True
 
+    return result
+
+
+def compact_certificate_result(result, params):
+    certificate_results = result["results"] if isinstance(result.get("results"), list) else []
+    for certificate_result in [result] + certificate_results:
+        for certificate in certificate_result.get("racf_info") or []:
+            compact_profile(certificate, params)
+        compact_output(certificate_result, "raw_output", params)
+    return result
+
+
+def run_module():
+    module_args = certificate_options()
+    module_args.update(
+        list_only=dict(type="bool", required=False, default=False),
+        cache_ttl=dict(type="int", required=False),
+        metrics=dict(type="bool", required=False, default=False),
+        certificates=dict(type="list", required=False, elements="dict", options=certificate_options(certificate_item=True)),
+    )
+    module_args.update(output_options())
+
+    required_if = [
+        ("list_only", False, ("state", "certificates"), True),
+        ("state","absent",("certificate_owner","certificate_label",),False,),
+        ("state","present",("distinguished_name",),False,),
+    ]
+
+    result = dict(changed=False, keyring="", racf_info={})
+    module = AnsibleModule(
+        argument_spec=module_args, supports_check_mode=True, required_if=required_if
+    )
+    start_module(module, compact_certificate_result, result)
+
+    if module.check_mode:
+        module.exit_json(**finish_result(result))
+
+    if module.params["certificates"]:
+        result["results"] = [process_certificate(certificate, module.params["list_only"], module.params["return_output"]) for certificate in module.params["certificates"]]
+        result["changed"] = any(certificate_result["changed"] for certificate_result in result["results"])
+        failed_certificates = [f"{certificate_result['certificate_owner']}/{certificate_result['certificate_label']}" for certificate_result in result["results"] if certificate_result.get("failed")]
+        if failed_certificates:
+            module.fail_json(msg=f"Unable to process certificates: {', '.join(failed_certificates)}", **finish_result(result))
+        module.exit_json(**finish_result(result))
+
+    process_certificate(module.params, module.params["list_only"], module.params["return_output"], result)
+    if result.get("failed"):
+        module.fail_json(**finish_result(result))
+
     # simple AnsibleModule.exit_json(), passing the key/value results
-    module.exit_json(**result)
+    module.exit_json(**finish_result(result))
 
 
 def main():
-    run_module()
+    with tso_session():
+        run_racf_module(run_module, "racf_certificate")
 
 
 if __name__ == "__main__":
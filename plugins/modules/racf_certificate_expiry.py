@@ -0,0 +1,183 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+from ansible.module_utils.basic import AnsibleModule
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: racf_certificate_expiry
+
+short_description: RACF certificate expiry scanner Module
+
+version_added: "1.0.0"
+
+description:
+    - Ansible module to find the certificates of a set of owners that expire within a number of days
+    - Owners are listed concurrently and the certificates are filtered on the target, only the matching ones are returned
+
+options:
+    owners:
+        description: Owners whose certificates are scanned, user IDs, CERTAUTH or SITE
+        required: true
+        type: list
+        elements: str
+    expires_within_days:
+        description: Return the certificates whose end date is within this number of days from now
+        required: true
+        type: int
+    include_expired:
+        description: When false certificates that already expired are not returned
+        required: false
+        type: bool
+        default: true
+    workers:
+        description:
+            - Number of owners listed at the same time, each one through its own TSO session
+            - Never more than `RACF_MAX_CONCURRENCY` when it is set on the target
+        required: false
+        type: int
+        default: 4
+    fields:
+        description: Keys of the certificates returned, all keys are returned when omitted
+        required: false
+        type: list
+        elements: str
+    metrics:
+        description:
+            - When true the result holds `racf_metrics` with the verb, elapsed seconds, output bytes and return code of every command and the total parse time
+            - Also enabled by the `RACF_METRICS` environment variable on the target
+        required: false
+        type: bool
+        default: false
+
+author:
+    - Bill Pereira (@billpereira)
+"""
+
+EXAMPLES = r"""
+- name: Find the certificates of the CAs and server IDs expiring within 30 days
+  billpereira.community_racf.racf_certificate_expiry:
+    owners: "{{ ['CERTAUTH', 'SITE'] + server_ids }}"
+    expires_within_days: 30
+    workers: 8
+    fields: [user, label, end_date, days_left]
+"""
+
+RETURN = r"""
+  racf_info:
+    description: Certificates expiring within `expires_within_days`, sorted by end date, each one with the days left until it expires
+    sample:
+        - user: CERTAUTH
+          label: Root CA
+          end_date: "2026/11/01 23:59:59"
+          days_left: 14
+          trust: TRUST
+  owners:
+    description: Number of owners scanned
+    sample: 120
+  certificates:
+    description: Number of certificates listed
+    sample: 2400
+  unparsed_end_dates:
+    description: Certificates whose end date could not be read, by owner and label
+    sample: ["USER01/certificate1"]
+  queue_wait:
+    description: Seconds spent waiting for a command slot, returned when `RACF_MAX_CONCURRENCY` is set on the target
+    sample: 0.125
+  racf_metrics:
+    description: Command and parse timings, returned when `metrics` is true
+    sample:
+        commands:
+          - verb: RACDCERT LIST
+            elapsed: 0.052
+            bytes: 1480
+            rc: 0
+        command_time: 0.052
+        parse_time: 0.001
+        parses: 1
+        session_start: 0.310
+  racf_profile:
+    description: Hottest functions of the run and, with `RACF_PROFILE_MEMORY`, its top allocations, or the files they were written to, returned when `RACF_PROFILE` is set on the target
+    sample:
+        functions:
+          - function: racf_certificates.py:79(iter_certificates)
+            calls: 1
+            total_time: 0.0021
+            cumulative_time: 0.0113
+        memory_peak: 233387
+  command_events:
+    description: Timeouts, errors, retries and hedged reads of the TSO commands, returned when any happened
+    sample:
+        - event: timeout
+          verb: RACDCERT LIST
+          command: RACDCERT LIST CERTAUTH
+          attempt: 0
+          elapsed: 30.001
+"""
+
+from datetime import datetime, timedelta
+
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_helper import compact_profile, finish_result, map_concurrently, run_racf_module, start_module
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_certificates import list_certificate
+
+CERTIFICATE_DATE_FORMAT = "%Y/%m/%d %H:%M:%S"
+
+
+def certificate_end_date(certificate):
+    try:
+        return datetime.strptime(certificate["end_date"].strip(), CERTIFICATE_DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def compact_expiry_result(result, params):
+    for certificate in result.get("racf_info", []):
+        compact_profile(certificate, params)
+    return result
+
+
+def run_module():
+    module_args = dict(
+        owners=dict(type="list", required=True, elements="str"),
+        expires_within_days=dict(type="int", required=True),
+        include_expired=dict(type="bool", required=False, default=True),
+        workers=dict(type="int", required=False, default=4),
+        fields=dict(type="list", required=False, elements="str"),
+        metrics=dict(type="bool", required=False, default=False),
+    )
+
+    result = dict(changed=False, racf_info=[])
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    start_module(module, compact_expiry_result, result)
+
+    now = datetime.now()
+    horizon = now + timedelta(days=module.params["expires_within_days"])
+    owners = list(dict.fromkeys(owner.upper() for owner in module.params["owners"]))
+    owner_certificates = map_concurrently(lambda owner: list_certificate("", owner), owners, module.params["workers"])
+
+    expiring = []
+    result["unparsed_end_dates"] = []
+    for certificate in (certificate for certificates in owner_certificates for certificate in certificates):
+        end_date = certificate_end_date(certificate)
+        if end_date is None:
+            result["unparsed_end_dates"].append(f"{certificate['user']}/{certificate['label']}")
+        elif end_date <= horizon and (module.params["include_expired"] or end_date >= now):
+            certificate["days_left"] = (end_date - now).days
+            expiring.append((end_date, certificate))
+    expiring.sort(key=lambda entry: entry[0])
+    result["racf_info"] = [certificate for end_date, certificate in expiring]
+    result["owners"] = len(owners)
+    result["certificates"] = sum(len(certificates) for certificates in owner_certificates)
+
+    module.exit_json(**finish_result(result))
+
+
+def main():
+    run_racf_module(run_module, "racf_certificate_expiry")
+
+
+if __name__ == "__main__":
+    main()
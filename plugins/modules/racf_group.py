@@ -0,0 +1,501 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+from ansible.module_utils.basic import AnsibleModule
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: racf_group
+
+short_description: RACF Group Module
+
+version_added: "1.0.0"
+
+description:
+    - Ansible module to help manage RACF Groups and their members
+    - The group is listed once with LISTGRP and its member set is compared with `members`, only the CONNECT and REMOVE commands needed are issued
+
+options:
+    name:
+        description:
+            - Group Name.
+            - Required unless `groups` is used
+        required: false
+        type: str
+    state:
+        description:
+            - This field is required in case list_only is false
+            - If `present` checks if the group exists if not creates it, its superior group and owner are altered when they differ, `members` are connected
+            - If `absent` checks if the group exists if so deletes it
+            - If `connect` connects `members` to the group
+            - If `remove` removes `members` from the group
+        required: false
+        type: str
+        choices: [present, absent, connect, remove]
+    superior_group:
+        description: Superior group of the group, RACF uses the current connect group of the user running the module when a group is created without it
+        required: false
+        type: str
+    owner:
+        description: Owner of the group, a user ID or a group
+        required: false
+        type: str
+    members:
+        description:
+            - User IDs connected to the group with state `present` or `connect`, or removed from it with state `remove`
+            - Users are connected and removed up to 100 per command, every command of the run is sent in one batch
+        required: false
+        type: list
+        elements: str
+    authority:
+        description:
+            - Group authority of the connected members
+            - A member whose authority differs is connected again, when omitted the authority of members is not compared
+        required: false
+        type: str
+        choices: [use, create, connect, join]
+    attributes:
+        description:
+            - Connect attributes of the connected members
+            - A member missing any of them is connected again with all of them, attributes not in the list are left as they are
+        required: false
+        type: list
+        elements: str
+        choices: [adsp, auditor, grpacc, operations, special]
+    exclusive:
+        description:
+            - With state `present` or `connect`, remove every member of the group that is not in `members`
+            - Requires `members`, an empty list is refused unless `remove_all_members` is set
+            - A user can not be removed from its default group, RACF fails that REMOVE
+        required: false
+        type: bool
+        default: false
+    remove_all_members:
+        description: With `exclusive`, accept an empty `members` list and remove every member of the group
+        required: false
+        type: bool
+        default: false
+    list_only:
+        description: When true module will only execute a list to the group
+        required: false
+        type: bool
+        default: false
+    return_output:
+        description:
+            - When true the raw LISTGRP output is returned in the `raw_output` of the group, otherwise only the parsed information
+            - Output longer than `output_limit` characters is truncated unless `compress_output` is set
+        required: false
+        type: bool
+        default: false
+    output_limit:
+        description: Maximum number of characters of raw output returned, 0 returns it whole
+        required: false
+        type: int
+        default: 65536
+    compress_output:
+        description: Return the raw output zlib compressed and base64 encoded under `raw_output_zlib` instead of truncating it
+        required: false
+        type: bool
+        default: false
+    fields:
+        description:
+            - Keys of the group information returned, all keys are returned when omitted
+            - Applies to every group of `racf_info` and of `results`
+        required: false
+        type: list
+        elements: str
+    groups:
+        description:
+            - List of groups processed in a single module run, each item takes the same options as a single group
+            - The `state` of an item defaults to `present`
+            - All groups are listed in one batch and all their commands are issued in one batch, per group results are returned in `results`
+        required: false
+        type: list
+        elements: dict
+    verify:
+        description:
+            - How the outcome of ADDGROUP, ALTGROUP, DELGROUP, CONNECT and REMOVE commands is checked
+            - C(full) lists the changed groups again after the change and returns the refreshed information
+            - C(messages) decides from the return code and the ICH message ids and fails the task when a command failed, without listing the groups again
+            - C(none) only fails the task on a non-zero return code, without checking the messages nor listing the groups again
+            - With C(messages) and C(none), racf_info holds the listing taken before the change
+        required: false
+        type: str
+        choices: [full, messages, none]
+        default: full
+    batch:
+        description:
+            - List of items handled by the action plugin, each item takes the same options as the task and options set on the task apply to every item
+            - All items are sent to the target in one module run through `groups` and the per item results are returned in `results`
+            - Looped tasks are coalesced the same way
+        required: false
+        type: list
+        elements: dict
+    metrics:
+        description:
+            - When true the result holds `racf_metrics` with the verb, elapsed seconds, output bytes and return code of every command and the total parse time
+            - Also enabled by the `RACF_METRICS` environment variable on the target, the `billpereira.community_racf.racf_metrics` callback aggregates them at the end of the play
+        required: false
+        type: bool
+        default: false
+    cache_ttl:
+        description:
+            - Seconds a `list_only` result is kept in the controller side cache and reused for the same host and profile
+            - Any run that changes the group invalidates its cached results and the cached results of the users connected or removed
+            - Defaults to the `RACF_INFO_CACHE_TTL` environment variable, 0 disables the cache
+        required: false
+        type: int
+
+author:
+    - Bill Pereira (@billpereira)
+"""
+
+EXAMPLES = r"""
+- name: List the members of SYS1
+  billpereira.community_racf.racf_group:
+    name: SYS1
+    list_only: true
+
+- name: Create the group APPGRP under SYS1
+  billpereira.community_racf.racf_group:
+    name: APPGRP
+    superior_group: SYS1
+    owner: SYS1
+    state: present
+
+- name: Connect the onboarded users to APPGRP
+  billpereira.community_racf.racf_group:
+    name: APPGRP
+    state: connect
+    authority: use
+    members: "{{ onboarding_users }}"
+
+- name: Make the operators the only members of OPERGRP
+  billpereira.community_racf.racf_group:
+    name: OPERGRP
+    state: connect
+    exclusive: true
+    attributes: [operations]
+    members: "{{ operators }}"
+
+- name: Remove the leavers from APPGRP
+  billpereira.community_racf.racf_group:
+    name: APPGRP
+    state: remove
+    members: "{{ leavers }}"
+"""
+
+RETURN = r"""
+  racf_info:
+    description: The RACF info about the group after module execution, empty when the group does not exist
+    sample:
+        - group_name: APPGRP
+          superior_group: SYS1
+          group_owner: SYS1
+          subgroups: [APPSUB]
+          group_members:
+            - user: USER01
+              auth: USE
+              connect_count: "000003"
+              uacc: NONE
+              attributes: []
+  commands:
+    description: ADDGROUP, ALTGROUP, DELGROUP, CONNECT and REMOVE commands issued
+    sample: ["CO (USER01 USER02) GROUP(APPGRP) AUTHORITY(USE)", "REMOVE (USER03) GROUP(APPGRP)"]
+  connected:
+    description: Users connected, or connected again, to the group
+    sample: [USER01, USER02]
+  removed:
+    description: Users removed from the group
+    sample: [USER03]
+  messages:
+    description: RACF message ids returned by the commands issued
+    sample: [ICH02004I]
+  results:
+    description: Per group results when `groups` is used, each one with the same keys as a single group run
+    sample:
+        - name: APPGRP
+          state: connect
+          changed: true
+          commands: ["CO (USER01) GROUP(APPGRP)"]
+          connected: [USER01]
+          removed: []
+          racf_info: list
+  queue_wait:
+    description: Seconds spent waiting for a command slot, returned when `RACF_MAX_CONCURRENCY` is set on the target
+    sample: 0.125
+  racf_metrics:
+    description: Command and parse timings, returned when `metrics` is true
+    sample:
+        commands:
+          - verb: LG
+            elapsed: 0.052
+            bytes: 1480
+            rc: 0
+        command_time: 0.052
+        parse_time: 0.001
+        parses: 1
+        session_start: 0.310
+  racf_profile:
+    description: Hottest functions of the run and, with `RACF_PROFILE_MEMORY`, its top allocations, or the files they were written to, returned when `RACF_PROFILE` is set on the target
+    sample:
+        functions:
+          - function: racf_group.py:275(parse_group_info)
+            calls: 1
+            total_time: 0.0021
+            cumulative_time: 0.0113
+        memory_peak: 233387
+  executed_commands:
+    description: Commands that changed RACF before a timeout or a listing failing all its retries ended the task, returned with that failure only
+    sample: ["CO (USER01) GROUP(APPGRP)"]
+  command_events:
+    description: Timeouts, errors, retries and hedged reads of the TSO commands, returned when any happened. Commands changing RACF are reported by verb only
+    sample:
+        - event: timeout
+          verb: LG
+          command: LG APPGRP
+          attempt: 0
+          elapsed: 30.001
+"""
+
+import re
+
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_helper import VERIFY_CHOICES, check_tso_command, command_failed, compact_profile, finish_result, get_cached_profile, output_options, put_cached_profile, run_racf_module, run_tso_commands, start_module, timed_parse, tso_session
+
+LISTGRP_BASE_PATTERN = re.compile(r'SUPERIOR GROUP=(\S*)\s+OWNER=(\S*)')
+LISTGRP_MEMBER_PATTERN = re.compile(r'^\s+(\S+)\s+(USE|CREATE|CONNECT|JOIN)\s+(\S+)\s+(\S+)\s*$')
+MEMBERS_PER_COMMAND = 100
+
+
+def extract_group_info(list_output):
+    group_info = parse_group_info(list_output.splitlines())
+    if group_info is None:
+        return []
+    group_info['raw_output'] = list_output
+    return [group_info]
+
+@timed_parse
+def parse_group_info(lines):
+    group_name = superior_group = group_owner = ''
+    subgroups = []
+    members = []
+    section = None
+    member = None
+    for line in lines:
+        stripped = line.strip()
+        if 'NOT FOUND' in line:
+            return None
+        if section == 'members':
+            member_match = LISTGRP_MEMBER_PATTERN.match(line)
+            if member_match:
+                member = {'user': member_match.group(1), 'auth': member_match.group(2), 'connect_count': member_match.group(3), 'uacc': member_match.group(4), 'attributes': []}
+                members.append(member)
+            elif member is not None and 'CONNECT ATTRIBUTES=' in line:
+                member['attributes'] = [attribute for attribute in line.partition('=')[2].split() if attribute != 'NONE']
+            continue
+        if stripped.startswith('INFORMATION FOR GROUP'):
+            group_name = stripped.split()[-1]
+        elif stripped.startswith('USER(S)='):
+            section = 'members'
+        elif stripped.startswith('SUBGROUP(S)='):
+            # the subgroup names wrap on the following lines
+            section = 'subgroups'
+            subgroups += stripped.partition('=')[2].split()
+        elif section == 'subgroups' and '=' not in stripped and not stripped.startswith('NO '):
+            subgroups += stripped.split()
+        else:
+            section = None
+            base = LISTGRP_BASE_PATTERN.search(line)
+            if base and not group_owner:
+                superior_group, group_owner = base.group(1), base.group(2)
+    if not group_name:
+        return None
+    return {
+        'group_name': group_name,
+        'superior_group': superior_group,
+        'group_owner': group_owner,
+        'subgroups': subgroups,
+        'group_members': members,
+    }
+
+
+def list_groups(groups):
+    list_commands = {group: f"LG {group}" for group in groups}
+    groups_info = {group: get_cached_profile("group", group.upper(), list_commands[group]) for group in groups}
+    uncached_groups = [group for group in groups if groups_info[group] is None]
+    list_results = run_tso_commands(list_commands[group] for group in uncached_groups)
+    for group, item in zip(uncached_groups, list_results):
+        groups_info[group] = extract_group_info(item['output'])
+        put_cached_profile("group", group.upper(), list_commands[group], groups_info[group])
+    return groups_info
+
+def generate_superior_group_suffix(superior_group):
+    return f" SUPGROUP({superior_group})" if superior_group else ""
+
+def generate_owner_suffix(owner):
+    return f" OWNER({owner})" if owner else ""
+
+def generate_add_group_command(group_spec):
+    return f"AG {group_spec['name']}{generate_superior_group_suffix(group_spec['superior_group'])}{generate_owner_suffix(group_spec['owner'])}"
+
+def generate_alter_group_command(group_spec, group_info):
+    superior_group = group_spec['superior_group'] if (group_spec['superior_group'] or '').upper() not in ('', group_info['superior_group'].upper()) else ''
+    owner = group_spec['owner'] if (group_spec['owner'] or '').upper() not in ('', group_info['group_owner'].upper()) else ''
+    if not superior_group and not owner:
+        return ''
+    return f"ALG {group_spec['name']}{generate_superior_group_suffix(superior_group)}{generate_owner_suffix(owner)}"
+
+def chunk_members(users):
+    return [users[index:index + MEMBERS_PER_COMMAND] for index in range(0, len(users), MEMBERS_PER_COMMAND)]
+
+def generate_connect_commands(group_spec, users):
+    authority = f" AUTHORITY({group_spec['authority'].upper()})" if group_spec['authority'] else ""
+    attributes = "".join(f" {attribute.upper()}" for attribute in group_spec['attributes'] or [])
+    return [f"CO ({' '.join(chunk)}) GROUP({group_spec['name']}){authority}{attributes}" for chunk in chunk_members(users)]
+
+def generate_remove_commands(group_spec, users):
+    return [f"REMOVE ({' '.join(chunk)}) GROUP({group_spec['name']})" for chunk in chunk_members(users)]
+
+def group_member_differs(group_spec, member):
+    if group_spec['authority'] and group_spec['authority'].upper() != member['auth'].upper():
+        return True
+    return not {attribute.upper() for attribute in group_spec['attributes'] or []} <= {attribute.upper() for attribute in member['attributes']}
+
+def reconcile_group_members(group_spec, group_members):
+    current_members = {member['user'].upper(): member for member in group_members}
+    desired_members = list(dict.fromkeys(user.upper() for user in group_spec['members'] or []))
+    if group_spec['state'] == 'remove':
+        return [], [user for user in desired_members if user in current_members]
+    connects = [user for user in desired_members if user not in current_members or group_member_differs(group_spec, current_members[user])]
+    if not group_spec['exclusive']:
+        return connects, []
+    desired_set = set(desired_members)
+    return connects, [user for user in current_members if user not in desired_set]
+
+def plan_group(group_spec, racf_info):
+    if group_spec['state'] == 'absent':
+        return [f"DG {group_spec['name']}"] if racf_info else [], [], []
+    if group_spec['state'] == 'present' and not racf_info:
+        connects, removes = reconcile_group_members(group_spec, [])
+        return [generate_add_group_command(group_spec)] + generate_connect_commands(group_spec, connects), connects, removes
+    if not racf_info:
+        return [], [], []
+    alter_group_command = generate_alter_group_command(group_spec, racf_info[0]) if group_spec['state'] == 'present' else ''
+    connects, removes = reconcile_group_members(group_spec, racf_info[0]['group_members'])
+    commands = ([alter_group_command] if alter_group_command else []) + generate_connect_commands(group_spec, connects) + generate_remove_commands(group_spec, removes)
+    return commands, connects, removes
+
+def run_groups(group_specs, list_only=False, verify="full"):
+    current_info = list_groups(list(dict.fromkeys(group_spec['name'].upper() for group_spec in group_specs)))
+    group_results = []
+    planned_commands = []
+    for group_spec in group_specs:
+        group_result = dict(name=group_spec['name'], state=group_spec['state'], list_only=list_only, changed=False, commands=[], connected=[], removed=[], messages=[], racf_info=current_info[group_spec['name'].upper()])
+        if list_only:
+            pass
+        elif group_spec['state'] in ('connect', 'remove') and len(group_result['racf_info']) == 0:
+            group_result['failed'] = True
+            group_result['msg'] = f"Unable to find {group_spec['name']} to perform {group_spec['state']}"
+        elif group_spec['exclusive'] and not group_spec['members'] and not group_spec['remove_all_members']:
+            group_result['failed'] = True
+            group_result['msg'] = f"exclusive with no members removes every member of {group_spec['name']}, set remove_all_members to do so"
+        else:
+            group_result['commands'], group_result['connected'], group_result['removed'] = plan_group(group_spec, group_result['racf_info'])
+            group_result['changed'] = len(group_result['commands']) > 0
+        planned_commands.extend((group_result, command) for command in group_result['commands'])
+        group_results.append(group_result)
+
+    command_results = run_tso_commands(command for group_result, command in planned_commands)
+    for (group_result, command), command_result in zip(planned_commands, command_results):
+        check_tso_command(command_result)
+        group_result['messages'] += command_result['messages']
+        if command_failed(command_result, verify):
+            group_result['failed'] = True
+            group_result['msg'] = f"RACF command failed: {command}"
+
+    if verify != 'full':
+        return group_results
+    changed_groups = list(dict.fromkeys(group_result['name'].upper() for group_result in group_results if group_result['changed']))
+    updated_info = list_groups(changed_groups)
+    for group_result in group_results:
+        group_result['racf_info'] = updated_info.get(group_result['name'].upper(), group_result['racf_info'])
+    return group_results
+
+def compact_group_result(result, params):
+    groups_info = [result.get("racf_info")] + [group_result.get("racf_info") for group_result in result.get("results", [])]
+    for group_info in groups_info:
+        for profile in group_info or []:
+            compact_profile(profile, params, "raw_output")
+    return result
+
+def group_options(group_item=False):
+    return dict(
+        name=dict(type="str", required=group_item),
+        superior_group=dict(type="str", required=False, default=''),
+        owner=dict(type="str", required=False, default=''),
+        members=dict(type="list", required=False, elements='str'),
+        authority=dict(type="str", required=False, choices=["use", "create", "connect", "join"]),
+        attributes=dict(type="list", required=False, elements='str', choices=["adsp", "auditor", "grpacc", "operations", "special"]),
+        exclusive=dict(type="bool", required=False, default=False),
+        remove_all_members=dict(type="bool", required=False, default=False),
+        state=dict(
+            type="str",
+            required=False,
+            default="present" if group_item else None,
+            choices=["present", "absent", "connect", "remove"],
+        ),
+    )
+
+def run_module():
+    module_args = group_options()
+    module_args.update(
+        list_only=dict(type="bool", required=False, default=False),
+        cache_ttl=dict(type="int", required=False),
+        verify=dict(type="str", required=False, default="full", choices=VERIFY_CHOICES),
+        metrics=dict(type="bool", required=False, default=False),
+        groups=dict(type="list", required=False, elements='dict', options=group_options(group_item=True), required_if=[("exclusive", True, ("members",))]),
+    )
+    module_args.update(output_options())
+
+    required_if = [
+        ("list_only", False, ("state", "groups"), True),
+        ("state", "connect", ("members",)),
+        ("state", "remove", ("members",)),
+        ("exclusive", True, ("members",)),
+    ]
+
+    result = dict(changed=False, racf_info=[])
+    module = AnsibleModule(
+        argument_spec=module_args, supports_check_mode=True, required_if=required_if,
+        required_one_of=[("name", "groups")], mutually_exclusive=[("name", "groups")],
+    )
+    start_module(module, compact_group_result, result)
+
+    if module.check_mode:
+        module.exit_json(**finish_result(result))
+
+    if module.params["groups"]:
+        result["results"] = run_groups(module.params["groups"], module.params["list_only"], module.params["verify"])
+        result["changed"] = any(group_result['changed'] for group_result in result["results"])
+        failed_groups = [group_result['name'] for group_result in result["results"] if group_result.get('failed')]
+        if failed_groups:
+            module.fail_json(msg=f"Unable to process groups: {', '.join(failed_groups)}", **finish_result(result))
+        module.exit_json(**finish_result(result))
+
+    result.update(run_groups([module.params], module.params["list_only"], module.params["verify"])[0])
+    if result.get("failed"):
+        module.fail_json(**finish_result(result))
+
+    module.exit_json(**finish_result(result))
+
+
+def main():
+    with tso_session():
+        run_racf_module(run_module, "racf_group")
+
+
+if __name__ == "__main__":
+    main()
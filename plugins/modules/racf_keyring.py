@@ -2,7 +2,6 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import absolute_import, division, print_function
-import subprocess
 from ansible.module_utils.basic import AnsibleModule
 
 __metaclass__ = type
@@ -19,8 +18,10 @@ description: Ansible module to help manage RACF Keyrings
 
 options:
     name:
-        description: Key Ring Name.
-        required: true
+        description:
+            - Key Ring Name.
+            - Required unless `keyrings` is used
+        required: false
         type: str
     keyring_owner:
         description: The owner of the keyring, in case it is omitted it will ussume is the same as ansible_user
@@ -33,6 +34,7 @@ options:
             - If `absent` checks if keyring exists if so deletes 
             - If `connect` it will connect the keyring with certificate data passed through `certificate_owner` and `certificate_label`
             - If `remove` will remove the connection  from keyring with certificate data passed through `certificate_owner` and `certificate_label`
+            - With `certificates`, `connect` and `remove` apply to every certificate of the list
         required: false
         type: str
     certificate_owner:
@@ -43,10 +45,109 @@ options:
         description: The label of certificate that will be connected to the keyring
         required: false
         type: str
+    certificates:
+        description:
+            - Desired set of certificates of the keyring, used with state `connect` or `remove` instead of `certificate_label`
+            - The keyring is listed once and all CONNECT and REMOVE commands needed are issued in one batch
+            - With `connect` a connected certificate whose usage differs, or that should become the default, is connected again
+        required: false
+        type: list
+        elements: dict
+        suboptions:
+            label:
+                description: Label of the certificate
+                required: true
+                type: str
+            owner:
+                description:
+                    - Owner of the certificate, a user ID, CERTAUTH or SITE
+                    - Defaults to `certificate_owner`, then to `keyring_owner`. Without any the certificate is matched by label
+                required: false
+                type: str
+            usage:
+                description: Usage of the certificate in the keyring, not compared when omitted
+                required: false
+                type: str
+                choices: [personal, site, certauth]
+            default:
+                description: When true the certificate is the default of the keyring
+                required: false
+                type: bool
+                default: false
+    exclusive:
+        description: With `certificates` and state `connect`, remove every certificate of the keyring that is not in the list
+        required: false
+        type: bool
+        default: false
     list_only:
         description: When true module will only execute a list to the keyring
         required: false
         type: bool
+    return_output:
+        description:
+            - When true the raw LISTRING output is returned in `racf_info.results`, otherwise only the parsed information
+            - Output longer than `output_limit` characters is truncated unless `compress_output` is set
+        required: false
+        type: bool
+        default: false
+    output_limit:
+        description: Maximum number of characters of raw output returned, 0 returns it whole
+        required: false
+        type: int
+        default: 65536
+    compress_output:
+        description: Return the raw output zlib compressed and base64 encoded under `<key>_zlib` instead of truncating it
+        required: false
+        type: bool
+        default: false
+    fields:
+        description:
+            - Keys of the ring certificate entries returned, all keys are returned when omitted
+            - Applies to every ring certificate entries of `racf_info` and of `results`
+        required: false
+        type: list
+        elements: str
+    keyrings:
+        description:
+            - List of keyrings processed in a single module run, each item takes `name`, `keyring_owner`, `certificate_owner`, `certificate_label` and `state`
+            - The `state` of an item defaults to `present`
+            - Per keyring results are returned in `results`
+        required: false
+        type: list
+        elements: dict
+    verify:
+        description:
+            - How the outcome of ADDRING, DELRING, CONNECT and REMOVE commands is checked
+            - C(full) lists the keyring again after the change and returns the refreshed information
+            - C(messages) decides from the return code and the IRRD message ids and fails the task when a command failed, without listing the keyring again
+            - C(none) only fails the task on a non-zero return code, without checking the messages nor listing the keyring again
+            - With C(messages) and C(none), racf_info holds the listing taken before the change
+        required: false
+        type: str
+        choices: [full, messages, none]
+        default: full
+    batch:
+        description:
+            - List of items handled by the action plugin, each item takes the same options as the task and options set on the task apply to every item
+            - All items are sent to the target in one module run through `keyrings` and the per item results are returned in `results`
+            - Looped tasks are coalesced the same way
+        required: false
+        type: list
+        elements: dict
+    metrics:
+        description:
+            - When true the result holds `racf_metrics` with the verb, elapsed seconds, output bytes and return code of every command and the total parse time
+            - Also enabled by the `RACF_METRICS` environment variable on the target, the `billpereira.community_racf.racf_metrics` callback aggregates them at the end of the play
+        required: false
+        type: bool
+        default: false
+    cache_ttl:
+        description:
+            - Seconds a `list_only` result is kept in the controller side cache and reused for the same host and profile
+            - Any run that changes the profile invalidates its cached results
+            - Defaults to the `RACF_INFO_CACHE_TTL` environment variable, 0 disables the cache
+        required: false
+        type: int
 
 author:
     - Bill Pereira (@billpereira)
@@ -82,6 +183,21 @@ EXAMPLES = r"""
     certificate_owner: certificateOwner
     certificate_label: certificateLabel
     state: connect
+
+- name: Make certificate1 and certificate2 the only certificates of keyringName
+  billpereira.community_racf.racf_keyring:
+    name: keyringName
+    keyring_owner: keyringOwner
+    state: connect
+    exclusive: true
+    certificates:
+      - label: certificate1
+        owner: CERTAUTH
+        usage: certauth
+      - label: certificate2
+        owner: certificateOwner
+        usage: personal
+        default: true
 """
 
 RETURN = r"""
@@ -91,191 +207,394 @@ RETURN = r"""
     sample:
         certificates: list of certificates
         list_ring: command used to list the keyring
-        results: Result of display
+        results: Result of display, only with return_output
+  connect_commands:
+    description: CONNECT commands issued for `certificates`
+    sample: ["tsocmd \"RACDCERT CONNECT(CERTAUTH LABEL('certificate1') RING(keyringName) USAGE(CERTAUTH)) ID(keyringOwner)\""]
+  remove_commands:
+    description: REMOVE commands issued for `certificates`
+    sample: ["tsocmd \"RACDCERT REMOVE(ID(certificateOwner) LABEL('certificate3') RING(keyringName)) ID(keyringOwner)\""]
+  messages:
+    description: RACF message ids returned by the commands issued
+    sample: [IRRD109I]
+  results:
+    description: Per keyring results when `keyrings` is used, each one with the same keys as a single keyring run
+    sample:
+        - keyring: RING01
+          keyring_owner: USER01
+          changed: true
+          racf_info: dict
+  queue_wait:
+    description: Seconds spent waiting for a command slot, returned when `RACF_MAX_CONCURRENCY` is set on the target
+    sample: 0.125
+  racf_metrics:
+    description: Command and parse timings, returned when `metrics` is true
+    sample:
+        commands:
+          - verb: LU
+            elapsed: 0.052
+            bytes: 1480
+            rc: 0
+        command_time: 0.052
+        parse_time: 0.001
+        parses: 1
+        session_start: 0.310
+  racf_profile:
+    description: Hottest functions of the run and, with `RACF_PROFILE_MEMORY`, its top allocations, or the files they were written to, returned when `RACF_PROFILE` is set on the target
+    sample:
+        functions:
+          - function: racf_user.py:266(parse_user_info)
+            calls: 1
+            total_time: 0.0021
+            cumulative_time: 0.0113
+        memory_peak: 233387
+  executed_commands:
+    description: Commands that changed RACF before a timeout or a listing failing all its retries ended the task, returned with that failure only
+    sample: ["CO (USER01) GROUP(APPGRP)"]
+  command_events:
+    description: Timeouts, errors, retries and hedged reads of the TSO commands, returned when any happened. Commands changing RACF are reported by verb only
+    sample:
+        - event: timeout
+          verb: LU
+          command: LU USER01
+          attempt: 0
+          elapsed: 30.001
+        - event: retry
+          verb: LU
+          command: LU USER01
+          attempt: 1
+          elapsed: 0.412
 """
 
 
-# from billpereira.community_racf.plugins.module_utils.racf_helper import generate_keyring_owner_suffix, run_tso_command_and_capture_output
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_helper import VERIFY_CHOICES, check_command_results, check_tso_command, finish_result, get_cached_profile, join_lines, compact_output, compact_profile, output_options, put_cached_profile, run_racf_module, run_tso_command, run_tso_commands, start_module, stream_tso_command, tee_lines, tso_session
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_parsers import parse_ring_certificates
 
-def run_tso_command_and_capture_output(command):
-    try:
-        command_results = subprocess.run([command], capture_output=True, shell=True)
-        return command_results.stdout.decode()
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Error executing TSO command: {e}")
+RING_STATUS_MESSAGES = ("does not exist", "No certificates connected")
 
 def generate_keyring_owner_suffix(keyring_owner):
     return f"ID({keyring_owner})" if keyring_owner else ""
 
 def extract_certificates_from_ring(listring):
-    cert_info = listring.split("\n")[7:]
-    cert_list = [
-        {
-            "cert_label": entry[2:34].strip(),
-            "cert_owner": entry[37:49].strip(),
-            "cert_usage": entry[52:61].strip(),
-            "cert_default": entry[65:67].strip(),
-        }
-        for entry in cert_info
-        if entry.strip() != ""
-    ]
-    return cert_list
+    return parse_ring_certificates(listring.split("\n"))
+
 
+def status_lines(lines, output_lines):
+    # without return_output only the lines the module checks are kept
+    for line in lines:
+        if any(message in line for message in RING_STATUS_MESSAGES):
+            output_lines.append(line)
+        yield line
 
-def list_ring(ringname, keyring_owner):
+
+def list_ring(ringname, keyring_owner, return_output=False):
     keyring_owner_suffix = generate_keyring_owner_suffix(keyring_owner)
-    racf_list_command = f"tsocmd 'RACDCERT LISTRING({ringname}) {keyring_owner_suffix}'"
-    racf_list_output = run_tso_command_and_capture_output(racf_list_command)
-    list_of_certificates = (
-        []
-        if "No certificates connected" in racf_list_output
-        else extract_certificates_from_ring(racf_list_output)
-    )
-    return {
-        "list_ring": racf_list_command,
-        "certificates": list_of_certificates,
+    racf_list_command = f"RACDCERT LISTRING({ringname}) {keyring_owner_suffix}"
+    profile_name = f"{(keyring_owner or '').upper()}/{ringname}"
+    # the cache holds no output, list again when it is asked for
+    if not return_output:
+        cached_ring = get_cached_profile("ring", profile_name, racf_list_command)
+        if cached_ring is not None:
+            return cached_ring
+    output_lines = []
+    capture_lines = tee_lines if return_output else status_lines
+    list_of_certificates = parse_ring_certificates(capture_lines(stream_tso_command(racf_list_command), output_lines))
+    racf_list_output = join_lines(output_lines)
+    ring_info = {
+        "list_ring": f"tsocmd '{racf_list_command}'",
+        "certificates": [] if "No certificates connected" in racf_list_output else list_of_certificates,
         "results": racf_list_output,
     }
+    if not return_output:
+        put_cached_profile("ring", profile_name, racf_list_command, ring_info)
+    return ring_info
 
 
 def add_ring(ringname, keyring_owner):
     keyring_owner_suffix = generate_keyring_owner_suffix(keyring_owner)
-    racf_add_command = f"tsocmd 'RACDCERT ADDRING({ringname}) {keyring_owner_suffix}'"
-    run_tso_command_and_capture_output(racf_add_command)
+    racf_add_command = f"RACDCERT ADDRING({ringname}) {keyring_owner_suffix}"
+    return check_tso_command(run_tso_command(racf_add_command))
 
 
 def delete_ring(ringname, keyring_owner):
     keyring_owner_suffix = generate_keyring_owner_suffix(keyring_owner)
-    racf_del_command = f"tsocmd 'RACDCERT DELRING({ringname}) {keyring_owner_suffix}'"
-    run_tso_command_and_capture_output(racf_del_command)
+    racf_del_command = f"RACDCERT DELRING({ringname}) {keyring_owner_suffix}"
+    return check_tso_command(run_tso_command(racf_del_command))
 
 
-def connect_certificate(ring_name, keyring_owner, certificate_owner, certificate_label):
-    racf_connect_command = f"tsocmd \"RACDCERT CONNECT(id({certificate_owner}) LABEL('{certificate_label}') RING({ring_name})) ID({keyring_owner})\""
-    racf_connect_command_output = run_tso_command_and_capture_output(racf_connect_command)
-    return racf_connect_command
+def certificate_owner_keyword(owner):
+    return owner if owner in ("CERTAUTH", "SITE") else f"ID({owner})"
 
 
-def remove_certificate(ring_name, keyring_owner, certificate_owner, certificate_label):
-    racf_remove_command = f"tsocmd \"RACDCERT REMOVE(id({certificate_owner}) LABEL('{certificate_label}') RING({ring_name})) ID({keyring_owner})\""
-    racf_remove_command_output = run_tso_command_and_capture_output(racf_remove_command)
-    return racf_remove_command
+def connect_command(ring_name, keyring_owner, owner, label, usage=None, default=False):
+    owner_keyword = f"{certificate_owner_keyword(owner)} " if owner else ""
+    options = f" USAGE({usage.upper()})" if usage else ""
+    options += " DEFAULT" if default else ""
+    return f"RACDCERT CONNECT({owner_keyword}LABEL('{label}') RING({ring_name}){options}) {generate_keyring_owner_suffix(keyring_owner)}"
 
 
-def run_module():
-    module_args = dict(
-        name=dict(type="str", required=True),
+def remove_command(ring_name, keyring_owner, owner, label):
+    owner_keyword = f"{certificate_owner_keyword(owner)} " if owner else ""
+    return f"RACDCERT REMOVE({owner_keyword}LABEL('{label}') RING({ring_name})) {generate_keyring_owner_suffix(keyring_owner)}"
+
+
+def connect_certificate(ring_name, keyring_owner, certificate_owner, certificate_label):
+    return check_tso_command(run_tso_command(connect_command(ring_name, keyring_owner, ring_certificate_owner(certificate_owner), certificate_label)))
+
+
+def remove_certificate(ring_name, keyring_owner, certificate_owner, certificate_label):
+    return check_tso_command(run_tso_command(remove_command(ring_name, keyring_owner, ring_certificate_owner(certificate_owner), certificate_label)))
+
+
+def ring_certificate_owner(cert_owner):
+    # LISTRING shows ID(USER01), CERTAUTH or SITE
+    owner = (cert_owner or "").strip().upper()
+    return owner[3:-1] if owner.startswith("ID(") and owner.endswith(")") else owner
+
+
+def index_ring_certificates(certificates):
+    index = {}
+    labels = {}
+    for certificate in certificates:
+        key = (ring_certificate_owner(certificate["cert_owner"]), certificate["cert_label"])
+        index[key] = certificate
+        labels.setdefault(certificate["cert_label"], key)
+    return index, labels
+
+
+def find_ring_certificate(index, labels, owner, label):
+    # without an owner the certificate is matched by label, as RACF does for the issuer's own certificates
+    if owner:
+        return (owner, label) if (owner, label) in index else None
+    return labels.get(label)
+
+
+def ring_certificate_differs(connected, certificate):
+    if certificate["usage"] and connected["cert_usage"].upper() != certificate["usage"].upper():
+        return True
+    return certificate["default"] and not connected["cert_default"].upper().startswith("Y")
+
+
+def reconcile_ring_certificates(params, ring_info):
+    index, labels = index_ring_certificates(ring_info["certificates"])
+    default_owner = params["certificate_owner"] or params["keyring_owner"]
+    matched = set()
+    connects = []
+    removes = []
+    for certificate in params["certificates"]:
+        owner = ring_certificate_owner(certificate["owner"] or default_owner)
+        key = find_ring_certificate(index, labels, owner, certificate["label"])
+        if key is not None:
+            matched.add(key)
+        if params["state"] == "remove" and key is not None:
+            removes.append(key)
+        elif params["state"] == "connect" and (key is None or ring_certificate_differs(index[key], certificate)):
+            connects.append(connect_command(
+                params["name"], params["keyring_owner"], key[0] if key else owner, certificate["label"], certificate["usage"], certificate["default"],
+            ))
+    if params["state"] == "connect" and params["exclusive"]:
+        removes += sorted(set(index) - matched)
+    return [remove_command(params["name"], params["keyring_owner"], owner, label) for owner, label in removes], connects
+
+
+def process_certificate_set(result, params, verify, return_output=False):
+    if "does not exist" in result["racf_info"]["results"]:
+        result["failed"] = True
+        result["msg"] = f"Keyring {params['name']} does not exist"
+        return result
+    removes, connects = reconcile_ring_certificates(params, result["racf_info"])
+    result["remove_commands"] = [f"tsocmd \"{command}\"" for command in removes]
+    result["connect_commands"] = [f"tsocmd \"{command}\"" for command in connects]
+    if not removes and not connects:
+        return result
+    # removes go first so a certificate connected as the new default is not removed after it
+    command_results = [check_tso_command(command_result) for command_result in run_tso_commands(removes + connects)]
+    result["changed"] = True
+    if verify == "full":
+        result["racf_info"] = list_ring(params["name"], params["keyring_owner"], return_output)
+    return check_command_results(result, command_results, verify)
+
+
+def keyring_options(keyring_item=False):
+    return dict(
+        name=dict(type="str", required=keyring_item),
         keyring_owner=dict(type="str", required=False),
         certificate_owner=dict(type="str", required=False),
         certificate_label=dict(type="str", required=False),
+        certificates=dict(type="list", required=False, elements="dict", options=dict(
+            label=dict(type="str", required=True),
+            owner=dict(type="str", required=False),
+            usage=dict(type="str", required=False, choices=["personal", "site", "certauth"]),
+            default=dict(type="bool", required=False, default=False),
+        )),
+        exclusive=dict(type="bool", required=False, default=False),
         state=dict(
             type="str",
             required=False,
+            default="present" if keyring_item else None,
             choices=["present", "absent", "connect", "remove"],
         ),
-        list_only=dict(type="bool", required=False, default=False),
-    )
-
-    required_if = [
-        ("list_only", False, ("state",)),
-        ("state","connect",("keyring_owner","certificate_owner",),False,),
-        ("state","connect",("certificate_label","certificate_serial_number",),True,),
-        ("state","remove",("keyring_oner", "certificate_owner", "certificate_label"),False,),
-    ]
-
-    result = dict(changed=False, keyring="", racf_info={})
-    module = AnsibleModule(
-        argument_spec=module_args, supports_check_mode=True, required_if=required_if
     )
 
-    if module.check_mode:
-        module.exit_json(**result)
 
-    result["keyring_owner"] = module.params["keyring_owner"]
-    result["keyring"] = module.params["name"]
-    result["list_only"] = module.params["list_only"]
+def process_keyring(params, list_only, verify, return_output=False, result=None):
+    # a single keyring fills the result given to start_module, a failure reports what was done
+    result = dict(changed=False, keyring="", racf_info={}) if result is None else result
+    result["keyring_owner"] = params["keyring_owner"]
+    result["keyring"] = params["name"]
+    result["list_only"] = list_only
 
     result["racf_info"] = list_ring(
-        module.params["name"], module.params["keyring_owner"]
+        params["name"], params["keyring_owner"], return_output
     )
 
-    if module.params["list_only"]:
-        module.exit_json(**result)
+    if list_only:
+        return result
 
     if (
         "does not exist" in result["racf_info"]["results"]
-        and module.params["state"] == "absent"
+        and params["state"] == "absent"
     ) or (
         "does not exist" not in result["racf_info"]["results"]
-        and module.params["state"] == "present"
+        and params["state"] == "present"
     ):
         result["changed"] = False
-        module.exit_json(**result)
+        return result
 
     if (
         "does not exist" in result["racf_info"]["results"]
-        and module.params["state"] == "present"
+        and params["state"] == "present"
     ):
-        add_ring(module.params["name"], module.params["keyring_owner"])
+        command_result = add_ring(params["name"], params["keyring_owner"])
         result["changed"] = True
-        result["racf_info"] = list_ring(
-            module.params["name"], module.params["keyring_owner"]
-        )
+        if verify == "full":
+            result["racf_info"] = list_ring(
+                params["name"], params["keyring_owner"], return_output
+            )
+        if check_command_results(result, [command_result], verify).get("failed"):
+            return result
 
     if (
         "does not exist" not in result["racf_info"]["results"]
-        and module.params["state"] == "absent"
+        and params["state"] == "absent"
     ):
-        delete_ring(module.params["name"], module.params["keyring_owner"])
+        command_result = delete_ring(params["name"], params["keyring_owner"])
         result["changed"] = True
-        result["racf_info"] = list_ring(
-            module.params["name"], module.params["keyring_owner"]
-        )
+        if verify == "full":
+            result["racf_info"] = list_ring(
+                params["name"], params["keyring_owner"], return_output
+            )
+        return check_command_results(result, [command_result], verify)
 
     if (
         "does not exist" not in result["racf_info"]["results"]
-        and module.params["state"] == "present"
+        and params["state"] == "present"
     ):
         result["results"] = result["racf_info"]
 
-    if module.params["state"] == "connect":
-        result["changed"] = (
-            False
-            if module.params["certificate_label"] in result["racf_info"]["results"]
-            else True
-        )
-        result["connect_command"] = connect_certificate(
-            module.params["name"],
-            module.params["keyring_owner"],
-            module.params["certificate_owner"],
-            module.params["certificate_label"],
-        )
-        result["racf_info"] = list_ring(
-            module.params["name"], module.params["keyring_owner"]
-        )
-
-    if module.params["state"] == "remove":
-        result["changed"] = (
-            False
-            if module.params["certificate_label"] not in result["racf_info"]["results"]
-            else True
-        )
-        result["remove_command"] = remove_certificate(
-            module.params["name"],
-            module.params["keyring_owner"],
-            module.params["certificate_owner"],
-            module.params["certificate_label"],
-        )
-        result["racf_info"] = list_ring(
-            module.params["name"], module.params["keyring_owner"]
-        )
+    if params["certificates"] is not None and params["state"] in ("connect", "remove"):
+        return process_certificate_set(result, params, verify, return_output)
+
+    if params["state"] in ("connect", "remove"):
+        index, labels = index_ring_certificates(result["racf_info"]["certificates"])
+        connected = find_ring_certificate(
+            index, labels, ring_certificate_owner(params["certificate_owner"]), params["certificate_label"],
+        ) is not None
+
+    if params["state"] == "connect":
+        result["changed"] = not connected
+        if result["changed"]:
+            command_result = connect_certificate(
+                params["name"],
+                params["keyring_owner"],
+                params["certificate_owner"],
+                params["certificate_label"],
+            )
+            result["connect_command"] = f"tsocmd \"{command_result['command']}\""
+            if verify == "full":
+                result["racf_info"] = list_ring(
+                    params["name"], params["keyring_owner"], return_output
+                )
+            check_command_results(result, [command_result], verify)
+
+    if params["state"] == "remove":
+        result["changed"] = connected
+        if result["changed"]:
+            command_result = remove_certificate(
+                params["name"],
+                params["keyring_owner"],
+                params["certificate_owner"],
+                params["certificate_label"],
+            )
+            result["remove_command"] = f"tsocmd \"{command_result['command']}\""
+            if verify == "full":
+                result["racf_info"] = list_ring(
+                    params["name"], params["keyring_owner"], return_output
+                )
+            check_command_results(result, [command_result], verify)
+
+    return result
+
+
+def compact_keyring_result(result, params):
+    # a present keyring returns its racf_info in results as well, both are the same dict
+    keyring_results = result["results"] if isinstance(result.get("results"), list) else []
+    for keyring_result in [result] + keyring_results:
+        ring_info = keyring_result.get("racf_info")
+        if isinstance(ring_info, dict):
+            for certificate in ring_info.get("certificates", []):
+                compact_profile(certificate, params)
+            compact_output(ring_info, "results", params)
+    return result
+
+
+def run_module():
+    module_args = keyring_options()
+    module_args.update(
+        list_only=dict(type="bool", required=False, default=False),
+        cache_ttl=dict(type="int", required=False),
+        verify=dict(type="str", required=False, default="full", choices=VERIFY_CHOICES),
+        metrics=dict(type="bool", required=False, default=False),
+        keyrings=dict(type="list", required=False, elements="dict", options=keyring_options(keyring_item=True)),
+    )
+    module_args.update(output_options())
+
+    required_if = [
+        ("list_only", False, ("state", "keyrings"), True),
+        ("state","connect",("certificate_label","certificates",),True,),
+        ("state","remove",("certificate_label","certificates",),True,),
+    ]
+
+    result = dict(changed=False, keyring="", racf_info={})
+    module = AnsibleModule(
+        argument_spec=module_args, supports_check_mode=True, required_if=required_if,
+        required_one_of=[("name", "keyrings")], mutually_exclusive=[("name", "keyrings"), ("certificate_label", "certificates")],
+        required_by={"certificate_label": ("keyring_owner", "certificate_owner")},
+    )
+    start_module(module, compact_keyring_result, result)
+
+    if module.check_mode:
+        module.exit_json(**finish_result(result))
+
+    if module.params["keyrings"]:
+        result["results"] = [process_keyring(keyring, module.params["list_only"], module.params["verify"], module.params["return_output"]) for keyring in module.params["keyrings"]]
+        result["changed"] = any(keyring_result["changed"] for keyring_result in result["results"])
+        failed_keyrings = [keyring_result["keyring"] for keyring_result in result["results"] if keyring_result.get("failed")]
+        if failed_keyrings:
+            module.fail_json(msg=f"Unable to process keyrings: {', '.join(failed_keyrings)}", **finish_result(result))
+        module.exit_json(**finish_result(result))
+
+    process_keyring(module.params, module.params["list_only"], module.params["verify"], module.params["return_output"], result)
+    if result.get("failed"):
+        module.fail_json(**finish_result(result))
 
     # simple AnsibleModule.exit_json(), passing the key/value results
-    module.exit_json(**result)
+    module.exit_json(**finish_result(result))
 
 
 def main():
-    run_module()
+    with tso_session():
+        run_racf_module(run_module, "racf_keyring")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+from ansible.module_utils.basic import AnsibleModule
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: racf_keyring_info
+
+short_description: RACF KeyRing information Module
+
+version_added: "1.0.0"
+
+description:
+    - Ansible module to list every keyring of one or more owners
+    - Each owner is listed with a single `RACDCERT LISTRING(*)`, owners are listed concurrently
+
+options:
+    owners:
+        description:
+            - Owners whose keyrings are listed
+            - When omitted the keyrings of the user running the module are listed
+        required: false
+        type: list
+        elements: str
+    name:
+        description: Keyring listed for every owner, all keyrings of the owner when omitted
+        required: false
+        type: str
+        default: "*"
+    workers:
+        description:
+            - Number of owners listed at the same time, each one through its own TSO session
+            - Never more than `RACF_MAX_CONCURRENCY` when it is set on the target
+        required: false
+        type: int
+        default: 4
+    return_output:
+        description:
+            - When true the raw LISTRING output of every owner is returned in `output`
+            - Output longer than `output_limit` characters is truncated unless `compress_output` is set
+        required: false
+        type: bool
+        default: false
+    output_limit:
+        description: Maximum number of characters of raw output returned, 0 returns it whole
+        required: false
+        type: int
+        default: 65536
+    compress_output:
+        description: Return the raw output zlib compressed and base64 encoded under `output_zlib` instead of truncating it
+        required: false
+        type: bool
+        default: false
+    fields:
+        description: Keys of the ring certificate entries returned, all keys are returned when omitted
+        required: false
+        type: list
+        elements: str
+    metrics:
+        description:
+            - When true the result holds `racf_metrics` with the verb, elapsed seconds, output bytes and return code of every command and the total parse time
+            - Also enabled by the `RACF_METRICS` environment variable on the target
+        required: false
+        type: bool
+        default: false
+
+author:
+    - Bill Pereira (@billpereira)
+"""
+
+EXAMPLES = r"""
+- name: List every keyring of the user running the playbook
+  billpereira.community_racf.racf_keyring_info:
+
+- name: Audit the keyrings of the server IDs
+  billpereira.community_racf.racf_keyring_info:
+    owners: "{{ server_ids }}"
+    workers: 8
+    fields: [cert_label, cert_owner]
+"""
+
+RETURN = r"""
+  racf_info:
+    description: Keyrings per owner, in the order of `owners`
+    sample:
+        - owner: USER01
+          list_ring: tsocmd 'RACDCERT LISTRING(*) ID(USER01)'
+          keyrings:
+              RING01:
+                - cert_label: certificate1
+                  cert_owner: ID(USER01)
+                  cert_usage: PERSONAL
+                  cert_default: "YES"
+          succeeded: true
+          messages: []
+  failed_owners:
+    description: Owners whose listing failed, their messages are in `racf_info`
+    sample: [USER02]
+  messages:
+    description: RACF message ids returned by the commands issued
+    sample: [IRRD114I]
+  queue_wait:
+    description: Seconds spent waiting for a command slot, returned when `RACF_MAX_CONCURRENCY` is set on the target
+    sample: 0.125
+  racf_metrics:
+    description: Command and parse timings, returned when `metrics` is true
+    sample:
+        commands:
+          - verb: RACDCERT LISTRING
+            elapsed: 0.052
+            bytes: 1480
+            rc: 0
+        command_time: 0.052
+        parse_time: 0.001
+        parses: 1
+        session_start: 0.310
+  racf_profile:
+    description: Hottest functions of the run and, with `RACF_PROFILE_MEMORY`, its top allocations, or the files they were written to, returned when `RACF_PROFILE` is set on the target
+    sample:
+        functions:
+          - function: racf_parsers.py:24(index_rings)
+            calls: 1
+            total_time: 0.0021
+            cumulative_time: 0.0113
+        memory_peak: 233387
+  command_events:
+    description: Timeouts, errors, retries and hedged reads of the TSO commands, returned when any happened
+    sample:
+        - event: timeout
+          verb: RACDCERT LISTRING
+          command: RACDCERT LISTRING(*) ID(USER01)
+          attempt: 0
+          elapsed: 30.001
+"""
+
+
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_helper import check_tso_command, compact_output, compact_profile, finish_result, generate_keyring_owner_suffix, map_concurrently, output_options, run_racf_module, run_tso_command, start_module
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_parsers import parse_rings
+
+
+def list_owner_rings(owner, ring_name="*"):
+    racf_list_command = f"RACDCERT LISTRING({ring_name}) {generate_keyring_owner_suffix(owner)}".strip()
+    command_result = check_tso_command(run_tso_command(racf_list_command))
+    return dict(
+        owner=owner or "",
+        list_ring=f"tsocmd '{racf_list_command}'",
+        keyrings=parse_rings(command_result["output"].splitlines()) if command_result["succeeded"] else {},
+        succeeded=command_result["succeeded"],
+        messages=command_result["messages"],
+        output=command_result["output"],
+    )
+
+
+def compact_keyring_info_result(result, params):
+    for owner_info in result.get("racf_info", []):
+        for certificates in owner_info["keyrings"].values():
+            for certificate in certificates:
+                compact_profile(certificate, params)
+        compact_output(owner_info, "output", params)
+    return result
+
+
+def run_module():
+    module_args = dict(
+        owners=dict(type="list", required=False, elements="str"),
+        name=dict(type="str", required=False, default="*"),
+        workers=dict(type="int", required=False, default=4),
+        metrics=dict(type="bool", required=False, default=False),
+    )
+    module_args.update(output_options())
+
+    result = dict(changed=False, racf_info=[])
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+    start_module(module, compact_keyring_info_result, result)
+
+    owners = [owner.upper() if owner else None for owner in module.params["owners"] or [None]]
+    result["racf_info"] = map_concurrently(
+        lambda owner: list_owner_rings(owner, module.params["name"]), owners, module.params["workers"],
+    )
+    result["messages"] = [message for owner_info in result["racf_info"] for message in owner_info["messages"]]
+    result["failed_owners"] = [owner_info["owner"] for owner_info in result["racf_info"] if not owner_info["succeeded"]]
+
+    module.exit_json(**finish_result(result))
+
+
+def main():
+    run_racf_module(run_module, "racf_keyring_info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+from ansible.module_utils.basic import AnsibleModule
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: racf_unload_facts
+
+short_description: RACF database unload query Module
+
+version_added: "1.0.0"
+
+description:
+    - Ansible module to query a RACF database unload created by IRRDBU00
+    - The unload is loaded once into a SQLite index next to it, later runs query the index directly
+    - The index is rebuilt when the unload file changes, the task then reports a change
+    - In check mode a missing or outdated index is built in a temporary file that is removed after the queries
+
+options:
+    unload:
+        description: Path of the IRRDBU00 unload file on the target
+        required: true
+        type: str
+    index:
+        description: Path of the SQLite index, when omitted `.sqlite` is appended to the unload path
+        required: false
+        type: str
+    encoding:
+        description: Encoding of the unload file
+        required: false
+        type: str
+        default: cp1047
+    rebuild:
+        description: When true the index is rebuilt even if the unload did not change
+        required: false
+        type: bool
+    users:
+        description: List of users to return with their group connects and TSO, DFP and OMVS segments
+        required: false
+        type: list
+        elements: str
+    group_members:
+        description: List of groups to return the connected users for
+        required: false
+        type: list
+        elements: str
+    expires_within_days:
+        description: Return the certificates that expire within this number of days
+        required: false
+        type: int
+
+author:
+    - Bill Pereira (@billpereira)
+"""
+
+EXAMPLES = r"""
+- name: Find the users connected to a group
+  billpereira.community_racf.racf_unload_facts:
+    unload: /tmp/racf.unload
+    group_members:
+      - SYS1
+
+- name: Find the certificates expiring within 30 days
+  billpereira.community_racf.racf_unload_facts:
+    unload: /tmp/racf.unload
+    expires_within_days: 30
+"""
+
+RETURN = r"""
+  index:
+    description: Path of the SQLite index used
+    sample: /tmp/racf.unload.sqlite
+  index_rebuilt:
+    description: True when the index was built during this run, always false in check mode
+    sample: false
+  record_counts:
+    description: Number of records loaded per table when the index was built
+    sample:
+        users: 2000
+        user_connects: 12000
+  racf_info:
+    description: The query results
+    sample:
+        users:
+            IBMUSER:
+                name: IBMUSER
+                default_group: SYS1
+                user_group_connects: list
+        group_members:
+            SYS1: list
+        expiring_certificates: list
+  racf_profile:
+    description: Hottest functions of the run and, with `RACF_PROFILE_MEMORY`, its top allocations, or the files they were written to, returned when `RACF_PROFILE` is set on the target
+    sample:
+        functions:
+          - function: racf_user.py:266(parse_user_info)
+            calls: 1
+            total_time: 0.0021
+            cumulative_time: 0.0113
+        memory_peak: 233387
+"""
+
+import os
+import shutil
+import tempfile
+
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_helper import finish_result, run_racf_module
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_unload import build_unload_index, open_unload_index, query_expiring_certificates, query_group_members, query_user, unload_index_is_current
+
+
+def run_module():
+    module_args = dict(
+        unload=dict(type="str", required=True),
+        index=dict(type="str", required=False),
+        encoding=dict(type="str", required=False, default="cp1047"),
+        rebuild=dict(type="bool", required=False, default=False),
+        users=dict(type="list", required=False, default=[], elements="str"),
+        group_members=dict(type="list", required=False, default=[], elements="str"),
+        expires_within_days=dict(type="int", required=False),
+    )
+
+    result = dict(changed=False, racf_info={}, index_rebuilt=False)
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    unload_path = module.params["unload"]
+    if not os.path.exists(unload_path):
+        module.fail_json(msg=f"Unable to find unload file {unload_path}", **finish_result(result))
+    result["index"] = module.params["index"] or f"{unload_path}.sqlite"
+
+    index_path = result["index"]
+    check_dir = None
+    if module.params["rebuild"] or not unload_index_is_current(unload_path, index_path):
+        result["changed"] = True
+        if module.check_mode:
+            # the index is left as it is, the queries run on a throwaway copy
+            check_dir = tempfile.mkdtemp(prefix="racf_unload_")
+            index_path = os.path.join(check_dir, "unload.sqlite")
+        result["record_counts"] = build_unload_index(unload_path, index_path, module.params["encoding"])
+        result["index_rebuilt"] = not module.check_mode
+
+    connection = open_unload_index(index_path)
+    try:
+        if module.params["users"]:
+            result["racf_info"]["users"] = {user: query_user(connection, user) for user in module.params["users"]}
+        if module.params["group_members"]:
+            result["racf_info"]["group_members"] = {group: query_group_members(connection, group) for group in module.params["group_members"]}
+        if module.params["expires_within_days"] is not None:
+            result["racf_info"]["expiring_certificates"] = query_expiring_certificates(connection, module.params["expires_within_days"])
+    finally:
+        connection.close()
+        if check_dir is not None:
+            shutil.rmtree(check_dir, ignore_errors=True)
+
+    module.exit_json(**finish_result(result))
+
+
+def main():
+    run_racf_module(run_module, "racf_unload_facts")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,8 +19,8 @@ description: Ansible module to help manage RACF Users
 
 options:
     name:
-        description: The user name in RACF
-        required: True
+        description: The user name in RACF, required unless `users` is used
+        required: False
         type: str
     user_name_info: 
         description: Specifies the user name to be associated with the new user ID. You can use a maximum of 20 alphanumeric or non-alphanumeric character
@@ -64,20 +64,109 @@ options:
         required: false
         type: bool
     return_output:
-        description: When true will return the ful output of LISTUSER
+        description:
+            - When true the raw command output is returned, otherwise only the parsed information
+            - Output longer than `output_limit` characters is truncated unless `compress_output` is set
+        required: false
+        type: bool
+        default: false
+    output_limit:
+        description: Maximum number of characters of raw output returned, 0 returns it whole
+        required: false
+        type: int
+        default: 65536
+    compress_output:
+        description: Return the raw output zlib compressed and base64 encoded under `<key>_zlib` instead of truncating it
+        required: false
+        type: bool
+        default: false
+    fields:
+        description:
+            - Keys of the user information returned, all keys are returned when omitted
+            - Applies to every user information of `racf_info` and of `results`
+        required: false
+        type: list
+        elements: str
+    verify:
+        description:
+            - How the outcome of ADDUSER, ALTUSER, DELUSER and CONNECT commands is checked
+            - C(full) lists the user again after the change and returns the refreshed information
+            - C(messages) decides from the return code and the ICH/IRR message ids and fails the task when a command failed, without listing the user again
+            - C(none) only fails the task on a non-zero return code, without checking the messages nor listing the user again
+            - With C(messages) and C(none), racf_info holds the listing taken before the change
+        required: false
+        type: str
+        choices: [full, messages, none]
+        default: full
+    batch:
+        description:
+            - List of items handled by the action plugin, each item takes the same options as the task and options set on the task apply to every item
+            - All items are sent to the target in one module run through `users` and the per item results are returned in `results`
+            - Looped tasks are coalesced the same way, every item of `results` has the keys of a single user run
+        required: false
+        type: list
+        elements: dict
+    task_results:
+        description:
+            - With `users`, every entry of `results` has the keys of a single user run instead of the `users` keys
+            - Set by the action plugin for `batch` and coalesced loops, so registered items keep their usual shape
         required: false
         type: bool
+        default: false
+    metrics:
+        description:
+            - When true the result holds `racf_metrics` with the verb, elapsed seconds, output bytes and return code of every command and the total parse time
+            - Also enabled by the `RACF_METRICS` environment variable on the target, the `billpereira.community_racf.racf_metrics` callback aggregates them at the end of the play
+        required: false
+        type: bool
+        default: false
+    cache_ttl:
+        description:
+            - Seconds a `list_only` result is kept in the controller side cache and reused for the same host and profile
+            - Any run that changes the profile invalidates its cached results
+            - Defaults to the `RACF_INFO_CACHE_TTL` environment variable, 0 disables the cache
+        required: false
+        type: int
     state:
         description:
             - This field is required in case list_only is true
             - If `present` checks if user exists if not create
+            - If `present` and the user exists, a single ALTUSER updates the name, owner, default group and OMVS, TSO and DFP segment fields that differ from the requested ones
+            - With `present`, `groups` the user is not connected to yet are connected in the same batch, for a single user as for `users`
             - If `absent` checks if user exists if so deletes 
             - If `connect` it will connect the user with groups specified
             - If `remove` will remove the connection  from user with group
         required: false
         type: str
-
-
+    users:
+        description:
+            - List of users to manage in a single module execution
+            - Each item accepts `name`, `state` and the same user options as the module
+            - The `state` of each item defaults to `present`
+            - All users are listed at once and only the needed AU, DU and CO commands are issued
+            - A user named again is listed again after the commands of its earlier item and planned from that listing, the items of a user apply in order
+            - Mutually exclusive with `name`
+            - With `state` present the `groups` of a user are connected as well
+        required: false
+        type: list
+        elements: dict
+    model_user:
+        description:
+            - User listed once to create every user of `targets` from
+            - The targets get the owner, default group, OMVS, TSO and DFP segments and group connects of the model, except its UID and its name
+            - The model user ID in the OMVS home of the model is replaced with the target user ID
+            - Options set on the task, then on the target, override the model. `{name}` in their values is replaced with the target user ID
+            - All AU and CO commands are issued in one batch, targets that exist already are altered to match
+            - Mutually exclusive with `name` and `users`
+        required: false
+        type: str
+    targets:
+        description:
+            - Users created from `model_user`, each item takes `name` and the same user options as the module except `state`
+            - Use `uid: auto` in `user_omvs_segment` to have RACF assign the UIDs
+        required: false
+        type: list
+        elements: dict
 
 author:
     - Bill Pereira (@billpereira)
@@ -129,18 +218,53 @@ EXAMPLES = r"""
     racf_user:
     name: "{{target_user}}"
     state: absent
+
+- name: Create the users of a team from a model in one task
+  billpereira.community_racf.racf_user:
+    model_user: "{{ source_user }}"
+    user_omvs_segment:
+        home: /u/{name}
+        uid: auto
+    targets:
+      - name: USER04
+        user_name_info: First User
+        user_password: "P4SSW0RD"
+      - name: USER05
+        user_name_info: Second User
+        groups:
+          - group_name: APPGP
+
+- name: Onboard several users in one module execution
+  billpereira.community_racf.racf_user:
+    users:
+      - name: USER01
+        user_owner: OWNGP
+        default_group: OWNGP
+        state: present
+      - name: USER02
+        groups:
+          - group_name: APPGP
+        state: connect
+      - name: USER03
+        state: absent
 """
 
 RETURN = r"""
 # These are examples of possible return values, and in general should use other names for return values.
+  messages:
+    description: RACF and TSO message ids returned by the commands issued
+    sample: [ICH01024I]
+  alter_command:
+    description: The ALTUSER command issued when an existing user differed from the requested values
+    sample: ALU USER1 NAME('NEW NAME') OMVS( UID(100) )
   racf_info:
     description:  The RACF User information
     sample:
-        raw_output: COMMAND OUTPUT
+        raw_output: COMMAND OUTPUT, only with return_output
         user_cics_segment:  list
         user_csdata_segment: list 
         user_default_group: OWNGP
-        user_dfp_segment:  list
+        user_dfp_segment:  list of mgmtclass, storclass, dataclass and dataappl
         user_group_connects: list 
         group_auth: USE
         group_connect_attribute: NONE
@@ -149,64 +273,160 @@ RETURN = r"""
         user_omvs_segment:  list
         user_owner: ONWER
         user_tso_segment:  list
-
+  results:
+    description: Per user results when `users` or `targets` is used
+    sample:
+        - name: USER01
+          state: present
+          changed: true
+          commands:
+            - AU USER01 DFLTGRP(OWNGP) OWNER(OWNGP)
+          command_outputs: list
+          racf_info: list
+
+  queue_wait:
+    description: Seconds spent waiting for a command slot, returned when `RACF_MAX_CONCURRENCY` is set on the target
+    sample: 0.125
+  racf_metrics:
+    description: Command and parse timings, returned when `metrics` is true
+    sample:
+        commands:
+          - verb: LU
+            elapsed: 0.052
+            bytes: 1480
+            rc: 0
+        command_time: 0.052
+        parse_time: 0.001
+        parses: 1
+        session_start: 0.310
+  racf_profile:
+    description: Hottest functions of the run and, with `RACF_PROFILE_MEMORY`, its top allocations, or the files they were written to, returned when `RACF_PROFILE` is set on the target
+    sample:
+        functions:
+          - function: racf_user.py:266(parse_user_info)
+            calls: 1
+            total_time: 0.0021
+            cumulative_time: 0.0113
+        memory_peak: 233387
+  executed_commands:
+    description: Commands that changed RACF before a timeout or a listing failing all its retries ended the task, returned with that failure only
+    sample: ["CO (USER01) GROUP(APPGRP)"]
+  command_events:
+    description: Timeouts, errors, retries and hedged reads of the TSO commands, returned when any happened. Commands changing RACF are reported by verb only
+    sample:
+        - event: timeout
+          verb: LU
+          command: LU USER01
+          attempt: 0
+          elapsed: 30.001
+        - event: retry
+          verb: LU
+          command: LU USER01
+          attempt: 1
+          elapsed: 0.412
 """
 
-import subprocess
 import re 
 
-# from ..module_utils.racf_helper import generate_keyring_owner_suffix, run_tso_command_and_capture_output
-
-def run_tso_command_and_capture_output(command):
-    try:
-        command_results = subprocess.run([command], capture_output=True, shell=True)
-        return command_results.stdout.decode()
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Error executing TSO command: {e}")
-
-def extract_user_info(list_output):
-    user_name = re.findall('NAME=(.*?)OWNER',list_output)
-    user_owner = re.findall('OWNER=(.*?)\s',list_output)
-    user_default_group = re.findall('DEFAULT-GROUP=(.*?)\s',list_output)
-    user_connects = [{'group_name':item[0].strip(), 'group_auth': item[1].strip(), 'group_owner': item[2].strip(), 'group_attribute': item[3].strip() } for item in re.findall('\sGROUP=(.*?)\s*AUTH=(.*?)\s*CONNECT-OWNER=(.*?)\s[\s\S]*?ATTRIBUTES=(.*?)\s',list_output)]
-    try:
-        user_csdata_segment = [{key.strip(): value.strip()} for line in list_output.split('CSDATA')[1].splitlines() if "=" in line for key, value in [line.split("=")]]
-    except IndexError: 
-        user_csdata_segment = []
-    user_tso_segment = [{'acctnum':item[0].strip(), 'dest':item[1].strip(), 'holdclass':item[2].strip(),'msgclass':item[3].strip(),'proc':item[4].strip(),'size':item[5].strip(),'maxsize':item[6].strip(),'sysoutclass':item[7].strip(),'userdata':item[8].strip(),'command':item[9].strip()} for item in re.findall('TSO INF[\s\S]*ACCTNUM= (.*)\s*DEST= (.*)\s*HOLDCLASS= (.*)\s*MSGCLASS= (.*)\s*PROC= (.*)\s*SIZE= (.*)\s*MAXSIZE= (.*)\s*SYSOUTCLASS= (.*)\s*USERDATA= (.*)\s*COMMAND=(.*)',list_output)]
-    user_cics_segment = [{'opident': item[0].strip(), 'opprty': item[1].strip(), 'timeout': item[2].strip(), 'xrfsoff': item[3].strip()} for item in re.findall('CICS IN[\s\S]*OPIDENT=(.*)\s*OPPRTY= (.*)\s*TIMEOUT= (.*)\s*XRFSOFF= (.*)',list_output)]
-    user_dfp_segment = [{'mgmtclass':item[0].strip(), 'storclass':item[1].strip()} for item in re.findall('DFP INF[\s\S]*MGMTCLAS= (.*)\s*STORCLAS= (.*)',list_output)]
-    user_omvs_segment = [{'uid':item[0].strip(),'home':item[1].strip(),'program':item[2].strip(),'cputimemax':item[3].strip(),'assizemax':item[4].strip(),'fileprocmax':item[5].strip(),'procusermax':item[6].strip(),'threadsmax':item[7].strip(),'mmapareamax':item[8].strip()} for item in re.findall('OMVS INF[\s\S]*UID= (.*)\s*HOME= (.*)\s*PROGRAM= (.*)\s*CPUTIMEMAX= (.*)\s*ASSIZEMAX= (.*)\s*FILEPROCMAX= (.*)\s*PROCUSERMAX=(.*)\s*THREADSMAX= (.*)\s*MMAPAREAMAX= (.*)',list_output)]
-    list_user_info = []
-    if 'UNABLE' in list_output: 
-        return list_user_info
-    list_user_info.append({
-        'user_name_info': user_name[0].strip(),
-        'user_default_group': user_default_group[0].strip(),
-        'user_owner': user_owner[0].strip(),
-        'user_group_connects': user_connects,
-        'user_tso_segment': user_tso_segment,
-        'user_csdata_segment': user_csdata_segment,
-        'user_cics_segment': user_cics_segment,
-        'user_dfp_segment': user_dfp_segment,
-        'user_omvs_segment': user_omvs_segment,
-        'raw_output': list_output
-    })
-    return list_user_info
+from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_helper import VERIFY_CHOICES, check_command_results, check_tso_command, command_failed, finish_result, get_cached_profile, join_lines, compact_profile, output_options, put_cached_profile, run_racf_module, run_tso_command, run_tso_commands, start_module, stream_tso_command, tee_lines, timed_parse, tso_session, verify_command_results
+
+LISTUSER_BASE_PATTERN = re.compile(r'NAME=(.*?)OWNER=(\S*)')
+LISTUSER_CONNECT_PATTERN = re.compile(r'\s+GROUP=(\S*)\s+AUTH=(\S*)\s+CONNECT-OWNER=(\S*)')
+
+LISTUSER_SEGMENT_FIELDS = {
+    'TSO': (('ACCTNUM', 'acctnum'), ('DEST', 'dest'), ('HOLDCLASS', 'holdclass'), ('MSGCLASS', 'msgclass'), ('PROC', 'proc'), ('SIZE', 'size'), ('MAXSIZE', 'maxsize'), ('SYSOUTCLASS', 'sysoutclass'), ('USERDATA', 'userdata'), ('COMMAND', 'command')),
+    'CICS': (('OPIDENT', 'opident'), ('OPPRTY', 'opprty'), ('TIMEOUT', 'timeout'), ('XRFSOFF', 'xrfsoff')),
+    'DFP': (('MGMTCLAS', 'mgmtclass'), ('STORCLAS', 'storclass'), ('DATACLAS', 'dataclass'), ('DATAAPPL', 'dataappl')),
+    'OMVS': (('UID', 'uid'), ('HOME', 'home'), ('PROGRAM', 'program'), ('CPUTIMEMAX', 'cputimemax'), ('ASSIZEMAX', 'assizemax'), ('FILEPROCMAX', 'fileprocmax'), ('PROCUSERMAX', 'procusermax'), ('THREADSMAX', 'threadsmax'), ('MMAPAREAMAX', 'mmapareamax')),
+}
+
+def extract_user_info(list_output, return_output=False):
+    user_info = parse_user_info(list_output.splitlines())
+    if user_info is None:
+        return []
+    if return_output:
+        user_info['raw_output'] = list_output
+    return [user_info]
     # return list_certificates if len(list_certificates)>0 else [list_output]
 
+@timed_parse
+def parse_user_info(lines):
+    user_name = user_owner = user_default_group = ''
+    user_connects = []
+    segments = {}
+    segment = None
+    connect = None
+    for line in lines:
+        if 'UNABLE' in line:
+            return None
+        if '=' not in line:
+            if line.rstrip().endswith('INFORMATION'):
+                segment = None if line.lstrip().startswith('NO ') else line.split()[0]
+                if segment is not None:
+                    segments[segment] = []
+            continue
+        if segment is not None:
+            key, _, value = line.partition('=')
+            segments[segment].append((key.strip(), value.strip()))
+            continue
+        if 'GROUP=' in line:
+            connect_match = LISTUSER_CONNECT_PATTERN.match(line)
+            if connect_match:
+                connect = {'group_name': connect_match.group(1), 'group_auth': connect_match.group(2), 'group_owner': connect_match.group(3), 'group_attribute': None}
+                user_connects.append(connect)
+                continue
+            if not user_default_group and 'DEFAULT-GROUP=' in line:
+                user_default_group = line.partition('DEFAULT-GROUP=')[2].split(None, 1)[0]
+                continue
+        if connect is not None:
+            if connect['group_attribute'] is None and 'ATTRIBUTES=' in line:
+                connect['group_attribute'] = line.partition('ATTRIBUTES=')[2].split(None, 1)[0]
+        elif not user_owner:
+            base = LISTUSER_BASE_PATTERN.search(line)
+            if base:
+                user_name, user_owner = base.group(1).strip(), base.group(2)
+    for connect in user_connects:
+        if connect['group_attribute'] is None:
+            connect['group_attribute'] = ''
+    return {
+        'user_name_info': user_name,
+        'user_default_group': user_default_group,
+        'user_owner': user_owner,
+        'user_group_connects': user_connects,
+        'user_tso_segment': extract_segment(segments, 'TSO'),
+        'user_csdata_segment': [{key: value} for key, value in segments.get('CSDATA', [])],
+        'user_cics_segment': extract_segment(segments, 'CICS'),
+        'user_dfp_segment': extract_segment(segments, 'DFP'),
+        'user_omvs_segment': extract_segment(segments, 'OMVS'),
+    }
 
-def list_user(user, segments=''):
-    list_user_command = f"tsocmd \"LU {user} {' '.join(segments)}\""
-    command_output = run_tso_command_and_capture_output(list_user_command)
-    results = extract_user_info(command_output)
-    return results
-
-def delete_user(user):
-    del_user_command = f"tsocmd \"du {user}\""
-    command_output = run_tso_command_and_capture_output(del_user_command)
-    results = list_user(user)
-    return results
+def extract_segment(segments, segment):
+    if segment not in segments:
+        return []
+    fields = dict(segments[segment])
+    return [{key: fields.get(field, '') for field, key in LISTUSER_SEGMENT_FIELDS[segment]}]
+
+
+def list_user(user, segments='', return_output=False):
+    list_user_command = f"LU {user} {' '.join(segments)}"
+    if return_output:
+        # the cache holds no output, list again when it is asked for
+        output_lines = []
+        user_info = parse_user_info(tee_lines(stream_tso_command(list_user_command), output_lines))
+        if user_info is not None:
+            user_info['raw_output'] = join_lines(output_lines)
+        return [user_info] if user_info is not None else []
+    cached_info = get_cached_profile("user", user.upper(), list_user_command)
+    if cached_info is not None:
+        return cached_info
+    user_info = parse_user_info(stream_tso_command(list_user_command))
+    put_cached_profile("user", user.upper(), list_user_command, [user_info] if user_info is not None else [])
+    return [user_info] if user_info is not None else []
+
+def delete_user(user, verify="full", return_output=False):
+    command_result = check_tso_command(run_tso_command(f"DU {user}"))
+    results = list_user(user, return_output=return_output) if verify == "full" else None
+    return results, command_result
 
 def generate_default_group_suffix(default_group):
     return f" DFLTGRP({default_group})" if default_group else ""
@@ -226,7 +446,7 @@ def generate_owner_suffix(OWNER):
     return f" OWNER({OWNER})" if OWNER else ""
 
 def generate_omvs_suffix(omvs_segment):
-    if omvs_segment:
+    if omvs_segment and any(omvs_segment.values()):
         assizemax = f"ASSIZEMAX({omvs_segment['assizemax']})" if omvs_segment['assizemax'] != "NONE" and omvs_segment['assizemax'] != "" else ""
         uid = "AUTOUID" if omvs_segment['uid'] == "auto" else (f"UID({omvs_segment['uid']})" if omvs_segment['uid'] != "" else "")
         cputimemax = f"CPUTIMEMAX({omvs_segment['cputimemax']})" if omvs_segment['cputimemax'] != "NONE" and omvs_segment['cputimemax'] != "" else ""
@@ -239,22 +459,23 @@ def generate_omvs_suffix(omvs_segment):
     return ""
 
 def generate_tso_suffix(tso_segment):
-    if tso_segment:
+    if tso_segment and any(tso_segment.values()):
         acctnum = f"ACCTNUM({tso_segment['acctnum']})" if tso_segment['acctnum'] else ""
         command = f"COMMAND({tso_segment['command']})" if tso_segment['command'] else ""
         dest = f"DEST({tso_segment['dest']})" if tso_segment['dest'] else ""
         holdclass = f"HOLDCLASS({tso_segment['holdclass']})" if tso_segment['holdclass'] else ""
-        maxsize = f"MAXSIZE({tso_segment['maxsize'].lstrip('0')})" if tso_segment['maxsize'] else ""
+        # LISTUSER shows an unset size as zeros
+        maxsize = f"MAXSIZE({tso_segment['maxsize'].lstrip('0')})" if tso_segment['maxsize'].lstrip('0') else ""
         msgclass = f"MSGCLASS({tso_segment['msgclass']})" if tso_segment['msgclass'] else ""
         proc = f"PROC({tso_segment['proc']})" if tso_segment['proc'] else ""
-        size = f"SIZE({tso_segment['size'].lstrip('0')})" if tso_segment['size'] else ""
+        size = f"SIZE({tso_segment['size'].lstrip('0')})" if tso_segment['size'].lstrip('0') else ""
         userdata = f"USERDATA({tso_segment['userdata']})" if tso_segment['userdata'] else ""
         sysoutclass = f"SYS({tso_segment['sysoutclass']})" if tso_segment['sysoutclass'] else ""
         return f" TSO({acctnum} {command} {dest} {holdclass} {maxsize} {msgclass} {proc} {size} {userdata} {sysoutclass})"
     return ""
 
 def generate_dfp_suffix(dfp):
-    if dfp:
+    if dfp and any(dfp.values()):
         mgmtclass = f"MGMTCLAS({dfp['mgmtclass']})" if dfp['mgmtclass'] else ""
         storclass = f"STORCLAS({dfp['storclass']})" if dfp['storclass'] else ""
         dataclass = f"DATACLAS({dfp['dataclass']})" if dfp['dataclass'] else ""
@@ -263,40 +484,232 @@ def generate_dfp_suffix(dfp):
     return ""
 
 
-def add_user(user, user_name_info,default_group,user_owner, password, omvs_segment, tso_segment, dfp_segment):
-    # return generate_omvs_suffix(omvs_segment)
-    add_user_command = f"tsocmd \"AU {user}{generate_default_group_suffix(default_group)}{generate_name_suffix(user_name_info)}{generate_owner_suffix(user_owner)}{generate_password_suffix(password)}{generate_omvs_suffix(omvs_segment)}{generate_tso_suffix(tso_segment)}{generate_dfp_suffix(dfp_segment)}\""
-    command_output = run_tso_command_and_capture_output(add_user_command)
-    results = list_user(user)
-    return results if len(results)>0 else command_output
-
-def connect_groups(user, groups, user_group_connects):
-    group_updated = False
-    missing_groups = []
-    connect_results = []
-    for group in groups:
-        found_match = next((item for item in user_group_connects if item.get('group_name') == group['group_name']), None)
-        if found_match is None:
-            missing_groups.append(group)
-            connect_command = f"tsocmd \"CO ({user}) GROUP({group['group_name']})\""
-            connect_results.append(run_tso_command_and_capture_output(connect_command))
-            group_updated = True
-    results = list_user(user)
-        
-            
+def generate_add_user_command(user, user_name_info,default_group,user_owner, password, omvs_segment, tso_segment, dfp_segment):
+    return f"AU {user}{generate_default_group_suffix(default_group)}{generate_name_suffix(user_name_info)}{generate_owner_suffix(user_owner)}{generate_password_suffix(password)}{generate_omvs_suffix(omvs_segment)}{generate_tso_suffix(tso_segment)}{generate_dfp_suffix(dfp_segment)}"
+
+SEGMENT_OPTIONS = (('OMVS', 'user_omvs_segment'), ('TSO', 'user_tso_segment'), ('DFP', 'user_dfp_segment'))
+
+def generate_list_segments(segments, user_specs):
+    list_segments = list(segments)
+    for segment, option in SEGMENT_OPTIONS:
+        if segment not in [item.upper() for item in list_segments] and any(user_spec['state'] == 'present' and any(user_spec[option].values()) for user_spec in user_specs):
+            list_segments.append(segment)
+    return list_segments
+
+# z/OS UNIX paths are case sensitive, every other segment value is a RACF keyword value
+CASE_SENSITIVE_SEGMENT_FIELDS = ('home', 'program')
+
+def normalize_segment_value(key, value):
+    value = value.strip()
+    if key in CASE_SENSITIVE_SEGMENT_FIELDS:
+        return value
+    value = value.upper()
+    if key in ('uid', 'size', 'maxsize', 'opprty') and value.isdigit():
+        return value.lstrip('0') or '0'
+    return value
+
+def generate_segment_delta(desired_segment, current_segment):
+    current = current_segment[0] if current_segment else {}
+    delta = {}
+    for key, value in (desired_segment or {}).items():
+        if value in ('', 'NONE', None) or key == 'fileprocmax' or (key == 'uid' and value == 'auto' and current.get('uid')):
+            delta[key] = ''
+        elif key not in current or normalize_segment_value(key, value) != normalize_segment_value(key, current[key]):
+            delta[key] = value
+        else:
+            delta[key] = ''
+    return delta
+
+def generate_alter_user_command(user, user_spec, user_info):
+    name_info = user_spec['user_name_info'] if user_spec['user_name_info'] and user_spec['user_name_info'].upper() != user_info['user_name_info'].upper() else ''
+    default_group = user_spec['default_group'] if user_spec['default_group'] and user_spec['default_group'].upper() != user_info['user_default_group'].upper() else ''
+    user_owner = user_spec['user_owner'] if user_spec['user_owner'] and user_spec['user_owner'].upper() != user_info['user_owner'].upper() else ''
+    keywords = (
+        generate_default_group_suffix(default_group)
+        + generate_name_suffix(name_info)
+        + generate_owner_suffix(user_owner)
+        + generate_omvs_suffix(generate_segment_delta(user_spec['user_omvs_segment'], user_info['user_omvs_segment']))
+        + generate_tso_suffix(generate_segment_delta(user_spec['user_tso_segment'], user_info['user_tso_segment']))
+        + generate_dfp_suffix(generate_segment_delta(user_spec['user_dfp_segment'], user_info['user_dfp_segment']))
+    )
+    return f"ALU {user}{keywords}" if keywords else ""
+
+def generate_connect_command(user, group):
+    authority = f" AUTHORITY({group['group_auth']})" if group.get('group_auth') else ""
+    return f"CO ({user}) GROUP({group['group_name']}){authority}"
+
+def missing_group_connects(groups, user_group_connects, default_group=''):
+    # a new user is connected to its default group by AU already
+    connected_groups = {item.get('group_name', '').upper() for item in user_group_connects} | {default_group.upper()}
+    return [group for group in groups if group['group_name'] and group['group_name'].upper() not in connected_groups]
+
+def connect_groups(user, groups, user_group_connects, verify="full", return_output=False):
+    missing_groups = missing_group_connects(groups, user_group_connects)
+    connect_commands = [generate_connect_command(user, group) for group in missing_groups]
+    command_results = [check_tso_command(item) for item in run_tso_commands(connect_commands)]
+    group_updated = len(missing_groups) > 0
+    results = list_user(user, return_output=return_output) if group_updated and verify == "full" else None
+
     return {
         'updated_groups': missing_groups,
         'updated_user': results,
-        'command_outputs': connect_results,
+        'command_outputs': [item['output'] for item in command_results],
+        'command_results': command_results,
         'user_changed': group_updated
     }
 
 
-def run_module():
-    module_args = dict(
-        name=dict(type="str", required=True),
+def list_users(users, segments='', return_output=False):
+    list_commands = {user: f"LU {user} {' '.join(segments)}" for user in users}
+    # the cache holds no output, every user is listed again when it is asked for
+    users_info = {user: None if return_output else get_cached_profile("user", user.upper(), list_commands[user]) for user in users}
+    uncached_users = [user for user in users if users_info[user] is None]
+    list_results = run_tso_commands(list_commands[user] for user in uncached_users)
+    for user, item in zip(uncached_users, list_results):
+        users_info[user] = extract_user_info(item['output'], return_output)
+        if not return_output:
+            put_cached_profile("user", user.upper(), list_commands[user], users_info[user])
+    return users_info
+
+def plan_user(user_spec, racf_info):
+    user = user_spec['name']
+    if user_spec['state'] == 'present' and len(racf_info) == 0:
+        add_user_command = generate_add_user_command(user, user_spec['user_name_info'], user_spec['default_group'], user_spec['user_owner'], user_spec['user_password'], user_spec['user_omvs_segment'], user_spec['user_tso_segment'], user_spec['user_dfp_segment'])
+        return [add_user_command] + [generate_connect_command(user, group) for group in missing_group_connects(user_spec['groups'], [], user_spec['default_group'])]
+    if user_spec['state'] == 'present' and len(racf_info) == 1:
+        alter_user_command = generate_alter_user_command(user, user_spec, racf_info[0])
+        connect_commands = [generate_connect_command(user, group) for group in missing_group_connects(user_spec['groups'], racf_info[0]['user_group_connects'], user_spec['default_group'] or racf_info[0]['user_default_group'])]
+        return ([alter_user_command] if alter_user_command else []) + connect_commands
+    if user_spec['state'] == 'absent' and len(racf_info) == 1:
+        return [f"DU {user}"]
+    if user_spec['state'] == 'connect' and len(racf_info) == 1:
+        return [generate_connect_command(user, group) for group in missing_group_connects(user_spec['groups'], racf_info[0]['user_group_connects'])]
+    return []
+
+CLONE_PLACEHOLDER = '{name}'
+
+def render_clone_value(value, name):
+    return value.replace(CLONE_PLACEHOLDER, name) if isinstance(value, str) else value
+
+def clone_segment(option, model_segment, overrides, name, model_name):
+    # option defaults, then the model, then the task and target overrides; a
+    # UID is unique so the model's one is never copied
+    segment = {key: '' for key in user_options()[option]['options']}
+    segment.update({key: value for key, value in (model_segment[0] if model_segment else {}).items() if key in segment and key != 'uid'})
+    if segment.get('home'):
+        # the model's home is its own directory, /u/model becomes /u/target
+        segment['home'] = re.sub(re.escape(model_name), lambda found: name.lower() if found.group(0).islower() else name.upper(), segment['home'], flags=re.IGNORECASE)
+    for override in overrides:
+        segment.update({key: render_clone_value(value, name) for key, value in (override or {}).items() if value})
+    return segment
+
+def clone_groups(model_info, overrides):
+    groups = {}
+    for group in model_info['user_group_connects'] + [group for override in overrides for group in override]:
+        if group['group_name']:
+            groups[group['group_name'].upper()] = dict(group_name=group['group_name'], group_auth=group.get('group_auth') or '')
+    return list(groups.values())
+
+def clone_user_specs(model_info, params):
+    user_specs = []
+    for target in params['targets']:
+        name = target['name']
+        user_spec = dict(name=name, state='present', user_password=target['user_password'] or params['user_password'])
+        # the name of the model describes its owner, a target only gets the one it is given
+        user_spec['user_name_info'] = render_clone_value(target['user_name_info'] or params['user_name_info'], name)
+        for option, model_key in (('default_group', 'user_default_group'), ('user_owner', 'user_owner')):
+            user_spec[option] = render_clone_value(target[option] or params[option] or model_info[model_key], name)
+        for segment, option in SEGMENT_OPTIONS:
+            user_spec[option] = clone_segment(option, model_info[option], (params[option], target[option]), name, params['model_user'])
+        user_spec['groups'] = clone_groups(model_info, (params['groups'], target['groups']))
+        user_specs.append(user_spec)
+    return user_specs
+
+def user_task_result(user_spec, user_result, racf_info, verify="full"):
+    # the keys of a single user run for the same spec, built from its `users` entry
+    user_info = racf_info[0] if len(racf_info) == 1 else None
+    command_results = user_result['command_outputs']
+    task_result = dict(changed=user_result['changed'], name=user_spec['name'], list_only=False, racf_info=user_result['racf_info'])
+    if user_spec['state'] == 'present' and user_info is not None and user_result['commands'] and user_result['commands'][0].startswith('ALU '):
+        task_result['alter_command'] = user_result['commands'][0]
+    if (user_spec['state'] == 'connect' and user_info is not None) or (user_spec['state'] == 'present' and user_spec['groups']):
+        default_group = (user_spec['default_group'] or (user_info['user_default_group'] if user_info else '')) if user_spec['state'] == 'present' else ''
+        task_result['updated_group_connections'] = missing_group_connects(user_spec['groups'], user_info['user_group_connects'] if user_info else [], default_group)
+        task_result['connect_outputs'] = [item['output'] for item in command_results if item['command'].startswith('CO ')]
+    if command_results or (user_spec['state'] == 'connect' and user_info is not None):
+        check_command_results(task_result, command_results, verify)
+    elif user_result.get('failed'):
+        task_result.update(failed=True, msg=user_result['msg'])
+    return task_result
+
+def user_rounds(user_specs):
+    # a user named again waits for the commands of its earlier entry and is
+    # planned from a listing taken after them, as when the entries run one by one
+    rounds = []
+    last_round = {}
+    for index, user_spec in enumerate(user_specs):
+        round_index = last_round.get(user_spec['name'].upper(), -1) + 1
+        last_round[user_spec['name'].upper()] = round_index
+        if round_index == len(rounds):
+            rounds.append([])
+        rounds[round_index].append(index)
+    return rounds
+
+def run_bulk(user_specs, segments, verify="full", task_results=False, return_output=False):
+    segments = generate_list_segments(segments, user_specs)
+    rounds = user_rounds(user_specs)
+    current_info = list_users(list(dict.fromkeys(user_spec['name'].upper() for user_spec in user_specs)), segments, return_output)
+    user_results = [None] * len(user_specs)
+    planned_info = [None] * len(user_specs)
+    for round_number, round_indexes in enumerate(rounds):
+        planned_commands = []
+        for index in round_indexes:
+            user_spec = user_specs[index]
+            planned_info[index] = current_info[user_spec['name'].upper()]
+            user_result = dict(name=user_spec['name'], state=user_spec['state'], changed=False, commands=[], command_outputs=[], racf_info=planned_info[index])
+            if user_spec['state'] == 'connect' and len(user_result['racf_info']) == 0:
+                user_result['failed'] = True
+                user_result['msg'] = f"Unable to find {user_spec['name']} to perform connect"
+            else:
+                user_result['commands'] = plan_user(user_spec, user_result['racf_info'])
+                user_result['changed'] = len(user_result['commands']) > 0
+            planned_commands.extend((user_result, command) for command in user_result['commands'])
+            user_results[index] = user_result
+
+        command_results = run_tso_commands(command for user_result, command in planned_commands)
+        for (user_result, command), command_result in zip(planned_commands, command_results):
+            user_result['command_outputs'].append(check_tso_command(command_result))
+            if command_failed(command_result, verify):
+                user_result['failed'] = True
+                user_result['msg'] = f"RACF command failed: {command}"
+
+        # changed users are listed again to verify them or to plan their next entry
+        later_names = {user_specs[index]['name'].upper() for later_indexes in rounds[round_number + 1:] for index in later_indexes}
+        changed_users = list(dict.fromkeys(
+            user_results[index]['name'].upper() for index in round_indexes
+            if user_results[index]['changed'] and (verify == 'full' or user_results[index]['name'].upper() in later_names)
+        ))
+        current_info.update(list_users(changed_users, segments, return_output))
+        if verify == 'full':
+            for index in round_indexes:
+                user_results[index]['racf_info'] = current_info[user_results[index]['name'].upper()]
+    if task_results:
+        return [user_task_result(user_spec, user_result, racf_info, verify) for user_spec, user_result, racf_info in zip(user_specs, user_results, planned_info)]
+    return user_results
+
+def compact_user_result(result, params):
+    racf_info = result.get("racf_info")
+    users_info = list(racf_info.values()) if isinstance(racf_info, dict) else [racf_info]
+    users_info += [user_result.get("racf_info") for user_result in result.get("results", [])]
+    for user_info in users_info:
+        for profile in user_info or []:
+            compact_profile(profile, params, "raw_output")
+    return result
+
+def user_options(user_item=False):
+    return dict(
+        name=dict(type="str", required=user_item),
         user_password=dict(type="str", required=False, default='', no_log=True),
-        segments=dict(type="list",required=False, default=[]),
         default_group=dict(type="str",required=False,default=''),
         user_name_info=dict(type="str",required=False,default=''),
         user_owner=dict(type='str',required=False,default=''),
@@ -338,73 +751,127 @@ def run_module():
         state=dict(
             type="str",
             required=False,
+            default="present" if user_item else None,
             choices=["present", "absent", "connect","remove"],
         ),
+    )
+
+def run_module():
+    module_args = user_options()
+    module_args.update(
+        segments=dict(type="list",required=False, default=[]),
         list_only=dict(type="bool", required=False, default=False),
-        return_output=dict(type="bool", required=False, default=False),
+        cache_ttl=dict(type="int", required=False),
+        verify=dict(type="str", required=False, default="full", choices=VERIFY_CHOICES),
+        metrics=dict(type="bool", required=False, default=False),
+        task_results=dict(type="bool", required=False, default=False),
+        users=dict(type="list", required=False, elements='dict', options=user_options(user_item=True)),
+        model_user=dict(type="str", required=False),
+        targets=dict(type="list", required=False, elements='dict', options={key: option for key, option in user_options(user_item=True).items() if key != 'state'}),
     )
+    module_args.update(output_options())
 
     required_if = [
-        ("list_only", False, ("state",)),
+        ("list_only", False, ("state", "users", "model_user"), True),
     ]
 
     result = dict(changed=False, racf_info={})
     module = AnsibleModule(
-        argument_spec=module_args, supports_check_mode=True, required_if=required_if
+        argument_spec=module_args, supports_check_mode=True, required_if=required_if,
+        required_one_of=[("name", "users", "model_user")], mutually_exclusive=[("name", "users", "model_user")],
+        required_together=[("model_user", "targets")],
     )
+    start_module(module, compact_user_result, result)
     # result['omvs']  = module.params["user_omvs_segment"]
     if module.check_mode:
-        module.exit_json(**result)
+        module.exit_json(**finish_result(result))
+
+    user_specs = module.params["users"]
+    if module.params["model_user"]:
+        # the model is listed once, every target is created from that listing
+        result["racf_info"] = list_user(module.params["model_user"], [segment for segment, option in SEGMENT_OPTIONS], module.params["return_output"])
+        if len(result["racf_info"]) == 0:
+            module.fail_json(msg=f"Unable to find model user {module.params['model_user']}", **finish_result(result))
+        user_specs = clone_user_specs(result["racf_info"][0], module.params)
+
+    if user_specs:
+        if module.params["list_only"]:
+            result["racf_info"] = list_users([user_spec['name'] for user_spec in user_specs], module.params["segments"], module.params["return_output"])
+            module.exit_json(**finish_result(result))
+        result["results"] = run_bulk(user_specs, module.params["segments"], module.params["verify"], module.params["task_results"], module.params["return_output"])
+        result["changed"] = any(user_result['changed'] for user_result in result["results"])
+        failed_users = [user_result['name'] for user_result in result["results"] if user_result.get('failed')]
+        if failed_users:
+            module.fail_json(msg=f"Unable to process users: {', '.join(failed_users)}", **finish_result(result))
+        module.exit_json(**finish_result(result))
 
     result["name"] = module.params["name"]
     result["list_only"] = module.params["list_only"]
 
+    list_segments = generate_list_segments(module.params["segments"], [module.params]) if module.params["state"] == "present" else module.params["segments"]
     result["racf_info"] = list_user(
-        result["name"], module.params["segments"],
+        result["name"], list_segments, module.params["return_output"],
     )
 
     if module.params["list_only"]:
-        module.exit_json(**result)
+        module.exit_json(**finish_result(result))
 
     if module.params['state'] == 'connect':
         if len(result['racf_info']) == 0:
-            module.fail_json(msg=f"Unable to find {module.params['name']} to perform connect", **result)
-        connect_results = connect_groups(module.params['name'], module.params['groups'], result['racf_info'][0]['user_group_connects'])
+            module.fail_json(msg=f"Unable to find {module.params['name']} to perform connect", **finish_result(result))
+        connect_results = connect_groups(module.params['name'], module.params['groups'], result['racf_info'][0]['user_group_connects'], module.params["verify"], module.params["return_output"])
         result['updated_group_connections'] = connect_results['updated_groups']
         result['connect_outputs'] = connect_results['command_outputs']
         result["changed"] = connect_results['user_changed']
-        result['racf_info'] = connect_results['updated_user']
+        if connect_results['updated_user'] is not None:
+            result['racf_info'] = connect_results['updated_user']
+        verify_command_results(module, result, connect_results['command_results'])
+
+    if module.params["state"] == "present":
+        # ADDUSER or ALTUSER and the connects of missing groups run in one batch, as for `users`
+        user_info = result["racf_info"][0] if len(result["racf_info"]) == 1 else None
+        present_commands = plan_user(module.params, result["racf_info"])
+        command_results = [check_tso_command(item) for item in run_tso_commands(present_commands)]
+        result["changed"] = len(present_commands) > 0
+        if user_info is not None and present_commands and present_commands[0].startswith("ALU "):
+            result["alter_command"] = present_commands[0]
+        if module.params["groups"]:
+            result["updated_group_connections"] = missing_group_connects(
+                module.params["groups"], user_info["user_group_connects"] if user_info else [],
+                module.params["default_group"] or (user_info["user_default_group"] if user_info else ""),
+            )
+            result["connect_outputs"] = [item["output"] for item in command_results if item["command"].startswith("CO ")]
+        if present_commands and module.params["verify"] == "full":
+            result["racf_info"] = list_user(module.params["name"], list_segments, module.params["return_output"])
+        if present_commands:
+            verify_command_results(module, result, command_results)
+        module.exit_json(**finish_result(result))
 
     if (
         len(result["racf_info"]) == 0
         and module.params["state"] == "absent"
-    ) or (
-        len(result["racf_info"]) == 1
-        and module.params["state"] == "present"
     ):
         result["changed"] = False
-        module.exit_json(**result)
+        module.exit_json(**finish_result(result))
 
     if (
         len(result["racf_info"]) == 1
         and module.params["state"] == "absent"
     ):
-        result["racf_info"] = delete_user(module.params["name"])
-        result["changed"] = True
-
-    if (
-        len(result["racf_info"]) == 0
-        and module.params["state"] == "present"
-    ):
-        result["racf_info"] = add_user(module.params["name"], module.params['user_name_info'],module.params['default_group'],module.params['user_owner'],module.params['user_password'],module.params['user_omvs_segment'],module.params['user_tso_segment'],module.params['user_dfp_segment'])
+        updated_user, command_result = delete_user(module.params["name"], module.params["verify"], module.params["return_output"])
         result["changed"] = True
+        if updated_user is not None:
+            result["racf_info"] = updated_user
+        verify_command_results(module, result, [command_result])
+        module.exit_json(**finish_result(result))
 
     # simple AnsibleModule.exit_json(), passing the key/value results
-    module.exit_json(**result)
+    module.exit_json(**finish_result(result))
 
 
 def main():
-    run_module()
+    with tso_session():
+        run_racf_module(run_module, "racf_user")
 
 
 if __name__ == "__main__":
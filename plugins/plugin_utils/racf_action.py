@@ -0,0 +1,141 @@
+import json
+
+from ansible.parsing.mod_args import ModuleArgsParser
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.billpereira.community_racf.plugins.plugin_utils.racf_batch import RacfBatchState
+from ansible_collections.billpereira.community_racf.plugins.plugin_utils.racf_cache import RacfInfoCache
+
+
+class RacfActionBase(ActionBase):
+    profile_type = None
+    batch_param = None
+    batch_shared_options = ()
+    # module options sent with every batch, to have per item results shaped like single runs
+    batch_module_options = {}
+
+    def profile_name(self, module_args):
+        raise NotImplementedError
+
+    def changed_profile_names(self, module_args, module_result):
+        return [self.profile_name(module_args)]
+
+    def batch_results(self, items_args, module_result):
+        return module_result.get("results")
+
+    def invalidate_changed(self, cache, host, module_args, module_result):
+        cache.invalidate(host, self.profile_type, self.changed_profile_names(module_args, module_result))
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(RacfActionBase, self).run(tmp, task_vars)
+        task_vars = task_vars or {}
+        module_args = dict(self._task.args)
+        cache = RacfInfoCache(ttl=module_args.pop("cache_ttl", None))
+        host = task_vars.get("inventory_hostname")
+
+        if "batch" in module_args:
+            batch = module_args.pop("batch") or []
+            result.update(self.run_batch([dict(module_args, **item) for item in batch], task_vars, cache, host) or dict(
+                failed=True, msg=f"Unable to run the batch of {len(batch)} items",
+            ))
+            return result
+
+        loop_result = self.run_coalesced_loop(module_args, task_vars, cache, host)
+        if loop_result is not None:
+            result.update(loop_result)
+            return result
+
+        profile_name = self.profile_name(module_args)
+        cache_params = dict(module_args)
+        cacheable = cache.enabled and profile_name is not None and module_args.get("list_only") and not self._task.check_mode
+
+        if cacheable:
+            cached_result = cache.get(host, self.profile_type, profile_name, cache_params)
+            if cached_result is not None:
+                result.update(cached_result)
+                # the commands were issued by the run that filled the cache
+                result.pop("racf_metrics", None)
+                result["cached"] = True
+                return result
+
+        module_result = self._execute_module(module_args=module_args, task_vars=task_vars)
+        if module_result.get("changed"):
+            self.invalidate_changed(cache, host, module_args, module_result)
+        elif cacheable and not module_result.get("failed"):
+            cache.put(host, self.profile_type, profile_name, cache_params, module_result)
+        result.update(module_result)
+        return result
+
+    def run_batch(self, items_args, task_vars, cache, host):
+        if not items_args:
+            return dict(changed=False, results=[])
+        shared_args = {key: items_args[0][key] for key in self.batch_shared_options if key in items_args[0]}
+        if any({key: item_args.get(key) for key in shared_args} != shared_args for item_args in items_args):
+            return None
+        module_args = dict(shared_args, **self.batch_module_options)
+        module_args[self.batch_param] = [
+            {key: value for key, value in item_args.items() if key not in self.batch_shared_options} for item_args in items_args
+        ]
+        module_result = self._execute_module(module_args=module_args, task_vars=task_vars)
+        item_results = self.batch_results(items_args, module_result)
+        if not isinstance(item_results, list) or len(item_results) != len(items_args):
+            return None
+        for item_args, item_result in zip(items_args, item_results):
+            if item_result.get("changed"):
+                self.invalidate_changed(cache, host, item_args, item_result)
+        batch_result = dict(changed=any(item_result.get("changed") for item_result in item_results), results=item_results)
+        if module_result.get("failed"):
+            batch_result.update(failed=True, msg=module_result.get("msg"))
+        if "racf_metrics" in module_result:
+            batch_result["racf_metrics"] = module_result["racf_metrics"]
+        return batch_result
+
+    def run_coalesced_loop(self, module_args, task_vars, cache, host):
+        task = self._task
+        if task.loop is None or task.loop_with or task.when or task.until or task.async_val or (task.loop_control and task.loop_control.pause):
+            return None
+        batch_state = RacfBatchState(task._uuid, host)
+        if batch_state.exists():
+            return batch_state.pop(self.comparable_args(module_args))
+        try:
+            items_args = self.loop_items_args(module_args, task_vars)
+        except Exception:
+            return None
+        if len(items_args) < 2 or self.comparable_args(items_args[0]) != self.comparable_args(module_args):
+            return None
+        batch_result = self.run_batch(items_args, task_vars, cache, host)
+        if batch_result is None:
+            return None
+        item_results = batch_result["results"]
+        batch_state.store([[self.comparable_args(item_args), item_result] for item_args, item_result in zip(items_args[1:], item_results[1:])])
+        if "racf_metrics" in batch_result:
+            # the module ran once for the whole loop, report it on the first item only
+            return dict(item_results[0], racf_metrics=batch_result["racf_metrics"])
+        return item_results[0]
+
+    def loop_items_args(self, module_args, task_vars):
+        task = self._task
+        loop_var = task.loop_control.loop_var if task.loop_control else "item"
+        index_var = task.loop_control.index_var if task.loop_control else None
+        # the finalized task coerces the loop expression into a list, template the one from the playbook
+        items = self._templar.copy_with_new_env(available_variables=task_vars).template(task._ds["loop"])
+        if not isinstance(items, list):
+            raise ValueError("loop does not resolve to a list")
+        action, raw_args, delegate_to = ModuleArgsParser(task_ds=task._ds, collection_list=task.collections).parse()
+        raw_args = dict(raw_args)
+        raw_args.pop("cache_ttl", None)
+        omit = task_vars.get("omit")
+        items_args = []
+        for index, item in enumerate(items):
+            item_vars = dict(task_vars)
+            item_vars[loop_var] = item
+            if index_var:
+                item_vars[index_var] = index
+            item_args = self._templar.copy_with_new_env(available_variables=item_vars).template(raw_args)
+            item_args = {key: value for key, value in item_args.items() if omit is None or value != omit}
+            # options coming from module_defaults are not part of the task itself
+            items_args.append(dict({key: value for key, value in module_args.items() if key not in raw_args}, **item_args))
+        return items_args
+
+    def comparable_args(self, module_args):
+        return json.loads(json.dumps(module_args, sort_keys=True, default=str))
@@ -0,0 +1,45 @@
+import hashlib
+import json
+import os
+import tempfile
+
+RACF_BATCH_DIR_ENV = "RACF_BATCH_DIR"
+
+
+class RacfBatchState:
+    def __init__(self, task_uuid, host, state_dir=None):
+        self.state_dir = state_dir or os.environ.get(RACF_BATCH_DIR_ENV) or os.path.expanduser("~/.ansible/tmp/racf_batch")
+        key = hashlib.sha256(f"{task_uuid}\0{host}".encode()).hexdigest()
+        self.state_path = os.path.join(self.state_dir, f"{key}.json")
+
+    def exists(self):
+        return os.path.exists(self.state_path)
+
+    def store(self, pending):
+        if not pending:
+            return
+        os.makedirs(self.state_dir, mode=0o700, exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(dir=self.state_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as state_file:
+            json.dump(pending, state_file)
+        os.replace(temporary_path, self.state_path)
+
+    def pop(self, module_args):
+        try:
+            with open(self.state_path) as state_file:
+                pending = json.load(state_file)
+        except (OSError, ValueError):
+            self.clear()
+            return None
+        item_args, item_result = pending.pop(0) if pending else (None, None)
+        if pending and item_args == module_args:
+            self.store(pending)
+        else:
+            self.clear()
+        return item_result if item_args == module_args else None
+
+    def clear(self):
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+RACF_INFO_CACHE_DIR_ENV = "RACF_INFO_CACHE_DIR"
+RACF_INFO_CACHE_TTL_ENV = "RACF_INFO_CACHE_TTL"
+RACF_INFO_CACHE_SIZE_ENV = "RACF_INFO_CACHE_SIZE"
+RACF_INFO_CACHE_DEFAULT_SIZE = 256
+
+
+class RacfInfoCache:
+    def __init__(self, ttl=None, max_entries=None, cache_dir=None):
+        self.ttl = int(ttl if ttl is not None else os.environ.get(RACF_INFO_CACHE_TTL_ENV, 0))
+        self.max_entries = int(max_entries if max_entries is not None else os.environ.get(RACF_INFO_CACHE_SIZE_ENV, RACF_INFO_CACHE_DEFAULT_SIZE))
+        self.cache_dir = cache_dir or os.environ.get(RACF_INFO_CACHE_DIR_ENV) or os.path.expanduser("~/.ansible/tmp/racf_info_cache")
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, host, profile_type, profile_name, params):
+        entry_path = self._entry_path(host, profile_type, profile_name)
+        try:
+            with open(entry_path) as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        if entry["params"] != params or time.time() - entry["stored"] > self.ttl:
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry["result"]
+
+    def put(self, host, profile_type, profile_name, params, result):
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        entry = dict(host=host, profile_type=profile_type, profile_name=profile_name, params=params, stored=time.time(), result=result)
+        fd, temporary_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as entry_file:
+            json.dump(entry, entry_file)
+        os.replace(temporary_path, self._entry_path(host, profile_type, profile_name))
+        self._evict()
+
+    def invalidate(self, host, profile_type, profile_names):
+        for profile_name in profile_names:
+            try:
+                os.remove(self._entry_path(host, profile_type, profile_name))
+            except OSError:
+                pass
+
+    def invalidate_type(self, host, profile_type):
+        try:
+            entry_names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for entry_name in entry_names:
+            if not entry_name.endswith(".json"):
+                continue
+            entry_path = os.path.join(self.cache_dir, entry_name)
+            try:
+                with open(entry_path) as entry_file:
+                    entry = json.load(entry_file)
+                if entry["host"] == host and entry["profile_type"] == profile_type:
+                    os.remove(entry_path)
+            except (OSError, ValueError, KeyError):
+                pass
+
+    def _entry_path(self, host, profile_type, profile_name):
+        key = hashlib.sha256(f"{host}\0{profile_type}\0{profile_name}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _evict(self):
+        entries = []
+        for entry_name in os.listdir(self.cache_dir):
+            if entry_name.endswith(".json"):
+                try:
+                    entries.append((os.stat(os.path.join(self.cache_dir, entry_name)).st_mtime, entry_name))
+                except OSError:
+                    pass
+        entries.sort()
+        for mtime, entry_name in entries[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(os.path.join(self.cache_dir, entry_name))
+            except OSError:
+                pass
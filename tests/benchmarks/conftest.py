@@ -0,0 +1,148 @@
+import importlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("ansible")
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+COLLECTION_ROOT = os.path.dirname(os.path.dirname(BENCHMARK_DIR))
+FAKE_TSOCMD = os.path.join(BENCHMARK_DIR, "racf_fake.py")
+
+RACF_BENCH_BASELINE_ENV = "RACF_BENCH_BASELINE"
+RACF_BENCH_SAVE_ENV = "RACF_BENCH_SAVE"
+RACF_BENCH_TOLERANCE_ENV = "RACF_BENCH_TOLERANCE"
+
+_results = []
+
+
+def _ensure_collection_importable():
+    try:
+        importlib.import_module("ansible_collections.billpereira.community_racf.plugins.module_utils.racf_helper")
+        return
+    except ImportError:
+        pass
+    collections_root = tempfile.mkdtemp(prefix="racf_bench_")
+    namespace_dir = os.path.join(collections_root, "ansible_collections", "billpereira")
+    os.makedirs(namespace_dir)
+    os.symlink(COLLECTION_ROOT, os.path.join(namespace_dir, "community_racf"))
+    sys.path.insert(0, collections_root)
+    importlib.invalidate_caches()
+
+
+_ensure_collection_importable()
+
+
+def racf_module(name):
+    return importlib.import_module(f"ansible_collections.billpereira.community_racf.plugins.modules.{name}")
+
+
+@pytest.fixture
+def fake_racf(monkeypatch, tmp_path):
+    from ansible_collections.billpereira.community_racf.plugins.module_utils import racf_helper, racf_lock
+
+    log_path = tmp_path / "commands.log"
+    monkeypatch.setenv("RACF_FAKE_LOG", str(log_path))
+    monkeypatch.setenv("RACF_TSO_HOST", f"{sys.executable} {FAKE_TSOCMD} --host")
+    for name in ("RACF_TSO_NO_SESSION", "RACF_BROKER_SOCKET", "RACF_MAX_CONCURRENCY", "RACF_TRANSPORT"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(racf_helper, "_session_unavailable", False)
+    monkeypatch.setattr(racf_helper, "_active_session", None)
+    monkeypatch.setattr(racf_lock, "_limiter", None)
+    return FakeRacf(log_path)
+
+
+class FakeRacf:
+    def __init__(self, log_path):
+        self.log_path = log_path
+
+    def commands(self):
+        if not self.log_path.exists():
+            return []
+        return self.log_path.read_text().splitlines()
+
+    def reset(self):
+        if self.log_path.exists():
+            self.log_path.unlink()
+
+
+def run_module(name, args):
+    from ansible.module_utils import basic
+    from ansible.module_utils.common.text.converters import to_bytes
+
+    basic._ANSIBLE_ARGS = to_bytes(json.dumps({"ANSIBLE_MODULE_ARGS": args}))
+    basic._ANSIBLE_PROFILE = "legacy"
+    stdout = io.StringIO()
+    saved_stdout, sys.stdout = sys.stdout, stdout
+    try:
+        racf_module(name).main()
+    except SystemExit:
+        pass
+    finally:
+        sys.stdout = saved_stdout
+        basic._ANSIBLE_ARGS = None
+    return json.loads(stdout.getvalue())
+
+
+@pytest.fixture
+def benchmark_racf(fake_racf):
+    def benchmark(name, func, items=1, input_bytes=0):
+        fake_racf.reset()
+        started = time.perf_counter()
+        result = func()
+        wall = time.perf_counter() - started
+        commands = len(fake_racf.commands())
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        measurement = dict(
+            name=name,
+            wall=wall,
+            commands=commands,
+            items_per_second=items / wall if wall else 0,
+            mb_per_second=input_bytes / wall / 1e6 if wall else 0,
+            peak_mb=peak / 1e6,
+        )
+        _results.append(measurement)
+        check_baseline(measurement)
+        return result, measurement
+
+    return benchmark
+
+
+def check_baseline(measurement):
+    baseline_path = os.environ.get(RACF_BENCH_BASELINE_ENV)
+    if not baseline_path or not os.path.exists(baseline_path):
+        return
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file).get(measurement["name"])
+    if baseline is None:
+        return
+    tolerance = float(os.environ.get(RACF_BENCH_TOLERANCE_ENV, 1.5))
+    assert measurement["commands"] <= baseline["commands"], f"{measurement['name']} issued {measurement['commands']} commands, baseline {baseline['commands']}"
+    assert measurement["wall"] <= baseline["wall"] * tolerance, f"{measurement['name']} took {measurement['wall']:.3f}s, baseline {baseline['wall']:.3f}s"
+    assert measurement["peak_mb"] <= baseline["peak_mb"] * tolerance, f"{measurement['name']} peaked at {measurement['peak_mb']:.1f}MB, baseline {baseline['peak_mb']:.1f}MB"
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    terminalreporter.section("RACF benchmarks")
+    terminalreporter.write_line(f"{'benchmark':<40} {'commands':>8} {'wall s':>9} {'items/s':>11} {'MB/s':>8} {'peak MB':>8}")
+    for measurement in _results:
+        terminalreporter.write_line(
+            f"{measurement['name']:<40} {measurement['commands']:>8} {measurement['wall']:>9.3f} "
+            f"{measurement['items_per_second']:>11.0f} {measurement['mb_per_second']:>8.2f} {measurement['peak_mb']:>8.1f}"
+        )
+    if os.environ.get(RACF_BENCH_SAVE_ENV):
+        with open(os.environ[RACF_BENCH_SAVE_ENV], "w") as save_file:
+            json.dump({measurement["name"]: measurement for measurement in _results}, save_file, indent=1)
@@ -0,0 +1,34 @@
+"""LISTUSER parser of racf_user before the single pass parse_user_info, kept to
+compare the two in the benchmarks."""
+import re
+
+
+def extract_user_info(list_output):
+    user_name = re.findall(r'NAME=(.*?)OWNER',list_output)
+    user_owner = re.findall(r'OWNER=(.*?)\s',list_output)
+    user_default_group = re.findall(r'DEFAULT-GROUP=(.*?)\s',list_output)
+    user_connects = [{'group_name':item[0].strip(), 'group_auth': item[1].strip(), 'group_owner': item[2].strip(), 'group_attribute': item[3].strip() } for item in re.findall(r'\sGROUP=(.*?)\s*AUTH=(.*?)\s*CONNECT-OWNER=(.*?)\s[\s\S]*?ATTRIBUTES=(.*?)\s',list_output)]
+    try:
+        user_csdata_segment = [{key.strip(): value.strip()} for line in list_output.split('CSDATA')[1].splitlines() if "=" in line for key, value in [line.split("=")]]
+    except IndexError:
+        user_csdata_segment = []
+    user_tso_segment = [{'acctnum':item[0].strip(), 'dest':item[1].strip(), 'holdclass':item[2].strip(),'msgclass':item[3].strip(),'proc':item[4].strip(),'size':item[5].strip(),'maxsize':item[6].strip(),'sysoutclass':item[7].strip(),'userdata':item[8].strip(),'command':item[9].strip()} for item in re.findall(r'TSO INF[\s\S]*ACCTNUM= (.*)\s*DEST= (.*)\s*HOLDCLASS= (.*)\s*MSGCLASS= (.*)\s*PROC= (.*)\s*SIZE= (.*)\s*MAXSIZE= (.*)\s*SYSOUTCLASS= (.*)\s*USERDATA= (.*)\s*COMMAND=(.*)',list_output)]
+    user_cics_segment = [{'opident': item[0].strip(), 'opprty': item[1].strip(), 'timeout': item[2].strip(), 'xrfsoff': item[3].strip()} for item in re.findall(r'CICS IN[\s\S]*OPIDENT=(.*)\s*OPPRTY= (.*)\s*TIMEOUT= (.*)\s*XRFSOFF= (.*)',list_output)]
+    user_dfp_segment = [{'mgmtclass':item[0].strip(), 'storclass':item[1].strip()} for item in re.findall(r'DFP INF[\s\S]*MGMTCLAS= (.*)\s*STORCLAS= (.*)',list_output)]
+    user_omvs_segment = [{'uid':item[0].strip(),'home':item[1].strip(),'program':item[2].strip(),'cputimemax':item[3].strip(),'assizemax':item[4].strip(),'fileprocmax':item[5].strip(),'procusermax':item[6].strip(),'threadsmax':item[7].strip(),'mmapareamax':item[8].strip()} for item in re.findall(r'OMVS INF[\s\S]*UID= (.*)\s*HOME= (.*)\s*PROGRAM= (.*)\s*CPUTIMEMAX= (.*)\s*ASSIZEMAX= (.*)\s*FILEPROCMAX= (.*)\s*PROCUSERMAX=(.*)\s*THREADSMAX= (.*)\s*MMAPAREAMAX= (.*)',list_output)]
+    list_user_info = []
+    if 'UNABLE' in list_output:
+        return list_user_info
+    list_user_info.append({
+        'user_name_info': user_name[0].strip(),
+        'user_default_group': user_default_group[0].strip(),
+        'user_owner': user_owner[0].strip(),
+        'user_group_connects': user_connects,
+        'user_tso_segment': user_tso_segment,
+        'user_csdata_segment': user_csdata_segment,
+        'user_cics_segment': user_cics_segment,
+        'user_dfp_segment': user_dfp_segment,
+        'user_omvs_segment': user_omvs_segment,
+        'raw_output': list_output
+    })
+    return list_user_info
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Fake tsocmd and TSO session host generating synthetic RACF output.
+
+Run as ``racf_fake.py <command>`` it behaves like tsocmd, run as
+``racf_fake.py --host`` it speaks the session host protocol of racf_helper.
+The scale of the generated listings and the latency of every command are
+read from the environment:
+
+RACF_FAKE_CONNECTS      group connects per LISTUSER (default 20)
+RACF_FAKE_CERTIFICATES  certificates returned by RACDCERT LIST ID() (default 2000)
+RACF_FAKE_RING_SIZE     certificates connected to every ring (default 500)
+RACF_FAKE_RINGS         rings listed by RACDCERT LISTRING(*), the last one empty (default 3)
+RACF_FAKE_MEMBERS       users connected to every group listed by LISTGRP (default 1000)
+RACF_FAKE_LATENCY       seconds added to every command (default 0)
+RACF_FAKE_SLOW          seconds added to the commands matching RACF_FAKE_SLOW_MATCH
+RACF_FAKE_SLOW_MATCH    regular expression of the slow commands (default every command)
+RACF_FAKE_SLOW_SKIP     matching commands left fast before the slow ones (default 0)
+RACF_FAKE_SLOW_TIMES    matching commands made slow after the skipped ones (default all)
+RACF_FAKE_SLOW_COUNT    file counting the matching commands across processes,
+                        required with RACF_FAKE_SLOW_SKIP and RACF_FAKE_SLOW_TIMES
+RACF_FAKE_FAIL_MATCH    regular expression of the commands rejected with rc 8
+RACF_FAKE_LOG           file every command is appended to
+RACF_FAKE_STATE         JSON file keeping the users added, altered, connected and
+                        deleted by AU, ALU, CO and DU for the following LU
+"""
+import fcntl
+import json
+import os
+import re
+import sys
+import time
+
+SESSION_SENTINEL = "@@RACF-END@@"
+MISSING_PREFIX = "MISSING"
+
+
+def scale(name, default):
+    return int(os.environ.get(name, default))
+
+
+def listuser(user, connects=20, segments=(), state=None):
+    missing = state["deleted"] if state is not None else user.upper().startswith(MISSING_PREFIX)
+    if missing:
+        return [f" ICH30001I UNABLE TO LOCATE USER    ENTRY {user}"], 4
+    state = state or {}
+    lines = [
+        f"USER={user}  NAME={state.get('name', 'SYNTHETIC USER'):<20} OWNER=IBMUSER   CREATED=99.365",
+        " DEFAULT-GROUP=SYS1     PASSDATE=00.000 PASS-INTERVAL= 30 PHRASEDATE=N/A",
+        " ATTRIBUTES=NONE",
+        " REVOKE DATE=NONE   RESUME DATE=NONE",
+        " LAST-ACCESS=24.060/10:15:30",
+        " CLASS AUTHORIZATIONS=NONE",
+        " NO-INSTALLATION-DATA",
+        " NO-MODEL-NAME",
+        " LOGON ALLOWED   (DAYS)          (TIME)",
+        " ---------------------------------------------",
+        " ANYDAY                          ANYTIME",
+    ]
+    for group in [f"GRP{index:05d}" for index in range(connects)] + state.get("groups", []):
+        lines += [
+            f"  GROUP={group:<8}  AUTH=USE      CONNECT-OWNER=IBMUSER   CONNECT-DATE=99.365",
+            "    CONNECTS=    00  UACC=READ     LAST-CONNECT=UNKNOWN",
+            "    CONNECT ATTRIBUTES=NONE",
+            "    REVOKE DATE=NONE   RESUME DATE=NONE",
+        ]
+    lines += [" SECURITY-LEVEL=NONE SPECIFIED", " CATEGORY-AUTHORIZATION", "  NONE SPECIFIED", " SECURITY-LABEL=NONE SPECIFIED", ""]
+    segments = {segment.upper() for segment in segments}
+    if "DFP" in segments:
+        lines += ["DFP INFORMATION", "---------------", " MGMTCLAS= MC1", " STORCLAS= SC1", ""]
+    if "OMVS" in segments:
+        lines += [
+            "OMVS INFORMATION", "----------------", " UID= 0000000100", f" HOME= /u/{user.lower()}", " PROGRAM= /bin/sh",
+            " CPUTIMEMAX= NONE", " ASSIZEMAX= NONE", " FILEPROCMAX= NONE", " PROCUSERMAX= NONE", " THREADSMAX= NONE", " MMAPAREAMAX= NONE", "",
+        ]
+    if "TSO" in segments:
+        lines += [
+            "TSO INFORMATION", "---------------", " ACCTNUM= ACCT#", " DEST= LOCAL", " HOLDCLASS= X", " MSGCLASS= X", " PROC= IKJACCNT",
+            " SIZE= 00004096", " MAXSIZE= 00000000", " SYSOUTCLASS= X", " USERDATA= 0000", " COMMAND= ISPF", "",
+        ]
+    return lines, 0
+
+
+def certificate_block(owner, index, rings=1):
+    fingerprint = ":".join(f"{(index * 7 + offset) % 256:02X}" for offset in range(32))
+    lines = [
+        f"  Label: cert{index:05d}",
+        f"  Certificate ID: 2QXB1fDx54KJk5OjoqNA{index:04d}",
+        "  Status: TRUST",
+        "  Start Date: 2024/03/01 00:00:00",
+        f"  End Date:   {2024 + index % 10}/{1 + index % 12:02d}/01 23:59:59",
+        "  Serial Number:",
+        f"       >{index:02X}<",
+        "  Issuer's Name:",
+        f"       >CN=issuer{index}.OU=Test.O=Org<",
+        "  Subject's Name:",
+        f"       >CN=cert{index}<",
+        "  Signing Algorithm: sha256RSA",
+        "  Key Usage: HANDSHAKE, DATAENCRYPT, DOCSIGN",
+        "  Key Type: RSA",
+        "  Key Size: 2048",
+        "  Private Key: YES",
+        "  Certificate Fingerprint (SHA256): ",
+        f"       {fingerprint[:48]}",
+        f"       {fingerprint[48:]}",
+        "  Ring Associations:",
+    ]
+    if rings == 0:
+        lines.append("    *** No rings associated ***")
+    for ring in range(rings):
+        lines += [f"    Ring Owner: {owner}", "    Ring:", f"       >RING{ring}<"]
+    return lines + [""]
+
+
+def racdcert_list(owner, label=None, certificates=2000):
+    lines = [f"Digital certificate information for {owner if owner in ('CERTAUTH', 'SITE') else f'user {owner}'}:", ""]
+    if label is not None:
+        match = re.match(r"cert(\d+)$", label)
+        if match is None or int(match.group(1)) >= certificates:
+            return [f"IRRD107I No matching certificate found for label {label}."], 4
+        return lines + certificate_block(owner, int(match.group(1))), 0
+    for index in range(certificates):
+        lines += certificate_block(owner, index, rings=index % 2)
+    return lines, 0
+
+
+def racdcert_listring(owner, ring, ring_size=500, rings=3):
+    if ring.upper().startswith(MISSING_PREFIX) or owner.upper().startswith(MISSING_PREFIX):
+        return [f"IRRD114I Ring {ring} does not exist."], 4
+    lines = [f"Digital ring information for user {owner}:", ""]
+    if ring != "*":
+        return lines + ring_section(owner, ring, ring_size), 0
+    for index in range(rings):
+        lines += ring_section(owner, f"RING{index:02d}", ring_size if index < rings - 1 else 0)
+    return lines, 0
+
+
+def ring_section(owner, ring, ring_size):
+    lines = ["  Ring:", f"       >{ring}<"]
+    if not ring_size:
+        return lines + ["  *** No certificates connected ***", ""]
+    lines += [
+        "  Certificate Label Name             Cert Owner     USAGE      DEFAULT",
+        "  --------------------------------   ------------   --------   -------",
+    ]
+    for index in range(ring_size):
+        lines.append(f"  {f'cert{index:05d}':<32}   {f'ID({owner})':<12}   PERSONAL     {'YES' if index == 0 else 'NO'}")
+    return lines + [""]
+
+
+def listgrp(group, members=1000, subgroups=12):
+    if group.upper().startswith(MISSING_PREFIX):
+        return [" ICH51003I NAME NOT FOUND IN RACF DATA SET"], 4
+    lines = [
+        f"INFORMATION FOR GROUP {group.upper()}",
+        "    SUPERIOR GROUP=SYS1         OWNER=IBMUSER   CREATED=99.365",
+        "    NO INSTALLATION DATA",
+        "    NO MODEL DATA SET",
+        "    TERMUACC",
+    ]
+    names = [f"SUB{index:05d}" for index in range(subgroups)]
+    if names:
+        lines.append("    SUBGROUP(S)= " + "  ".join(names[:6]))
+        lines += ["                 " + "  ".join(names[start:start + 6]) for start in range(6, len(names), 6)]
+    else:
+        lines.append("    NO SUBGROUPS")
+    if not members:
+        return lines + ["    NO USERS"], 0
+    lines.append("    USER(S)=      ACCESS=      ACCESS COUNT=      UNIVERSAL ACCESS=")
+    for index in range(members):
+        # the first member administers the group
+        lines += [
+            f"      U{index:07d}      {'JOIN' if index == 0 else 'USE':<8}      {index % 1000:06d}              NONE",
+            f"         CONNECT ATTRIBUTES={'SPECIAL OPERATIONS' if index == 0 else 'NONE'}",
+            "         REVOKE DATE=NONE                  RESUME DATE=NONE",
+        ]
+    return lines, 0
+
+
+def update_state(command):
+    # the state of the users changed by earlier commands, None when the command
+    # does not name a user or no state file is used
+    words = command.split()
+    verb = words[0].upper() if words else ""
+    if not os.environ.get("RACF_FAKE_STATE") or verb not in ("LU", "LISTUSER", "AU", "ADDUSER", "ALU", "ALTUSER", "CO", "CONNECT", "DU", "DELUSER"):
+        return None
+    with open(os.environ["RACF_FAKE_STATE"], "a+") as state_file:
+        fcntl.flock(state_file, fcntl.LOCK_EX)
+        state_file.seek(0)
+        users = json.loads(state_file.read() or "{}")
+        names = re.findall(r"\S+", words[1].strip("()")) if len(words) > 1 else []
+        if verb in ("CO", "CONNECT"):
+            names = re.search(r"\(([^)]*)\)|(\S+)", command[len(words[0]):])
+            names = (names.group(1) or names.group(2)).split()
+        for name in names:
+            user = users.setdefault(name.upper(), dict(deleted=name.upper().startswith(MISSING_PREFIX), groups=[]))
+            if verb in ("AU", "ADDUSER"):
+                user["deleted"] = False
+            if verb in ("DU", "DELUSER"):
+                user["deleted"] = True
+            if verb in ("AU", "ADDUSER", "ALU", "ALTUSER") and re.search(r"NAME\('([^']*)'\)", command):
+                user["name"] = re.search(r"NAME\('([^']*)'\)", command).group(1)
+            if verb in ("CO", "CONNECT"):
+                user["groups"].append(re.search(r"GROUP\(([^)]*)\)", command).group(1).upper())
+        state_file.seek(0)
+        state_file.truncate()
+        state_file.write(json.dumps(users))
+    return users.get(names[0].upper()) if names else None
+
+
+def slow_latency(command):
+    if not os.environ.get("RACF_FAKE_SLOW") or not re.search(os.environ.get("RACF_FAKE_SLOW_MATCH", "."), command):
+        return 0
+    if not os.environ.get("RACF_FAKE_SLOW_COUNT"):
+        return float(os.environ["RACF_FAKE_SLOW"])
+    with open(os.environ["RACF_FAKE_SLOW_COUNT"], "a+") as count_file:
+        fcntl.flock(count_file, fcntl.LOCK_EX)
+        count_file.seek(0)
+        count = int(count_file.read() or 0)
+        count_file.seek(0)
+        count_file.truncate()
+        count_file.write(str(count + 1))
+    skip = scale("RACF_FAKE_SLOW_SKIP", 0)
+    times = os.environ.get("RACF_FAKE_SLOW_TIMES")
+    if count < skip or (times and count >= skip + int(times)):
+        return 0
+    return float(os.environ["RACF_FAKE_SLOW"])
+
+
+def run_command(command):
+    # logged before the latency, a command killed while it runs is logged as well
+    if os.environ.get("RACF_FAKE_LOG"):
+        with open(os.environ["RACF_FAKE_LOG"], "a") as log:
+            log.write(command + "\n")
+    latency = float(os.environ.get("RACF_FAKE_LATENCY", 0)) + slow_latency(command)
+    if latency:
+        time.sleep(latency)
+    if os.environ.get("RACF_FAKE_FAIL_MATCH") and re.search(os.environ["RACF_FAKE_FAIL_MATCH"], command):
+        # rejected before it changes anything
+        return [f" ICH00005E {command.split()[0].upper()} COMMAND REJECTED"], 8
+    words = command.split()
+    verb = words[0].upper() if words else ""
+    state = update_state(command)
+    if verb in ("LU", "LISTUSER"):
+        return listuser(words[1], scale("RACF_FAKE_CONNECTS", 20), words[2:], state)
+    if verb in ("LG", "LISTGRP"):
+        return listgrp(words[1], scale("RACF_FAKE_MEMBERS", 1000))
+    if verb == "RACDCERT":
+        owner = re.search(r"\bID\(([^)]*)\)\s*$|\b(CERTAUTH|SITE)\s*$", command)
+        owner = (owner.group(1) or owner.group(2)) if owner else "IBMUSER"
+        listring = re.search(r"LISTRING\(([^)]*)\)", command)
+        if listring:
+            return racdcert_listring(owner, listring.group(1), scale("RACF_FAKE_RING_SIZE", 500), scale("RACF_FAKE_RINGS", 3))
+        if re.match(r"\s*RACDCERT\s+LIST\b", command, re.IGNORECASE):
+            label = re.search(r"LABEL\('([^']*)'\)", command)
+            return racdcert_list(owner, label.group(1) if label else None, scale("RACF_FAKE_CERTIFICATES", 2000))
+    return [], 0
+
+
+def serve_session(stdin, stdout):
+    for line in stdin:
+        token, _, command = line.rstrip("\n").partition(" ")
+        if token in ("", "@@RACF-QUIT@@"):
+            break
+        lines, rc = run_command(command)
+        stdout.write("".join(f"{output}\n" for output in lines) + f"{SESSION_SENTINEL} {token} {rc}\n")
+        stdout.flush()
+
+
+def main():
+    if sys.argv[1:] == ["--host"]:
+        serve_session(sys.stdin, sys.stdout)
+        return 0
+    lines, rc = run_command(" ".join(sys.argv[1:]))
+    sys.stdout.write("".join(f"{output}\n" for output in lines))
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import COLLECTION_ROOT, FAKE_TSOCMD
+
+# keys ansible adds to loop items and to the first task of a play
+ANSIBLE_KEYS = ("ansible_loop_var", "item", "invocation", "ansible_facts", "warnings", "deprecations", "failed_when_result")
+
+LOOP_CASES = {
+    "connect": ("racf_user", dict(state="connect", groups=[dict(group_name="NEWG")])),
+    "present": ("racf_user", dict(state="present", user_name_info="Renamed", groups=[dict(group_name="NEWG"), dict(group_name="GRP00000")])),
+    "present_messages": ("racf_user", dict(state="present", user_name_info="Renamed", verify="messages")),
+    "absent": ("racf_user", dict(state="absent")),
+    "list_only": ("racf_user", dict(list_only=True)),
+    "group_connect": ("racf_group", dict(state="connect", members=["U0000001", "USER09"])),
+    "keyring_list_only": ("racf_keyring", dict(keyring_owner="USER01", list_only=True)),
+}
+LOOP_NAMES = dict(racf_user=["USER01", "MISSING1"], racf_group=["GRP00000", "MISSINGG"], racf_keyring=["RING01", "MISSINGR"])
+
+
+@pytest.fixture
+def playbook(tmp_path):
+    if shutil.which("ansible-playbook") is None:
+        pytest.skip("ansible-playbook is not installed")
+    namespace_dir = tmp_path / "collections" / "ansible_collections" / "billpereira"
+    namespace_dir.mkdir(parents=True)
+    os.symlink(COLLECTION_ROOT, namespace_dir / "community_racf")
+
+    def run(tasks, environment=None):
+        playbook_path = tmp_path / "playbook.json"
+        playbook_path.write_text(json.dumps([dict(
+            hosts="localhost", connection="local", gather_facts=False,
+            vars=dict(ansible_python_interpreter=sys.executable),
+            environment=dict(RACF_TSO_HOST=f"{sys.executable} {FAKE_TSOCMD} --host", RACF_FAKE_CONNECTS="2", RACF_FAKE_MEMBERS="5", **(environment or {})),
+            tasks=tasks,
+        )]))
+        env = dict(
+            os.environ, ANSIBLE_COLLECTIONS_PATH=str(tmp_path / "collections"), ANSIBLE_LOCAL_TEMP=str(tmp_path / "tmp"),
+            RACF_INFO_CACHE_DIR=str(tmp_path / "info_cache"),
+        )
+        env.pop("RACF_TSO_HOST", None)
+        completed = subprocess.run(
+            ["ansible-playbook", "-i", "localhost,", str(playbook_path)],
+            env=env, cwd=str(tmp_path), capture_output=True, text=True,
+        )
+        assert completed.returncode == 0, completed.stdout + completed.stderr
+        registered_path = tmp_path / "registered.json"
+        return json.loads(registered_path.read_text()) if registered_path.exists() else None
+
+    return run
+
+
+def module_keys(result):
+    return {key: value for key, value in result.items() if key not in ANSIBLE_KEYS}
+
+
+def test_loop_results_match_single_runs(playbook):
+    tasks = []
+    for case, (module, args) in LOOP_CASES.items():
+        action = f"billpereira.community_racf.{module}"
+        task_args = dict(args, name="{{ item }}")
+        # `when` keeps the loop from being coalesced, every item runs on its own
+        tasks.append({action: task_args, "loop": LOOP_NAMES[module], "register": f"{case}_looped", "ignore_errors": True})
+        tasks.append({action: task_args, "loop": LOOP_NAMES[module], "register": f"{case}_single", "ignore_errors": True, "when": True})
+    registered = {f"{case}_{kind}": f"{{{{ {case}_{kind}.results }}}}" for case in LOOP_CASES for kind in ("looped", "single")}
+    tasks.append({"copy": dict(content="{{ registered | to_json }}", dest="registered.json"), "vars": dict(registered=registered)})
+
+    results = playbook(tasks)
+
+    for case in LOOP_CASES:
+        looped = [module_keys(result) for result in results[f"{case}_looped"]]
+        single = [module_keys(result) for result in results[f"{case}_single"]]
+        assert looped == single, case
+
+
+REPEATED_USER_LOOPS = {
+    "add_then_connect": [
+        dict(name="MISSING9", state="present", user_name_info="NEW USER"),
+        dict(name="MISSING9", state="connect", groups=[dict(group_name="APPG")]),
+    ],
+    "alter_twice": [dict(name="USER01", state="present", user_name_info=name) for name in ("A", "B", "B")],
+}
+
+
+@pytest.mark.parametrize("case", sorted(REPEATED_USER_LOOPS))
+def test_loop_repeating_a_user_matches_single_runs(playbook, tmp_path, case):
+    task = {
+        "billpereira.community_racf.racf_user": dict(
+            name="{{ item.name }}", state="{{ item.state }}", user_name_info="{{ item.user_name_info | default(omit) }}",
+            groups="{{ item.groups | default(omit) }}",
+        ),
+        "loop": REPEATED_USER_LOOPS[case], "register": "looped", "ignore_errors": True,
+    }
+    copy = {"copy": dict(content="{{ looped.results | to_json }}", dest="registered.json")}
+    results = {}
+    for kind, extra in (("looped", {}), ("single", {"when": True})):
+        # every run starts from the same fake RACF
+        results[kind] = playbook([dict(task, **extra), copy], environment=dict(RACF_FAKE_STATE=str(tmp_path / f"{kind}.json")))
+
+    assert [module_keys(result) for result in results["looped"]] == [module_keys(result) for result in results["single"]]
+    assert not any(result.get("failed") for result in results["looped"])
+
+
+def test_user_changes_invalidate_cached_groups(playbook, tmp_path):
+    log_path = tmp_path / "commands.log"
+    # looped tasks are coalesced and not cached, every group is listed by its own task
+    group_list = [{"billpereira.community_racf.racf_group": dict(name=name, list_only=True, cache_ttl=300)} for name in ("GRP00000", "NEWG")]
+    playbook(
+        group_list
+        + [{"billpereira.community_racf.racf_user": dict(name="USER01", state="connect", groups=[dict(group_name="NEWG")])}]
+        + group_list
+        + [{"billpereira.community_racf.racf_user": dict(name="USER01", state="absent")}]
+        + group_list,
+        environment=dict(RACF_FAKE_LOG=str(log_path)),
+    )
+
+    commands = [command.strip() for command in log_path.read_text().splitlines()]
+    # the connect drops the cached NEWG only, the delete drops every cached group
+    assert commands.count("LG NEWG") == 3
+    assert commands.count("LG GRP00000") == 2
@@ -0,0 +1,431 @@
+import json
+import os
+import re
+import timeit
+
+import pytest
+
+import racf_baseline
+from conftest import racf_module, run_module
+from racf_fake import MISSING_PREFIX, listuser, racdcert_list, racdcert_listring
+
+BENCH_USERS = int(os.environ.get("RACF_BENCH_USERS", 10000))
+BENCH_MODULE_USERS = int(os.environ.get("RACF_BENCH_MODULE_USERS", 1000))
+BENCH_CONNECTS = int(os.environ.get("RACF_BENCH_CONNECTS", 20))
+BENCH_CERTIFICATES = int(os.environ.get("RACF_BENCH_CERTIFICATES", 2000))
+BENCH_RING_SIZE = int(os.environ.get("RACF_BENCH_RING_SIZE", 500))
+BENCH_RING_REPEAT = int(os.environ.get("RACF_BENCH_RING_REPEAT", 100))
+BENCH_OWNERS = int(os.environ.get("RACF_BENCH_OWNERS", 50))
+BENCH_OWNER_CERTIFICATES = int(os.environ.get("RACF_BENCH_OWNER_CERTIFICATES", 50))
+BENCH_GROUP_MEMBERS = int(os.environ.get("RACF_BENCH_GROUP_MEMBERS", 1000))
+
+
+def text(lines):
+    return "".join(f"{line}\n" for line in lines)
+
+
+@pytest.fixture
+def fake_scale(monkeypatch):
+    monkeypatch.setenv("RACF_FAKE_CONNECTS", str(BENCH_CONNECTS))
+    monkeypatch.setenv("RACF_FAKE_CERTIFICATES", str(BENCH_CERTIFICATES))
+    monkeypatch.setenv("RACF_FAKE_RING_SIZE", str(BENCH_RING_SIZE))
+    monkeypatch.setenv("RACF_FAKE_MEMBERS", str(BENCH_GROUP_MEMBERS))
+
+
+def test_extract_user_info(benchmark_racf):
+    extract_user_info = racf_module("racf_user").extract_user_info
+    outputs = [text(listuser(f"U{index:07d}", BENCH_CONNECTS, ("OMVS", "TSO"))[0]) for index in range(BENCH_USERS)]
+
+    users, measurement = benchmark_racf(
+        "extract_user_info", lambda: [extract_user_info(output) for output in outputs],
+        items=BENCH_USERS, input_bytes=sum(len(output) for output in outputs),
+    )
+
+    assert len(users) == BENCH_USERS
+    assert len(users[-1][0]["user_group_connects"]) == BENCH_CONNECTS
+    assert users[-1][0]["user_omvs_segment"][0]["uid"] == "0000000100"
+    assert measurement["commands"] == 0
+
+
+def test_extract_user_info_against_baseline(benchmark_racf):
+    extract_user_info = racf_module("racf_user").extract_user_info
+    outputs = [text(listuser(f"U{index:07d}", BENCH_CONNECTS, ("OMVS", "TSO", "DFP"))[0]) for index in range(BENCH_USERS // 10)]
+    input_bytes = sum(len(output) for output in outputs)
+
+    def parse_baseline():
+        return [racf_baseline.extract_user_info(output) for output in outputs]
+
+    def parse():
+        return [extract_user_info(output) for output in outputs]
+
+    baseline_users, _ = benchmark_racf("extract_user_info baseline", parse_baseline, items=len(outputs), input_bytes=input_bytes)
+    users, _ = benchmark_racf("extract_user_info single pass", parse, items=len(outputs), input_bytes=input_bytes)
+
+    for (baseline_user,), (user,) in zip(baseline_users, users):
+        del baseline_user["raw_output"]
+        # the DFP segment also returns DATACLAS and DATAAPPL, empty when not listed
+        assert user["user_dfp_segment"] == [dict(baseline_user["user_dfp_segment"][0], dataclass="", dataappl="")]
+        assert dict(user, user_dfp_segment=baseline_user["user_dfp_segment"]) == baseline_user
+    # one run is noisy on a loaded machine, the best of five of each is compared
+    assert min(timeit.repeat(parse, number=1, repeat=5)) < min(timeit.repeat(parse_baseline, number=1, repeat=5))
+
+
+def test_extract_certificates(benchmark_racf):
+    from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_certificates import extract_certificates
+    output = text(racdcert_list("USERX", certificates=BENCH_CERTIFICATES)[0])
+
+    certificates, measurement = benchmark_racf(
+        "extract_certificates", lambda: extract_certificates(output),
+        items=BENCH_CERTIFICATES, input_bytes=len(output),
+    )
+
+    assert len(certificates) == BENCH_CERTIFICATES
+    assert certificates[1]["ring_associations"] == [{"ring_owner": "USERX", "keyring": "RING0"}]
+    assert measurement["commands"] == 0
+
+
+def test_extract_certificates_from_ring(benchmark_racf):
+    extract_certificates_from_ring = racf_module("racf_keyring").extract_certificates_from_ring
+    output = text(racdcert_listring("USERX", "RING01", BENCH_RING_SIZE)[0])
+
+    rings, measurement = benchmark_racf(
+        "extract_certificates_from_ring", lambda: [extract_certificates_from_ring(output) for repeat in range(BENCH_RING_REPEAT)],
+        items=BENCH_RING_SIZE * BENCH_RING_REPEAT, input_bytes=len(output) * BENCH_RING_REPEAT,
+    )
+
+    assert len(rings[0]) == BENCH_RING_SIZE
+    assert rings[0][0]["cert_default"] == "YES"
+    assert rings[0][1] == {"cert_label": "cert00001", "cert_owner": "ID(USERX)", "cert_usage": "PERSONAL", "cert_default": "NO"}
+    assert measurement["commands"] == 0
+
+
+def test_racf_user_bulk_list(benchmark_racf, fake_scale):
+    users = [f"U{index:07d}" for index in range(BENCH_MODULE_USERS)]
+
+    result, measurement = benchmark_racf(
+        "racf_user users list_only", lambda: run_module("racf_user", dict(users=[dict(name=user) for user in users], list_only=True)),
+        items=BENCH_MODULE_USERS,
+    )
+
+    assert len(result["racf_info"]) == BENCH_MODULE_USERS
+    # TIME handshake of the session plus one LISTUSER per user
+    assert measurement["commands"] == BENCH_MODULE_USERS + 1
+
+
+def test_racf_user_bulk_converge(benchmark_racf, fake_scale):
+    users = [dict(name=f"U{index:07d}", groups=[dict(group_name="GRP00000")], state="connect") for index in range(BENCH_MODULE_USERS)]
+
+    result, measurement = benchmark_racf(
+        "racf_user users converged", lambda: run_module("racf_user", dict(users=users)),
+        items=BENCH_MODULE_USERS,
+    )
+
+    assert result["changed"] is False
+    assert measurement["commands"] == BENCH_MODULE_USERS + 1
+
+
+def test_racf_user_bulk_limited(benchmark_racf, fake_scale, monkeypatch, tmp_path):
+    users = [dict(name=f"U{index:07d}", groups=[dict(group_name="GRPNEW")], state="connect") for index in range(BENCH_MODULE_USERS)]
+    lock_dir = tmp_path / "locks"
+    monkeypatch.setenv("RACF_MAX_CONCURRENCY", "2")
+    monkeypatch.setenv("RACF_LOCK_DIR", str(lock_dir))
+
+    result, measurement = benchmark_racf(
+        "racf_user users connected limited", lambda: run_module("racf_user", dict(users=users, verify="none")),
+        items=BENCH_MODULE_USERS,
+    )
+
+    assert result["changed"] is True
+    assert "queue_wait" in result
+    # the profiles of every CO share the stripe locks, the slots are the only other lock files
+    assert len([path for path in lock_dir.iterdir() if path.name.startswith("stripe.")]) <= 64
+    assert measurement["commands"] == 2 * BENCH_MODULE_USERS + 1
+
+
+def test_racf_user_bulk_replay(benchmark_racf, fake_scale, monkeypatch, tmp_path):
+    users = [dict(name=f"U{index:07d}") for index in range(BENCH_MODULE_USERS)]
+    transcript = tmp_path / "transcript.jsonl"
+    monkeypatch.setenv("RACF_TRANSPORT", f"record:{transcript}")
+    recorded = run_module("racf_user", dict(users=users, list_only=True))
+
+    monkeypatch.setenv("RACF_TRANSPORT", f"replay:{transcript}")
+    monkeypatch.delenv("RACF_TSO_HOST")
+    result, measurement = benchmark_racf(
+        "racf_user users list_only replayed", lambda: run_module("racf_user", dict(users=users, list_only=True)),
+        items=BENCH_MODULE_USERS,
+    )
+
+    assert result["racf_info"] == recorded["racf_info"]
+    # served in process, the fake tsocmd never runs
+    assert measurement["commands"] == 0
+
+
+def test_racf_user_recorded_password_masked(fake_racf, monkeypatch, tmp_path):
+    args = dict(name=f"{MISSING_PREFIX}7", state="present", user_password="S3CRET1", verify="messages")
+    transcript = tmp_path / "transcript.jsonl"
+    monkeypatch.setenv("RACF_TRANSPORT", f"record:{transcript}")
+    recorded = run_module("racf_user", args)
+
+    assert "S3CRET1" not in transcript.read_text()
+    assert f"AU {MISSING_PREFIX}7 PASSWORD(********)" in [json.loads(line)["command"].strip() for line in transcript.read_text().splitlines()]
+
+    # the masked command still answers the replayed one
+    monkeypatch.setenv("RACF_TRANSPORT", f"replay:{transcript}")
+    replayed = run_module("racf_user", args)
+    assert "failed" not in replayed, replayed.get("msg")
+    assert replayed["changed"] == recorded["changed"] is True
+
+
+def test_racf_user_clone_from_model(benchmark_racf, fake_scale):
+    targets = [dict(name=f"{MISSING_PREFIX}{index:05d}") for index in range(BENCH_MODULE_USERS)]
+
+    result, measurement = benchmark_racf(
+        "racf_user targets from model",
+        lambda: run_module("racf_user", dict(model_user="MODEL01", targets=targets, user_omvs_segment=dict(uid="auto"), verify="messages")),
+        items=BENCH_MODULE_USERS,
+    )
+
+    assert result["changed"] is True
+    assert result["results"][0]["commands"][0].startswith(f"AU {MISSING_PREFIX}00000 DFLTGRP(SYS1)")
+    assert f"HOME(/u/{MISSING_PREFIX.lower()}00000)" in result["results"][0]["commands"][0]
+    # TIME, one LISTUSER of the model and of every target, one AU and a CO per model connect
+    assert measurement["commands"] == 2 + BENCH_MODULE_USERS * (2 + BENCH_CONNECTS)
+
+
+@pytest.fixture
+def fake_state(monkeypatch, tmp_path):
+    # the fake keeps the users changed by earlier commands
+    monkeypatch.setenv("RACF_FAKE_STATE", str(tmp_path / "state.json"))
+    monkeypatch.setenv("RACF_FAKE_CONNECTS", "2")
+
+
+def test_racf_user_bulk_add_then_connect_same_user(fake_racf, fake_state):
+    result = run_module("racf_user", dict(users=[
+        dict(name="MISSING9", state="present", user_name_info="NEW USER"),
+        dict(name="MISSING9", state="connect", groups=[dict(group_name="APPG")]),
+    ]))
+
+    assert "failed" not in result, result.get("msg")
+    assert [user_result["changed"] for user_result in result["results"]] == [True, True]
+    assert [command for command in fake_racf.commands() if command.split()[0] in ("AU", "CO")] == [
+        "AU MISSING9 NAME('NEW USER')", "CO (MISSING9) GROUP(APPG)",
+    ]
+    assert "APPG" in [group["group_name"] for group in result["results"][1]["racf_info"][0]["user_group_connects"]]
+
+
+def test_racf_user_bulk_alters_same_user_in_order(fake_racf, fake_state):
+    result = run_module("racf_user", dict(users=[
+        dict(name="USER01", user_name_info="A"),
+        dict(name="USER01", user_name_info="B"),
+        dict(name="USER01", user_name_info="B"),
+    ]))
+
+    assert [user_result["changed"] for user_result in result["results"]] == [True, True, False]
+    assert [command for command in fake_racf.commands() if command.startswith("ALU ")] == ["ALU USER01 NAME('A')", "ALU USER01 NAME('B')"]
+    assert [user_result["racf_info"][0]["user_name_info"] for user_result in result["results"]] == ["A", "B", "B"]
+
+
+def alter_commands(fake_racf):
+    # the segment suffixes pad the fields they leave out with spaces
+    return [re.sub(r"\(\s+|\s+\)", lambda match: match.group().strip(), command) for command in fake_racf.commands() if command.startswith("ALU ")]
+
+
+def test_racf_user_alter_sends_only_differing_segment_fields(fake_racf):
+    # the fake lists UID 100, HOME /u/user01, PROGRAM /bin/sh, PROC IKJACCNT and SIZE 4096
+    result = run_module("racf_user", dict(
+        name="USER01", state="present", verify="messages",
+        user_omvs_segment=dict(uid="0000000100", home="/u/user01", program="/bin/bash"),
+        user_tso_segment=dict(proc="ikjaccnt", size="4096", dest="REMOTE"),
+    ))
+
+    assert result["changed"] is True
+    assert alter_commands(fake_racf) == ["ALU USER01 OMVS(PROGRAM(/bin/bash)) TSO(DEST(REMOTE))"]
+
+
+def test_racf_user_alter_home_case_differs(fake_racf):
+    fields = dict(home="/U/USER01", program="/bin/sh")
+    result = run_module("racf_user", dict(name="USER01", state="present", verify="messages", user_omvs_segment=fields))
+
+    # z/OS UNIX paths are case sensitive
+    assert result["changed"] is True
+    assert alter_commands(fake_racf) == ["ALU USER01 OMVS(HOME(/U/USER01))"]
+
+    fake_racf.reset()
+    result = run_module("racf_user", dict(name="USER01", state="present", verify="messages", user_omvs_segment=dict(home="/u/user01", program="/BIN/SH")))
+    assert alter_commands(fake_racf) == ["ALU USER01 OMVS(PROGRAM(/BIN/SH))"]
+
+
+@pytest.mark.parametrize("verify", ["messages", "none"])
+def test_racf_user_verify_skips_relist(fake_racf, verify):
+    result = run_module("racf_user", dict(name="USER01", state="present", user_name_info="NEW", verify=verify))
+    assert "failed" not in result, result.get("msg")
+    assert result["changed"] is True
+    result = run_module("racf_user", dict(users=[dict(name="USER02", user_name_info="NEW")], verify=verify))
+    assert "failed" not in result, result.get("msg")
+    assert result["results"][0]["changed"] is True
+
+    # each user is listed once, before its ALU
+    assert [command.strip() for command in fake_racf.commands() if command != "TIME"] == [
+        "LU USER01", "ALU USER01 NAME('NEW')", "LU USER02", "ALU USER02 NAME('NEW')",
+    ]
+
+
+@pytest.mark.parametrize("verify", ["messages", "none"])
+def test_racf_user_verify_fails_on_rc(fake_racf, monkeypatch, verify):
+    monkeypatch.setenv("RACF_FAKE_FAIL_MATCH", "^ALU ")
+
+    result = run_module("racf_user", dict(name="USER01", state="present", user_name_info="NEW", verify=verify))
+    assert result["failed"] is True
+    assert result["msg"] == "RACF command failed: ALU USER01 NAME('NEW')"
+
+    result = run_module("racf_user", dict(users=[dict(name="USER02", user_name_info="NEW")], verify=verify))
+    assert result["failed"] is True
+    assert result["results"][0]["msg"] == "RACF command failed: ALU USER02 NAME('NEW')"
+
+
+def test_racf_user_present(benchmark_racf, fake_scale):
+    result, measurement = benchmark_racf("racf_user present", lambda: run_module("racf_user", dict(name="USER01", state="present")))
+
+    assert result["changed"] is False
+    assert measurement["commands"] == 2
+
+
+def test_racf_keyring_list(benchmark_racf, fake_scale):
+    result, measurement = benchmark_racf(
+        "racf_keyring list_only", lambda: run_module("racf_keyring", dict(name="RING01", keyring_owner="USERX", list_only=True)),
+        items=BENCH_RING_SIZE,
+    )
+
+    assert len(result["racf_info"]["certificates"]) == BENCH_RING_SIZE
+    assert measurement["commands"] == 2
+
+
+def test_racf_user_raw_output_only_when_returned(fake_racf):
+    result = run_module("racf_user", dict(name="USER01", list_only=True))
+    assert "raw_output" not in result["racf_info"][0]
+
+    result = run_module("racf_user", dict(name="USER01", list_only=True, return_output=True, output_limit=0))
+    assert result["racf_info"][0]["raw_output"].startswith("USER=USER01")
+
+
+def test_racf_keyring_raw_output_only_when_returned(fake_racf):
+    result = run_module("racf_keyring", dict(name="RING01", keyring_owner="USERX", list_only=True))
+    assert "results" not in result["racf_info"]
+
+    result = run_module("racf_keyring", dict(name="RING01", keyring_owner="USERX", list_only=True, return_output=True, output_limit=0))
+    assert "LABEL" in result["racf_info"]["results"].upper()
+
+
+def test_racf_certificate_list(benchmark_racf, fake_scale):
+    result, measurement = benchmark_racf(
+        "racf_certificate list_only", lambda: run_module("racf_certificate", dict(certificate_owner="USERX", list_only=True)),
+        items=BENCH_CERTIFICATES,
+    )
+
+    assert len(result["racf_info"]) == BENCH_CERTIFICATES
+    assert measurement["commands"] == 2
+
+
+def test_racf_keyring_converge(benchmark_racf, fake_scale):
+    certificates = [dict(label=f"cert{index:05d}", owner="USERX", usage="personal") for index in range(BENCH_RING_SIZE)]
+
+    result, measurement = benchmark_racf(
+        "racf_keyring certificates converged",
+        lambda: run_module("racf_keyring", dict(name="RING01", keyring_owner="USERX", state="connect", exclusive=True, certificates=certificates)),
+        items=BENCH_RING_SIZE,
+    )
+
+    assert result["changed"] is False
+    # TIME handshake of the session plus one LISTRING for the whole set
+    assert measurement["commands"] == 2
+
+
+def test_racf_keyring_info_owners(benchmark_racf, fake_scale):
+    owners = [f"U{index:07d}" for index in range(BENCH_OWNERS)] + ["MISSING1"]
+
+    result, measurement = benchmark_racf(
+        "racf_keyring_info owners", lambda: run_module("racf_keyring_info", dict(owners=owners, workers=4)),
+        items=len(owners),
+    )
+
+    assert [owner_info["owner"] for owner_info in result["racf_info"]] == owners
+    assert sorted(result["racf_info"][0]["keyrings"]) == ["RING00", "RING01", "RING02"]
+    assert len(result["racf_info"][0]["keyrings"]["RING00"]) == BENCH_RING_SIZE
+    assert result["racf_info"][0]["keyrings"]["RING02"] == []
+    assert result["failed_owners"] == ["MISSING1"]
+    # one LISTRING(*) per owner plus the TIME handshake of every worker session
+    assert measurement["commands"] == len(owners) + 4
+
+
+def test_racf_keyring_info_default_owner(fake_racf):
+    result = run_module("racf_keyring_info", dict())
+
+    # without owners the keyrings of the user running the module are listed
+    assert [owner_info["owner"] for owner_info in result["racf_info"]] == [""]
+    assert sorted(result["racf_info"][0]["keyrings"]) == ["RING00", "RING01", "RING02"]
+    assert result["failed_owners"] == []
+    assert "RACDCERT LISTRING(*)" in fake_racf.commands()
+
+
+def test_racf_certificate_expiry_owners(benchmark_racf, fake_scale, monkeypatch):
+    monkeypatch.setenv("RACF_FAKE_CERTIFICATES", str(BENCH_OWNER_CERTIFICATES))
+    owners = ["CERTAUTH", "SITE"] + [f"U{index:07d}" for index in range(BENCH_OWNERS)]
+
+    result, measurement = benchmark_racf(
+        "racf_certificate_expiry owners",
+        lambda: run_module("racf_certificate_expiry", dict(owners=owners, expires_within_days=365, workers=4)),
+        items=len(owners) * BENCH_OWNER_CERTIFICATES,
+    )
+
+    end_dates = [certificate["end_date"] for certificate in result["racf_info"]]
+    assert result["certificates"] == len(owners) * BENCH_OWNER_CERTIFICATES
+    assert 0 < len(end_dates) < result["certificates"]
+    assert end_dates == sorted(end_dates)
+    assert all(certificate["days_left"] <= 365 for certificate in result["racf_info"])
+    assert {certificate["user"] for certificate in result["racf_info"]} >= {"CERTAUTH", "SITE"}
+    # one RACDCERT LIST per owner plus the TIME handshake of every worker session
+    assert measurement["commands"] == len(owners) + 4
+
+
+def test_racf_group_members_converge(benchmark_racf, fake_scale):
+    members = [f"U{index:07d}" for index in range(BENCH_GROUP_MEMBERS)]
+
+    result, measurement = benchmark_racf(
+        "racf_group members converged",
+        lambda: run_module("racf_group", dict(name="GRP00000", state="connect", exclusive=True, members=members)),
+        items=BENCH_GROUP_MEMBERS,
+    )
+
+    assert result["changed"] is False
+    assert len(result["racf_info"][0]["group_members"]) == BENCH_GROUP_MEMBERS
+    # TIME handshake of the session plus one LISTGRP for the whole member set
+    assert measurement["commands"] == 2
+
+
+def test_racf_group_members_exclusive(benchmark_racf, fake_scale):
+    shift = BENCH_GROUP_MEMBERS // 2
+    members = [f"U{index:07d}" for index in range(shift, BENCH_GROUP_MEMBERS + shift)]
+
+    result, measurement = benchmark_racf(
+        "racf_group members exclusive",
+        lambda: run_module("racf_group", dict(name="GRP00000", state="connect", exclusive=True, members=members, verify="messages")),
+        items=BENCH_GROUP_MEMBERS,
+    )
+
+    assert result["changed"] is True
+    assert result["connected"] == members[BENCH_GROUP_MEMBERS - shift:]
+    assert result["removed"] == [f"U{index:07d}" for index in range(shift)]
+    chunks = -(-shift // 100)
+    # TIME, one LISTGRP and the connects and removes of up to 100 users each
+    assert measurement["commands"] == 2 + 2 * chunks
+
+
+def test_racf_group_exclusive_needs_members(fake_racf):
+    result = run_module("racf_group", dict(name="GRP00000", state="connect", exclusive=True, members=[]))
+    assert result["failed"] is True
+    assert result["changed"] is False
+    assert not any(command.startswith("REMOVE") for command in fake_racf.commands())
+
+    result = run_module("racf_group", dict(name="GRP00000", state="connect", exclusive=True, members=[], remove_all_members=True, verify="messages"))
+    assert result["changed"] is True
+    assert result["removed"]
@@ -0,0 +1,112 @@
+import os
+import shutil
+import socket
+import stat
+import tempfile
+
+import pytest
+
+from conftest import run_module
+
+
+@pytest.fixture
+def broker(fake_racf, monkeypatch):
+    from ansible_collections.billpereira.community_racf.plugins.module_utils import racf_broker
+
+    # unix socket paths are limited to about 100 bytes, tmp_path can be longer
+    broker_dir = tempfile.mkdtemp(prefix="racf_broker_")
+    socket_path = f"{broker_dir}/broker.sock"
+    monkeypatch.setenv("RACF_BROKER_SOCKET", socket_path)
+    client = racf_broker.connect_broker(socket_path)
+    assert client is not None
+    try:
+        yield client
+    finally:
+        client.request("shutdown")
+        client.close()
+        shutil.rmtree(broker_dir, ignore_errors=True)
+
+
+def test_broker_ping_and_version(broker):
+    from ansible_collections.billpereira.community_racf.plugins.module_utils import racf_broker
+
+    assert broker.current
+    assert broker.request("ping")["version"] == racf_broker.broker_version()
+
+
+def test_broker_run(broker, fake_racf):
+    rc, output = broker.run("LU USER01")
+    assert rc == 0
+    assert "USER=USER01" in output
+    results = broker.run_many(["LU USER02", "LU MISSING1"])
+    assert [result["rc"] for result in results] == [0, 4]
+    # the broker sessions start with a TIME handshake
+    assert [command for command in fake_racf.commands() if command != "TIME"] == ["LU USER01", "LU USER02", "LU MISSING1"]
+
+
+def test_broker_cache_hit_and_invalidation(broker):
+    assert broker.cache_get("user", "USER01", "LU USER01") is None
+    broker.run("LU USER01")
+    assert broker.cache_put("user", "USER01", "LU USER01", dict(name="USER01"))
+    assert broker.cache_get("user", "USER01", "LU USER01") == dict(name="USER01")
+
+    broker.run("CO (USER01) GROUP(NEWG)")
+    assert broker.cache_get("user", "USER01", "LU USER01") is None
+
+
+def test_broker_rejects_stale_put(broker):
+    from ansible_collections.billpereira.community_racf.plugins.module_utils import racf_broker
+
+    writer = racf_broker.connect_broker(broker.socket_path)
+    try:
+        # the listing is read before another client changes the user
+        assert broker.cache_get("user", "USER01", "LU USER01") is None
+        broker.run("LU USER01")
+        writer.run("CO (USER01) GROUP(NEWG)")
+        assert not broker.cache_put("user", "USER01", "LU USER01", dict(name="stale"))
+        assert broker.cache_get("user", "USER01", "LU USER01") is None
+    finally:
+        writer.close()
+
+
+def test_racf_user_served_from_broker_cache(broker, fake_racf):
+    first = run_module("racf_user", dict(name="USER01", list_only=True))
+    second = run_module("racf_user", dict(name="USER01", list_only=True))
+    assert second["racf_info"] == first["racf_info"]
+    assert [command.strip() for command in fake_racf.commands()].count("LU USER01") == 1
+
+
+@pytest.mark.parametrize("private_dir", ["", "racf_broker_source"])
+def test_broker_refuses_shared_dir(fake_racf, private_dir):
+    from ansible_collections.billpereira.community_racf.plugins.module_utils import racf_broker
+
+    broker_dir = tempfile.mkdtemp(prefix="racf_broker_")
+    try:
+        shared_dir = os.path.join(broker_dir, private_dir)
+        os.makedirs(shared_dir, exist_ok=True)
+        os.chmod(shared_dir, 0o770)
+        with pytest.raises(RuntimeError, match="must be a directory owned by uid"):
+            racf_broker.connect_broker(f"{broker_dir}/broker.sock")
+        assert not os.path.exists(f"{broker_dir}/broker.sock")
+    finally:
+        shutil.rmtree(broker_dir, ignore_errors=True)
+
+
+def test_broker_socket_private(broker):
+    assert stat.S_IMODE(os.stat(broker.socket_path).st_mode) == 0o600
+
+
+def test_broker_peer_credentials(monkeypatch):
+    from ansible_collections.billpereira.community_racf.plugins.module_utils import racf_broker
+
+    if not hasattr(socket, "SO_PEERCRED"):
+        pytest.skip("SO_PEERCRED is not available")
+    client, server = socket.socketpair(socket.AF_UNIX)
+    try:
+        assert racf_broker.peer_is_owner(server)
+        uid = os.getuid()
+        monkeypatch.setattr(racf_broker.os, "getuid", lambda: uid + 1)
+        assert not racf_broker.peer_is_owner(server)
+    finally:
+        client.close()
+        server.close()
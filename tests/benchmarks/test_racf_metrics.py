@@ -0,0 +1,13 @@
+def test_metrics_count_commands_without_rc_as_failed():
+    from ansible_collections.billpereira.community_racf.plugins.callback.racf_metrics import CallbackModule
+
+    callback = CallbackModule()
+    callback.add("zos1", dict(commands=[
+        dict(verb="LU", elapsed=0.1, bytes=100, rc=0),
+        dict(verb="LU", elapsed=30.0, bytes=0, rc=None),
+        dict(verb="LU", elapsed=0.1, bytes=50, rc=4),
+    ]))
+
+    counters = callback.hosts["zos1"]["verbs"]["LU"]
+    assert counters["commands"] == 3
+    assert counters["failed"] == 2
@@ -0,0 +1,85 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from conftest import FAKE_TSOCMD, run_module
+
+
+@pytest.fixture
+def slow_racf(fake_racf, monkeypatch, tmp_path):
+    for name in ("RACF_COMMAND_TIMEOUT", "RACF_COMMAND_TIMEOUTS", "RACF_READ_RETRIES", "RACF_HEDGE_AFTER"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("RACF_RETRY_BACKOFF", "0.01")
+    monkeypatch.setenv("RACF_FAKE_SLOW_COUNT", str(tmp_path / "slow.count"))
+
+    def slow(match, seconds=3, skip=0, times=None):
+        monkeypatch.setenv("RACF_FAKE_SLOW", str(seconds))
+        monkeypatch.setenv("RACF_FAKE_SLOW_MATCH", match)
+        monkeypatch.setenv("RACF_FAKE_SLOW_SKIP", str(skip))
+        if times is not None:
+            monkeypatch.setenv("RACF_FAKE_SLOW_TIMES", str(times))
+
+    return slow
+
+
+def events(result):
+    return [(event["event"], event["attempt"]) for event in result.get("command_events", [])]
+
+
+def test_read_timeout_fails_task(slow_racf, fake_racf, monkeypatch):
+    slow_racf(r"^LU ")
+    monkeypatch.setenv("RACF_COMMAND_TIMEOUTS", "LU=0.5")
+    monkeypatch.setenv("RACF_READ_RETRIES", "0")
+
+    result = run_module("racf_user", dict(name="USER01", list_only=True))
+
+    assert result["failed"] is True
+    assert result["msg"].startswith("Timed out after 0.5s running TSO command: LU USER01")
+    assert events(result) == [("timeout", 0)]
+
+
+def test_read_retried_on_a_restarted_session(slow_racf, fake_racf, monkeypatch):
+    slow_racf(r"^LU ", times=1)
+    monkeypatch.setenv("RACF_COMMAND_TIMEOUT", "0.5")
+
+    result = run_module("racf_user", dict(name="USER01", list_only=True))
+
+    assert "failed" not in result, result.get("msg")
+    assert result["racf_info"][0]["user_default_group"] == "SYS1"
+    assert events(result) == [("timeout", 0), ("retry", 1)]
+    # the session killed by the timeout is started again, with its TIME handshake
+    assert [command.strip() for command in fake_racf.commands()] == ["TIME", "LU USER01", "TIME", "LU USER01"]
+
+
+def test_hedged_read_won_by_tsocmd(slow_racf, fake_racf, monkeypatch, tmp_path):
+    tsocmd = tmp_path / "bin" / "tsocmd"
+    tsocmd.parent.mkdir()
+    tsocmd.write_text(f"#!/bin/sh\nexec {sys.executable} {FAKE_TSOCMD} \"$@\"\n")
+    tsocmd.chmod(tsocmd.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tsocmd.parent}{os.pathsep}{os.environ['PATH']}")
+    slow_racf(r"^LU ", seconds=5, times=1)
+    monkeypatch.setenv("RACF_HEDGE_AFTER", "0.2")
+
+    result = run_module("racf_user", dict(name="USER01", list_only=True))
+
+    assert "failed" not in result, result.get("msg")
+    assert result["racf_info"][0]["user_default_group"] == "SYS1"
+    assert events(result) == [("hedge", 0), ("hedge_won", 0)]
+    assert [command.strip() for command in fake_racf.commands()].count("LU USER01") == 2
+
+
+def test_timeout_keeps_partial_result(slow_racf, fake_racf, monkeypatch):
+    # the ring is listed, added and listed again, the second listing times out
+    slow_racf(r"LISTRING", skip=1)
+    monkeypatch.setenv("RACF_COMMAND_TIMEOUTS", "RACDCERT LISTRING=0.5")
+    monkeypatch.setenv("RACF_READ_RETRIES", "0")
+
+    result = run_module("racf_keyring", dict(name="MISSINGR", keyring_owner="USER01", state="present"))
+
+    assert result["failed"] is True
+    assert result["changed"] is True
+    # the result registered with the module keeps the keyring it was working on
+    assert result["keyring"] == "MISSINGR"
+    assert result["executed_commands"] == ["RACDCERT ADDRING(MISSINGR) ID(USER01)"]
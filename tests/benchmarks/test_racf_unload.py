@@ -0,0 +1,136 @@
+import datetime
+
+import pytest
+
+from conftest import run_module
+
+# CPython has no cp1047 codec, the fixture is written in the EBCDIC code page it has
+UNLOAD_ENCODING = "cp037"
+
+
+def unload_record(record_type, *fields):
+    # fields are (1-based column, value) pairs placed as IRRDBU00 does
+    line = record_type
+    for column, value in fields:
+        line = line.ljust(column - 1) + value
+    return line
+
+
+@pytest.fixture
+def unload_path(tmp_path):
+    today = datetime.date.today()
+    records = [
+        unload_record("0100", (6, "SYS1"), (15, "SYS1"), (24, "1990-01-01"), (35, "IBMUSER"), (44, "NONE"), (58, "SYSTEM GROUP")),
+        unload_record("0100", (6, "APPGRP"), (15, "SYS1"), (24, "2020-05-17"), (35, "SYS1"), (44, "READ")),
+        unload_record("0101", (6, "APPGRP"), (15, "NOT LOADED")),
+        unload_record("0102", (6, "APPGRP"), (15, "USER01"), (24, "USE")),
+        unload_record("0102", (6, "APPGRP"), (15, "USER02"), (24, "CONNECT")),
+        unload_record(
+            "0200", (6, "USER01"), (15, "2021-03-04"), (26, "IBMUSER"), (40, "YES"), (45, "NO"), (50, "NO"),
+            (60, "30"), (64, "2024-01-31"), (75, "FIRST USER"), (96, "SYS1"),
+        ),
+        unload_record("0200", (6, "USER02"), (15, "2022-06-07"), (26, "SYS1"), (40, "NO"), (45, "NO"), (50, "YES"), (75, "SECOND USER"), (96, "APPGRP")),
+        unload_record("0205", (6, "USER01"), (15, "SYS1"), (24, "2021-03-04"), (35, "IBMUSER"), (94, "NO")),
+        unload_record("0205", (6, "USER01"), (15, "APPGRP"), (24, "2021-03-05"), (35, "SYS1"), (94, "NO")),
+        unload_record("0205", (6, "USER02"), (15, "APPGRP"), (24, "2022-06-07"), (35, "SYS1"), (94, "YES")),
+        unload_record("0210", (6, "USER01"), (15, "APPL1"), (24, "DCLAS"), (33, "MCLAS"), (42, "SCLAS")),
+        unload_record("0220", (6, "USER01"), (15, "ACCT#1"), (137, "LOCAL"), (150, "IKJPROC"), (159, "2048")),
+        unload_record("0270", (6, "USER01"), (15, "1001"), (26, "/u/user01"), (1050, "/bin/sh")),
+        unload_record(
+            "0560", (6, "SOON"), (253, "DIGTCERT"), (262, "2020-01-01"), (282, (today + datetime.timedelta(days=10)).isoformat()), (293, "23:59:59"),
+        ),
+        unload_record(
+            "0560", (6, "LATER"), (253, "DIGTCERT"), (262, "2020-01-01"), (282, (today + datetime.timedelta(days=90)).isoformat()), (293, "23:59:59"),
+        ),
+        unload_record(
+            "0560", (6, "EXPIRED"), (253, "DIGTCERT"), (262, "2020-01-01"), (282, (today - datetime.timedelta(days=1)).isoformat()), (293, "23:59:59"),
+        ),
+    ]
+    path = tmp_path / "racf.unload"
+    # records copied from the unload data set end with an EBCDIC NL
+    path.write_bytes("".join(f"{record}\x85" for record in records).encode(UNLOAD_ENCODING))
+    return path
+
+
+def test_unload_column_slicing(unload_path):
+    from ansible_collections.billpereira.community_racf.plugins.module_utils.racf_unload import UNLOAD_RECORDS, iter_unload_records
+
+    field_names = {table: [name for name, start, end in fields] for table, fields in UNLOAD_RECORDS.values()}
+    named = [(table, dict(zip(field_names[table], values))) for table, values in iter_unload_records(str(unload_path), UNLOAD_ENCODING)]
+
+    # the 0101 record is not loaded
+    assert len(named) == 15
+    assert named[0] == ("groups", dict(name="SYS1", superior_group="SYS1", create_date="1990-01-01", owner="IBMUSER", uacc="NONE", installation_data="SYSTEM GROUP"))
+    assert named[3] == ("group_members", dict(name="APPGRP", member="USER02", auth="CONNECT"))
+    assert named[4][1]["user_name_info"] == "FIRST USER"
+    assert named[4][1]["default_group"] == "SYS1"
+    assert named[4][1]["password_interval"] == "30"
+    assert named[4][1]["special"] == "YES"
+    assert named[8][1]["revoke"] == "YES"
+    assert named[9] == ("user_dfp", dict(name="USER01", dataappl="APPL1", dataclass="DCLAS", mgmtclass="MCLAS", storclass="SCLAS"))
+    assert named[10][1]["dest"] == "LOCAL"
+    assert named[10][1]["proc"] == "IKJPROC"
+    assert named[11][1]["home"] == "/u/user01"
+    assert named[11][1]["program"] == "/bin/sh"
+    assert named[12][1]["class_name"] == "DIGTCERT"
+
+
+def test_unload_lines_across_chunks(unload_path, tmp_path, monkeypatch):
+    from ansible_collections.billpereira.community_racf.plugins.module_utils import racf_unload
+
+    records = list(racf_unload.iter_unload_records(str(unload_path), UNLOAD_ENCODING))
+    ascii_path = tmp_path / "racf.ascii.unload"
+    ascii_path.write_bytes(unload_path.read_bytes().decode(UNLOAD_ENCODING).replace("\x85", "\r\n").encode("ascii"))
+    monkeypatch.setattr(racf_unload, "UNLOAD_READ_CHUNK", 7)
+
+    assert list(racf_unload.iter_unload_records(str(unload_path), UNLOAD_ENCODING)) == records
+    assert list(racf_unload.iter_unload_records(str(ascii_path), "ascii")) == records
+
+
+def test_racf_unload_facts_queries(fake_racf, unload_path):
+    args = dict(unload=str(unload_path), encoding=UNLOAD_ENCODING, users=["USER01", "MISSING1"], group_members=["APPGRP"], expires_within_days=30)
+    result = run_module("racf_unload_facts", args)
+
+    assert result["index_rebuilt"] is True
+    assert result["record_counts"]["users"] == 2
+    assert result["record_counts"]["user_connects"] == 3
+    user = result["racf_info"]["users"]["USER01"]
+    assert user["default_group"] == "SYS1"
+    assert [connect["group_name"] for connect in user["user_group_connects"]] == ["APPGRP", "SYS1"]
+    assert user["user_omvs_segment"][0]["uid"] == "1001"
+    assert user["user_tso_segment"][0]["size"] == "2048"
+    assert result["racf_info"]["users"]["MISSING1"] is None
+    assert [(member["user"], member["revoke"]) for member in result["racf_info"]["group_members"]["APPGRP"]] == [("USER01", "NO"), ("USER02", "YES")]
+    assert [certificate["name"] for certificate in result["racf_info"]["expiring_certificates"]] == ["SOON"]
+
+    # the index is reused until the unload changes
+    result = run_module("racf_unload_facts", args)
+    assert result["index_rebuilt"] is False
+    assert [certificate["name"] for certificate in result["racf_info"]["expiring_certificates"]] == ["SOON"]
+
+
+def test_racf_unload_facts_lowercase_names(fake_racf, unload_path):
+    result = run_module("racf_unload_facts", dict(unload=str(unload_path), encoding=UNLOAD_ENCODING, users=["user01"], group_members=["appgrp"]))
+
+    assert result["racf_info"]["users"]["user01"]["name"] == "USER01"
+    assert [member["user"] for member in result["racf_info"]["group_members"]["appgrp"]] == ["USER01", "USER02"]
+
+
+def test_racf_unload_facts_check_mode(fake_racf, unload_path):
+    args = dict(unload=str(unload_path), encoding=UNLOAD_ENCODING, users=["USER01"])
+    index_path = unload_path.parent / f"{unload_path.name}.sqlite"
+
+    result = run_module("racf_unload_facts", dict(args, _ansible_check_mode=True))
+    # the index would be built, the queries are answered without writing it
+    assert result["changed"] is True
+    assert result["index_rebuilt"] is False
+    assert result["racf_info"]["users"]["USER01"]["default_group"] == "SYS1"
+    assert not index_path.exists()
+
+    result = run_module("racf_unload_facts", args)
+    assert result["changed"] is True
+    assert index_path.exists()
+
+    result = run_module("racf_unload_facts", dict(args, _ansible_check_mode=True))
+    assert result["changed"] is False
+    assert result["index_rebuilt"] is False